@@ -1,4 +1,12 @@
 import streamlit as st
+from Utility.aquecimento import iniciar_em_segundo_plano
+from Utility.recarga import iniciar_observador
+
+# Aquece caches e modelos das páginas uma única vez por processo do servidor,
+# se o aquecimento de linha de comando (antes do servidor) ainda não rodou
+iniciar_em_segundo_plano()
+# Troca as páginas para versões novas dos dados sem reiniciar o servidor
+iniciar_observador()
 
 st.set_page_config(
     page_title = "PISI3 - BSI - UFRPE por Edniz Silva",
@@ -1,4 +1,58 @@
 import pandas as pd
+import numpy as np
+import json
+import io
+import os
+import sys
+from contextlib import redirect_stdout
+from joblib import Parallel, delayed
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Utility.caracteristicas_texto import COLUNA_ID, ExtratorTexto
+from Utility.recursos import obter_controlador
+
+# Regras de limpeza e discretização. Ficam em constantes para que possam ser
+# salvas (salvar_regras) e reaplicadas a lotes novos sem reprocessar o histórico.
+COLUNAS_DESNECESSARIAS = ["Ad ID", "Car Name", "Condition", "Seller Location",
+                          "Registration city", "Description", "Car Features",
+                          "Images URL's", "Car Profile"]
+MODELOS_DISCREPANTES = ["Civic VTi", "Civic EXi", "Civic VTi Oriel", "Cervo", "Every Wagon",
+                        "Liana", "Mehran VX", "Khyber", "Cultus VXL", "Corolla Assista",
+                        "Corolla Axio", "Surf", "Prius", "ISIS"]
+ANOS_DESCARTADOS = [2024]
+FAIXAS_ANO = [1999, 2004, 2008, 2012, 2016, 2020, 2024]
+FAIXAS_KM = [0, 30000, 60000, 90000, 120000, 150000, 180000, 210000,
+             224000, 227000, 300000, 330000, 360000, 390000, 410000, 440000,
+             470000, 500000, 533530]
+
+def regras_padrao():
+    """
+    Retorna as regras de limpeza e os limites das faixas em um dicionário.
+    """
+    return {
+        "colunas_desnecessarias": COLUNAS_DESNECESSARIAS,
+        "modelos_discrepantes": MODELOS_DISCREPANTES,
+        "anos_descartados": ANOS_DESCARTADOS,
+        "faixas_ano": FAIXAS_ANO,
+        "faixas_km": FAIXAS_KM
+    }
+
+def salvar_regras(output_path, regras=None):
+    """
+    Salva as regras de limpeza e os limites das faixas em um arquivo JSON.
+    :param output_path: Caminho do arquivo JSON.
+    :param regras: Regras a salvar (padrão: regras_padrao()).
+    """
+    with open(output_path, "w", encoding="utf-8") as arquivo:
+        json.dump(regras or regras_padrao(), arquivo, ensure_ascii=False, indent=2)
+    print(f"[INFO] Regras salvas em: {output_path}\n")
+
+def carregar_regras(file_path):
+    """
+    Carrega as regras salvas por salvar_regras.
+    :param file_path: Caminho do arquivo JSON.
+    """
+    with open(file_path, encoding="utf-8") as arquivo:
+        return json.load(arquivo)
 
 class DataOverview:
     """
@@ -98,12 +152,19 @@ class DataPreprocessing:
     Classe para realizar o pré-processamento do conjunto de dados.
     Inclui remoção de duplicatas, colunas desnecessárias e linhas discrepantes.
     """
-    def __init__(self, df):
+    def __init__(self, df, regras=None, indice_duplicatas=None, manter_colunas=None):
         """
         Inicializa a classe com um DataFrame.
         :param df: DataFrame original.
+        :param regras: Regras de limpeza salvas (padrão: regras_padrao()).
+        :param indice_duplicatas: IndiceDuplicatas com as linhas de dumps anteriores (opcional).
+        :param manter_colunas: Colunas desnecessárias que devem ser mantidas mesmo assim
+                               (ex.: ['Ad ID'], para alinhar as características de texto).
         """
         self.df = df
+        self.regras = regras or regras_padrao()
+        self.indice_duplicatas = indice_duplicatas
+        self.manter_colunas = list(manter_colunas or [])
 
     def remove_duplicates(self):
         """
@@ -111,6 +172,12 @@ class DataPreprocessing:
         """
         print("\n[INFO] Removendo linhas duplicadas...")
         self.df.drop_duplicates(inplace=True)
+        if self.indice_duplicatas is not None:
+            # Carros reanunciados que já apareceram em dumps anteriores. As linhas novas
+            # ficam pendentes no índice; quem chamou o salva depois de gravá-las
+            total = len(self.df)
+            self.df = self.indice_duplicatas.filtrar_novos(self.df)
+            print(f"{total - len(self.df)} linhas já vistas em dumps anteriores removidas.")
         print("Linhas duplicadas removidas.\n")
 
     def remove_unnecessary_columns(self, columns):
@@ -127,21 +194,8 @@ class DataPreprocessing:
         Remove linhas discrepantes com base em condições predefinidas.
         """
         print("[INFO] Removendo linhas discrepantes...")
-        self.df = self.df[(self.df["Model"] != "Civic VTi") &
-                          (self.df["Model"] != "Civic EXi") &
-                          (self.df["Model"] != "Civic VTi Oriel") &
-                          (self.df["Model"] != "Cervo") &
-                          (self.df["Model"] != "Every Wagon") &
-                          (self.df["Model"] != "Liana") &
-                          (self.df["Model"] != "Mehran VX") &
-                          (self.df["Model"] != "Khyber") &
-                          (self.df["Model"] != "Cultus VXL") &
-                          (self.df["Model"] != "Corolla Assista") &
-                          (self.df["Model"] != "Corolla Axio") &
-                          (self.df["Model"] != "Surf") &
-                          (self.df["Model"] != "Prius") &
-                          (self.df["Model"] != "ISIS")]
-        self.df = self.df[self.df["Year"] != 2024]
+        self.df = self.df[~self.df["Model"].isin(self.regras["modelos_discrepantes"])]
+        self.df = self.df[~self.df["Year"].isin(self.regras["anos_descartados"])]
         print("Linhas discrepantes removidas.\n")
 
     def preprocess(self):
@@ -149,9 +203,8 @@ class DataPreprocessing:
         Executa todo o pré-processamento.
         """
         self.remove_duplicates()
-        self.remove_unnecessary_columns(["Ad ID", "Car Name", "Condition", "Seller Location",
-                                         "Registration city", "Description", "Car Features",
-                                         "Images URL's", "Car Profile"])
+        self.remove_unnecessary_columns([coluna for coluna in self.regras["colunas_desnecessarias"]
+                                         if coluna not in self.manter_colunas])
         self.remove_outliers()
         print("[INFO] Pré-processamento concluído!\n")
         return self.df
@@ -160,29 +213,30 @@ class DataDiscretization:
     """
     Classe para realizar a discretização de dados em compartimentos.
     """
-    def __init__(self, df):
+    def __init__(self, df, regras=None, copiar=True):
         """
         Inicializa a classe com um DataFrame.
         :param df: DataFrame original.
+        :param regras: Regras com os limites das faixas (padrão: regras_padrao()).
+        :param copiar: Trabalha numa cópia de df (False altera o próprio df, sem duplicar a memória).
         """
-        self.df = df.copy()
+        self.df = df.copy() if copiar else df
+        self.regras = regras or regras_padrao()
 
     def discretize_year(self):
         """
         Cria uma nova coluna discretizada para a coluna 'Year'.
         """
-        bins = [1999, 2004, 2008, 2012, 2016, 2020, 2024]
-        labels = [1, 2, 3, 4, 5, 6]
+        bins = self.regras["faixas_ano"]
+        labels = list(range(1, len(bins)))
         self.df["Year_Range"] = pd.cut(self.df["Year"], bins=bins, labels=labels)
 
     def discretize_km_driven(self):
         """
         Cria uma nova coluna discretizada para a coluna 'KM's driven'.
         """
-        bins = [0, 30000, 60000, 90000, 120000, 150000, 180000, 210000,
-                224000, 227000, 300000, 330000, 360000, 390000, 410000, 440000,
-                470000, 500000, 533530]
-        labels = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18]
+        bins = self.regras["faixas_km"]
+        labels = list(range(1, len(bins)))
         self.df["KM's driven_Range"] = pd.cut(self.df["KM's driven"], bins=bins, labels=labels)
 
     def convert_to_integer(self):
@@ -219,19 +273,87 @@ class DataDiscretization:
         self.save_to_csv(output_path)
         print("[INFO] Discretização concluída!\n")
 
+def _tratar_fragmento(fragmento, regras, manter_colunas):
+    """
+    Pré-processamento, discretização e conversão para inteiro de um fragmento,
+    executados num processo do pool. As mensagens das etapas são descartadas
+    para não se repetirem uma vez por fragmento.
+    """
+    with redirect_stdout(io.StringIO()):
+        limpos = DataPreprocessing(fragmento, regras, manter_colunas=manter_colunas).preprocess()
+        discretizador = DataDiscretization(limpos, regras, copiar=False)
+        discretizador.discretize_year()
+        discretizador.discretize_km_driven()
+        discretizador.convert_to_integer()
+    return discretizador.df
+
+def fragmentar(df, n_fragmentos):
+    """
+    Divide as linhas em até n_fragmentos pelo hash da linha inteira. Linhas
+    idênticas caem sempre no mesmo fragmento, então remover as duplicatas
+    dentro de cada fragmento equivale a removê-las no conjunto todo.
+    """
+    grupo = pd.util.hash_pandas_object(df, index=False).to_numpy() % np.uint64(n_fragmentos)
+    return [df.take(posicoes) for posicoes in (np.flatnonzero(grupo == i) for i in range(n_fragmentos))
+            if len(posicoes)]
+
+def processar_em_fragmentos(df, regras=None, indice_duplicatas=None, n_fragmentos=None, manter_colunas=None):
+    """
+    Executa o pré-processamento e a discretização (sem a correlação e sem salvar)
+    com os fragmentos de linhas distribuídos entre processos, com os núcleos
+    concedidos pelo controlador de recursos. O resultado é o mesmo do caminho
+    sequencial, na ordem original das linhas.
+    :param df: DataFrame do dump bruto.
+    :param regras: Regras de limpeza e faixas (padrão: regras_padrao()).
+    :param indice_duplicatas: IndiceDuplicatas com as linhas de dumps anteriores (opcional).
+    :param n_fragmentos: Número de fragmentos (padrão: um por núcleo concedido).
+    :param manter_colunas: Colunas desnecessárias mantidas (ver DataPreprocessing).
+    :return: DataFrame limpo e discretizado.
+    """
+    regras = regras or regras_padrao()
+    if indice_duplicatas is not None:
+        # O índice guarda estado entre dumps, então é consultado uma única vez, antes de fragmentar.
+        # Ele já descarta as repetições das colunas-chave dentro do próprio dump. As linhas
+        # novas ficam pendentes no índice; quem chamou o salva depois de gravá-las.
+        total = len(df)
+        df = indice_duplicatas.filtrar_novos(df)
+        print(f"[INFO] {total - len(df)} linhas já vistas em dumps anteriores removidas.")
+
+    if df.empty:
+        # Ex.: um dump incremental só com linhas já vistas. Sem fragmentos não há o que
+        # distribuir; o caminho sequencial devolve o resultado vazio com as colunas de saída
+        print("[INFO] Nenhuma linha para processar.\n")
+        return _tratar_fragmento(df, regras, manter_colunas)
+
+    with obter_controlador().reservar() as nucleos:
+        fragmentos = fragmentar(df, n_fragmentos or nucleos)
+        print(f"[INFO] Processando {len(df)} linhas em {len(fragmentos)} fragmentos ({nucleos} processos)...")
+        partes = Parallel(n_jobs=min(nucleos, len(fragmentos)))(
+            delayed(_tratar_fragmento)(fragmento, regras, manter_colunas) for fragmento in fragmentos)
+    print("[INFO] Pré-processamento e discretização concluídos!\n")
+    return pd.concat(partes).sort_index(kind='stable')
+
 if __name__ == "__main__":
     # Caminho para o arquivo CSV (Altere conforme o local do seu arquivo)
     file_path = r"C:\Users\Tutu\Desktop\Facul\Projeto 3\Projeto 2024.2\data\OLX_cars_dataset00.csv"
     output_path = r"C:\Users\Tutu\Desktop\Facul\Projeto 3\Projeto 2024.2\data\01_Cars_dataset_processado.csv"
+    rules_path = r"C:\Users\Tutu\Desktop\Facul\Projeto 3\Projeto 2024.2\data\regras_tratamento.json"
+    text_dir = r"C:\Users\Tutu\Desktop\Facul\Projeto 3\Projeto 2024.2\data\caracteristicas_texto"
+    extract_text = False  # Extrai 'Description' e 'Car Features' e mantém 'Ad ID' para alinhar as linhas
 
     # Etapa 1: Visão geral dos dados
     overview = DataOverview(file_path)
     overview.full_overview()
 
-    # Etapa 2: Pré-processamento dos dados
-    preprocessor = DataPreprocessing(overview.df)
-    cleaned_df = preprocessor.preprocess()
+    # Etapa opcional: Características de texto, lidas do dump em blocos
+    if extract_text:
+        ExtratorTexto().extrair_arquivo(file_path, text_dir)
+
+    # Etapas 2 e 3: Pré-processamento e discretização, em fragmentos processados em paralelo
+    manter = [COLUNA_ID] if extract_text else None
+    discretizer = DataDiscretization(processar_em_fragmentos(overview.df, manter_colunas=manter), copiar=False)
+    discretizer.check_correlation()
+    discretizer.save_to_csv(output_path)
 
-    # Etapa 3: Discretização dos dados
-    discretizer = DataDiscretization(cleaned_df)
-    discretizer.discretize(output_path)
+    # Etapa 4: Regras usadas, para reaplicar em lotes novos (ingestão incremental)
+    salvar_regras(rules_path)
@@ -2,31 +2,52 @@ import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report, confusion_matrix
+import joblib
 import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Utility.caracteristicas_texto import COLUNA_DESCRICAO, COLUNA_ID, COLUNA_ITENS, ExtratorTexto, combinar
+from Utility.motores import criar_modelo, nome_motor
+from Utility.precisao import para_calculo
+from Utility.recursos import ajustar, prever
 
 class ClassificadorCarros:
-    def __init__(self):
+    # Faixas de preço usadas como classes
+    FAIXAS_PRECO = [0, 200000, 300000, 400000, float('inf')]
+    ROTULOS_PRECO = ['Econômico', 'Intermediário', 'Premium', 'Luxo']
+
+    def __init__(self, precisao=None, motor=None):
+        """:param precisao: 'float64' ou 'float32' para as matrizes de características (padrão: PISI3_PRECISAO).
+        :param motor: 'random_forest' ou 'hist_gradient_boosting' (padrão: PISI3_MOTOR)."""
+        self.precisao = precisao
+        self.motor = nome_motor(motor)
         self.dados = None
         self.modelo = None
         self.codificadores = {}
         self.normalizador = StandardScaler()
         self.coluna_alvo = 'faixa_preco'
+        self.valores_faixa = {}
+        self.extrator = None
         
     def carregar_dados(self, caminho_arquivo):
         """Carrega e pré-processa o conjunto de dados de carros"""
         self.dados = pd.read_csv(caminho_arquivo)
         # Criar faixas de preço para classificação
-        faixas_preco = [0, 200000, 300000, 400000, float('inf')]
-        rotulos_preco = ['Econômico', 'Intermediário', 'Premium', 'Luxo']
         self.dados['faixa_preco'] = pd.cut(self.dados['preco'], 
-                                        bins=faixas_preco, 
-                                        labels=rotulos_preco)
+                                        bins=self.FAIXAS_PRECO, 
+                                        labels=self.ROTULOS_PRECO)
+        # Valor estimado de cada faixa (média dos preços), usado em prever
+        self.valores_faixa = self.dados.groupby('faixa_preco', observed=True)['preco'].mean().to_dict()
         return self.dados
     
-    def preprocessar_dados(self):
-        """Prepara os dados para treinamento do modelo"""
+    def preprocessar_dados(self, texto=None):
+        """Prepara os dados para treinamento do modelo
+
+        :param texto: MatrizTexto com as características de texto do dump (opcional).
+                      As linhas são buscadas pela coluna 'Ad ID' dos dados e X passa
+                      a ser uma matriz esparsa com as características de texto no fim.
+        """
         # Selecionar características para classificação
         caracteristicas = ['marca', 'modelo', 'ano', 'quilometragem', 'combustivel',
                         'car_documents', 'tipo', 'transmissão']
@@ -36,6 +57,7 @@ class ClassificadorCarros:
         for coluna in X.select_dtypes(include=['object']):
             self.codificadores[coluna] = LabelEncoder()
             X[coluna] = self.codificadores[coluna].fit_transform(X[coluna])
+        X = para_calculo(X, self.precisao)
         
         # Normalizar características numéricas
         caracteristicas_numericas = ['ano', 'quilometragem']
@@ -43,43 +65,86 @@ class ClassificadorCarros:
         
         y = self.codificadores[self.coluna_alvo] = LabelEncoder()
         y = y.fit_transform(self.dados[self.coluna_alvo])
+
+        self.extrator = None
+        if texto is not None and self.motor != 'random_forest':
+            print("Aviso: o gradient boosting não aceita matrizes esparsas; características de texto ignoradas.")
+        elif texto is not None and COLUNA_ID in self.dados.columns:
+            self.extrator = texto.extrator()
+            X = combinar(X, texto.linhas(self.dados[COLUNA_ID]))
+        elif texto is not None:
+            print(f"Aviso: os dados não têm a coluna '{COLUNA_ID}'; características de texto ignoradas.")
         
         return X, y
     
     def treinar_modelo(self, X, y):
-        """Treina o classificador Random Forest"""
-        self.modelo = RandomForestClassifier(n_estimators=100, random_state=42)
-        self.modelo.fit(X, y)
+        """Treina o classificador com o motor escolhido (Random Forest ou gradient boosting)"""
+        if self.motor == 'random_forest':
+            self.modelo = criar_modelo('classificacao', self.motor, n_estimators=100)
+        else:
+            # Os códigos do LabelEncoder de marca, modelo, etc. são usados como categorias nativas
+            self.modelo = criar_modelo('classificacao', self.motor, X if isinstance(X, pd.DataFrame) else ())
+        ajustar(self.modelo, X, y)
         return self.modelo
     
     def prever(self, dados_entrada):
         """Realiza previsões para novos dados"""
+        # O texto (se o modelo usa) é transformado direto das colunas do anúncio; sem elas, conta como vazio
+        texto = self.extrator.transformar(dados_entrada) if self.extrator is not None else None
+        dados_entrada = dados_entrada.drop(columns=[COLUNA_ID, COLUNA_DESCRICAO, COLUNA_ITENS], errors='ignore')
+
         # Pré-processar dados de entrada
         for coluna in dados_entrada.columns:
             if coluna in self.codificadores:
                 dados_entrada[coluna] = self.codificadores[coluna].transform(dados_entrada[coluna])
+        dados_entrada = para_calculo(dados_entrada, self.precisao)
         
         # Normalizar características numéricas
         caracteristicas_numericas = ['ano', 'quilometragem']
         dados_entrada[caracteristicas_numericas] = self.normalizador.transform(dados_entrada[caracteristicas_numericas])
         
         # Fazer previsão
-        previsao = self.modelo.predict(dados_entrada)
+        if texto is not None:
+            dados_entrada = combinar(dados_entrada, texto)
+        previsao = prever(self.modelo, dados_entrada)
         faixa_preco = self.codificadores[self.coluna_alvo].inverse_transform(previsao)
         
         # Calcular valor estimado (média da faixa)
-        valores_estimados = []
-        for faixa in faixa_preco:
-            valor_estimado = self.dados[self.dados['faixa_preco'] == faixa]['preco'].mean()
-            valores_estimados.append(valor_estimado)
+        valores_estimados = [self.valores_faixa.get(faixa) for faixa in faixa_preco]
         
         return faixa_preco, valores_estimados
+    
+    def salvar_modelo(self, caminho_arquivo):
+        """Salva o modelo, os codificadores, o normalizador e os valores por faixa"""
+        joblib.dump({
+            'modelo': self.modelo,
+            'codificadores': self.codificadores,
+            'normalizador': self.normalizador,
+            'valores_faixa': self.valores_faixa,
+            'precisao': self.precisao,
+            'motor': self.motor,
+            'texto': self.extrator.configuracao() if self.extrator is not None else None
+        }, caminho_arquivo)
+    
+    def carregar_modelo(self, caminho_arquivo):
+        """Carrega um modelo salvo por salvar_modelo, sem precisar dos dados de treino"""
+        salvo = joblib.load(caminho_arquivo)
+        self.modelo = salvo['modelo']
+        self.codificadores = salvo['codificadores']
+        self.normalizador = salvo['normalizador']
+        self.valores_faixa = salvo['valores_faixa']
+        self.precisao = salvo.get('precisao', self.precisao)
+        self.motor = salvo.get('motor', 'random_forest')
+        texto = salvo.get('texto')
+        self.extrator = ExtratorTexto.de_configuracao(texto) if texto is not None else None
+        return self.modelo
 
 def main():
     # Definir caminhos dos arquivos
     desktop_path = os.path.join(os.path.expanduser("~"), "Desktop")
     arquivo_entrada = os.path.join(os.path.dirname(os.path.abspath(__file__)), "1_Cars_processado.csv")
     arquivo_saida = os.path.join(desktop_path, "Cars_classificacao.csv")
+    arquivo_modelo = os.path.join(desktop_path, "modelo_classificacao.joblib")
     
     # Inicializar o classificador
     classificador = ClassificadorCarros()
@@ -110,6 +175,7 @@ def main():
         # Salvar resultados
         print(f"Salvando resultados em {arquivo_saida}...")
         resultados.to_csv(arquivo_saida, index=False)
+        classificador.salvar_modelo(arquivo_modelo)
         print("Processo concluído com sucesso!")
         
     except Exception as e:
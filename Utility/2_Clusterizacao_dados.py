@@ -1,14 +1,27 @@
 import pandas as pd
 from sklearn.cluster import KMeans
 from sklearn.preprocessing import StandardScaler
+import joblib
 import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Utility.precisao import para_calculo
+from Utility.recursos import ajustar_prever, prever
 
 class CarDataClusterer:
-    def __init__(self, file_path):
-        """Inicializa o clusterizador de dados de carros."""
+    def __init__(self, file_path, precisao=None):
+        """Inicializa o clusterizador de dados de carros.
+
+        :param precisao: 'float64' ou 'float32' para as matrizes normalizadas (padrão: PISI3_PRECISAO).
+        """
         self.file_path = file_path
+        self.precisao = precisao
         self.data = None
         self.clustered_data = None
+        self.current_year = None
+        self.feature_columns = None
+        self.scaler = None
+        self.kmeans = None
 
     def load_data(self):
         """Carrega o dataset processado."""
@@ -23,6 +36,7 @@ class CarDataClusterer:
     def add_car_age(self, current_year):
         """Adiciona a coluna de idade do carro."""
         if self.data is not None:
+            self.current_year = current_year
             self.data['Car Age'] = current_year - self.data['ano']
             print("Coluna 'Car Age' adicionada aos dados.")
         else:
@@ -32,11 +46,12 @@ class CarDataClusterer:
         """Pré-processa os dados para clusterização."""
         if self.data is not None:
             # Selecionar as colunas de interesse
-            features = self.data[feature_columns]
+            features = para_calculo(self.data[feature_columns], self.precisao)
 
             # Normalizar os dados
-            scaler = StandardScaler()
-            scaled_features = scaler.fit_transform(features)
+            self.feature_columns = list(feature_columns)
+            self.scaler = StandardScaler()
+            scaled_features = self.scaler.fit_transform(features)
 
             print("Dados normalizados para clusterização.")
             return scaled_features
@@ -47,8 +62,8 @@ class CarDataClusterer:
     def perform_clustering(self, scaled_features, n_clusters):
         """Executa o algoritmo de clusterização K-Means."""
         if scaled_features is not None:
-            kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-            self.data['Cluster'] = kmeans.fit_predict(scaled_features)
+            self.kmeans = KMeans(n_clusters=n_clusters, random_state=42)
+            self.data['Cluster'] = ajustar_prever(self.kmeans, scaled_features)
             print(f"Clusterização concluída com {n_clusters} clusters.")
         else:
             print("Erro: Os dados normalizados não estão disponíveis.")
@@ -64,19 +79,60 @@ class CarDataClusterer:
         else:
             print("Erro: Os dados clusterizados não estão disponíveis para salvar.")
 
-# Caminho do arquivo processado e de saída
-input_file_path = os.path.join(os.path.expanduser('~'), 'Desktop', '01_Cars_dataset_processado.csv')
-output_file_path = os.path.join(os.path.expanduser('~'), 'Desktop', 'OLX_cars_dataset_clustered.csv')
+    def save_model(self, output_file):
+        """Salva o normalizador e os centróides para atribuir clusters a dados novos."""
+        if self.kmeans is not None:
+            joblib.dump({
+                'current_year': self.current_year,
+                'feature_columns': self.feature_columns,
+                'scaler': self.scaler,
+                'kmeans': self.kmeans,
+                'precisao': self.precisao
+            }, output_file)
+            print(f"Modelo de clusterização salvo em: {output_file}")
+        else:
+            print("Erro: A clusterização ainda não foi executada.")
+
+    def load_model(self, model_file):
+        """Carrega o normalizador e os centróides salvos por save_model."""
+        try:
+            model = joblib.load(model_file)
+            self.current_year = model['current_year']
+            self.feature_columns = model['feature_columns']
+            self.scaler = model['scaler']
+            self.kmeans = model['kmeans']
+            self.precisao = model.get('precisao', self.precisao)
+            print("Modelo de clusterização carregado.")
+        except FileNotFoundError:
+            print(f"Erro: O arquivo {model_file} não foi encontrado.")
+
+    def assign_clusters(self, new_data):
+        """Atribui a cada linha nova o cluster do centróide salvo mais próximo, sem reajustar o K-Means."""
+        if self.kmeans is None:
+            print("Erro: O modelo de clusterização não foi carregado.")
+            return None
+        new_data = new_data.copy()
+        new_data['Car Age'] = self.current_year - new_data['ano']
+        scaled_features = self.scaler.transform(para_calculo(new_data[self.feature_columns], self.precisao))
+        new_data['Cluster'] = prever(self.kmeans, scaled_features)
+        return new_data
+
+if __name__ == "__main__":
+    # Caminho do arquivo processado e de saída
+    input_file_path = os.path.join(os.path.expanduser('~'), 'Desktop', '01_Cars_dataset_processado.csv')
+    output_file_path = os.path.join(os.path.expanduser('~'), 'Desktop', 'OLX_cars_dataset_clustered.csv')
+    model_file_path = os.path.join(os.path.expanduser('~'), 'Desktop', 'modelo_clusterizacao.joblib')
 
-# Instância da classe CarDataClusterer
-clusterer = CarDataClusterer(input_file_path)
+    # Instância da classe CarDataClusterer
+    clusterer = CarDataClusterer(input_file_path)
 
-# Execução do pipeline de clusterização
-current_year = 2025  # Definir o ano atual
-clusterer.load_data()
-clusterer.add_car_age(current_year)
+    # Execução do pipeline de clusterização
+    current_year = 2025  # Definir o ano atual
+    clusterer.load_data()
+    clusterer.add_car_age(current_year)
 
-features_to_cluster = ['quilometragem', 'preco', 'Car Age']  # Selecionar recursos relevantes
-scaled_data = clusterer.preprocess_for_clustering(features_to_cluster)
-clusterer.perform_clustering(scaled_data, n_clusters=5)
-clusterer.save_clustered_data(output_file_path)
+    features_to_cluster = ['quilometragem', 'preco', 'Car Age']  # Selecionar recursos relevantes
+    scaled_data = clusterer.preprocess_for_clustering(features_to_cluster)
+    clusterer.perform_clustering(scaled_data, n_clusters=5)
+    clusterer.save_clustered_data(output_file_path)
+    clusterer.save_model(model_file_path)
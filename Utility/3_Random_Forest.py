@@ -1,17 +1,68 @@
 import pandas as pd
+import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_squared_error, r2_score
+from joblib import Parallel, delayed
+from concurrent.futures import ThreadPoolExecutor
+import joblib
+import json
+import math
+import time
 import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Utility.caracteristicas_texto import COLUNA_ID, ExtratorTexto, combinar
+from Utility.contribuicoes import ContribuicoesFloresta
+from Utility.motores import codificar_categoricas, criar_modelo, nome_motor
+from Utility.precisao import para_calculo
+from Utility.recursos import ajustar, prever, obter_controlador
+
+# Espaço de busca padrão dos hiperparâmetros do Random Forest
+ESPACO_BUSCA_PADRAO = {
+    'max_depth': [None, 10, 20, 30],
+    'min_samples_split': [2, 5, 10],
+    'min_samples_leaf': [1, 2, 4],
+    'max_features': [1.0, 'sqrt', 0.5]
+}
+
+def _avaliar_candidato(params, X_train, y_train, X_val, y_val, n_amostras, n_arvores, random_state):
+    """Treina um candidato com o recurso da rodada e mede o R2 na validação."""
+    inicio = time.perf_counter()
+    inicio_cpu = time.process_time()
+
+    indices = np.random.RandomState(random_state).permutation(X_train.shape[0])[:n_amostras]
+    modelo = RandomForestRegressor(n_estimators=n_arvores, random_state=random_state, **params)
+    # X_train é um DataFrame ou, com as características de texto, uma matriz esparsa
+    amostra = X_train.iloc[indices] if hasattr(X_train, 'iloc') else X_train[indices]
+    modelo.fit(amostra, y_train.iloc[indices])
+    r2 = r2_score(y_val, modelo.predict(X_val))
+
+    return {
+        'score': float(r2),
+        'tempo': time.perf_counter() - inicio,
+        'tempo_cpu': time.process_time() - inicio_cpu
+    }
 
 class CarPricePredictor:
-    def __init__(self, file_path):
-        """Inicializa o preditor de preços de carros."""
+    def __init__(self, file_path, precisao=None, motor=None):
+        """Inicializa o preditor de preços de carros.
+
+        :param precisao: 'float64' ou 'float32' para a matriz de características (padrão: PISI3_PRECISAO).
+        :param motor: 'random_forest' ou 'hist_gradient_boosting' (padrão: PISI3_MOTOR).
+        """
         self.file_path = file_path
+        self.precisao = precisao
+        self.motor = nome_motor(motor)
+        self.categorias = {}
         self.data = None
         self.model = None
         self.features = None
         self.target = None
+        self.feature_columns = None
+        self.explicador = None
+        self.texto = None
+        self.extrator = None
 
     def load_data(self):
         """Carrega o dataset clusterizado."""
@@ -23,29 +74,57 @@ class CarPricePredictor:
         except Exception as e:
             print(f"Erro ao carregar os dados: {e}")
 
-    def prepare_data(self, feature_columns, target_column):
-        """Prepara os dados para o treinamento do modelo."""
+    def prepare_data(self, feature_columns, target_column, texto=None):
+        """Prepara os dados para o treinamento do modelo.
+
+        :param texto: MatrizTexto com as características de texto do dump (opcional).
+                      As linhas são buscadas pela coluna 'Ad ID' dos dados.
+        """
         if self.data is not None:
-            self.features = self.data[feature_columns]
+            self.feature_columns = list(feature_columns)
+            features = self.data[feature_columns]
+            if self.motor == 'hist_gradient_boosting':
+                # Colunas categóricas de texto viram códigos, tratados como categorias nativas pelo modelo
+                features, self.categorias = codificar_categoricas(features)
+            self.features = para_calculo(features, self.precisao)
             self.target = self.data[target_column]
+            self.texto, self.extrator = None, None
+            if texto is not None and self.motor != 'random_forest':
+                print("Aviso: o gradient boosting não aceita matrizes esparsas; características de texto ignoradas.")
+            elif texto is not None and COLUNA_ID in self.data.columns:
+                self.texto = texto.linhas(self.data[COLUNA_ID])
+                self.extrator = texto.extrator()
+            elif texto is not None:
+                print(f"Aviso: os dados não têm a coluna '{COLUNA_ID}'; características de texto ignoradas.")
             print("Dados preparados para treinamento.")
         else:
             print("Erro: Os dados não foram carregados.")
 
-    def train_model(self, test_size=0.3, random_state=42):
-        """Treina o modelo Random Forest para previsão de preços."""
+    def _entrada(self, features, texto):
+        """Matriz de entrada do modelo: as características tabulares, mais as de texto se o modelo as usa."""
+        return features if texto is None else combinar(features, texto)
+
+    def train_model(self, test_size=0.3, random_state=42, params=None):
+        """Treina o modelo de previsão de preços com o motor escolhido.
+
+        :param params: Hiperparâmetros do estimador (ex.: a melhor configuração
+                       encontrada por tune_model). Se None, usa os padrões.
+        """
         if self.features is not None and self.target is not None:
             X_train, X_test, y_train, y_test = train_test_split(
-                self.features, self.target, test_size=test_size, random_state=random_state
+                self._entrada(self.features, self.texto), self.target, test_size=test_size, random_state=random_state
             )
 
             # Treinamento do modelo
-            self.model = RandomForestRegressor(random_state=random_state)
-            self.model.fit(X_train, y_train)
-            print("Modelo Random Forest treinado com sucesso.")
+            self.model = criar_modelo('regressao', self.motor, self.feature_columns, random_state, **(params or {}))
+            ajustar(self.model, X_train, y_train)
+            if self.motor == 'random_forest':
+                print("Modelo Random Forest treinado com sucesso.")
+            else:
+                print(f"Modelo de gradient boosting treinado com sucesso ({self.model.n_iter_} iterações).")
 
             # Avaliação do modelo
-            predictions = self.model.predict(X_test)
+            predictions = prever(self.model, X_test)
             mse = mean_squared_error(y_test, predictions)
             r2 = r2_score(y_test, predictions)
 
@@ -54,10 +133,204 @@ class CarPricePredictor:
         else:
             print("Erro: Os dados de treino não foram preparados.")
 
+    def tune_model(self, output_file, search_space=None, n_candidates=27, eta=3,
+                   min_samples=500, min_trees=10, max_trees=300,
+                   time_budget=600, cpu_budget=None, n_jobs=-1,
+                   test_size=0.3, random_state=42):
+        """Busca hiperparâmetros por successive halving sobre tamanho da amostra e número de árvores.
+
+        A cada rodada todos os candidatos restantes são avaliados em paralelo com
+        mais dados e mais árvores, e apenas o melhor 1/eta segue para a próxima.
+        A busca usa somente a parte de treino da divisão usada em train_model,
+        separando dela um conjunto de validação; o teste continua intocado.
+        As rodadas usam poucas árvores só para comparar os candidatos: a
+        configuração retornada traz os hiperparâmetros do melhor com
+        n_estimators = max_trees, o número de árvores do modelo final.
+
+        :param output_file: Arquivo JSON onde a melhor configuração e o histórico são salvos.
+        :param search_space: Dicionário {hiperparâmetro: valores}. Padrão: ESPACO_BUSCA_PADRAO.
+        :param time_budget: Orçamento de tempo de relógio em segundos (None = sem limite).
+        :param cpu_budget: Orçamento de tempo de CPU somado dos candidatos, em segundos (None = sem limite).
+        :param n_jobs: Número de candidatos avaliados em paralelo (-1 = núcleos concedidos
+                       pelo controlador de recursos).
+        :return: Dicionário com a melhor configuração, ou None se os dados não foram preparados.
+        """
+        if self.features is None or self.target is None:
+            print("Erro: Os dados de treino não foram preparados.")
+            return None
+        if self.motor != 'random_forest':
+            print("Aviso: a busca é do Random Forest; no gradient boosting o early stopping define as iterações.")
+            return None
+
+        X_train, _, y_train, _ = train_test_split(
+            self._entrada(self.features, self.texto), self.target, test_size=test_size, random_state=random_state
+        )
+        X_train, X_val, y_train, y_val = train_test_split(
+            X_train, y_train, test_size=0.25, random_state=random_state
+        )
+
+        # Sorteio dos candidatos no espaço de busca
+        search_space = search_space or ESPACO_BUSCA_PADRAO
+        rng = np.random.RandomState(random_state)
+        candidatos = []
+        for _ in range(n_candidates):
+            params = {nome: valores[rng.randint(len(valores))] for nome, valores in search_space.items()}
+            if params not in candidatos:
+                candidatos.append(params)
+
+        inicio = time.perf_counter()
+        cpu_total = 0.0
+        historico = []
+        melhor = None
+        rodada = 0
+
+        def orcamento_esgotado():
+            if time_budget is not None and time.perf_counter() - inicio >= time_budget:
+                return True
+            return cpu_budget is not None and cpu_total >= cpu_budget
+
+        with obter_controlador().reservar() as nucleos, \
+                Parallel(n_jobs=nucleos if n_jobs == -1 else n_jobs) as paralelo:
+            n_workers = paralelo.n_jobs
+            while candidatos and not orcamento_esgotado():
+                n_amostras = min(X_train.shape[0], min_samples * eta ** rodada)
+                n_arvores = min(max_trees, min_trees * eta ** rodada)
+                print(f"Rodada {rodada}: {len(candidatos)} candidatos, "
+                      f"{n_amostras} amostras, {n_arvores} árvores.")
+
+                # Avalia em lotes do tamanho do pool para checar o orçamento entre lotes
+                resultados = []
+                for i in range(0, len(candidatos), n_workers):
+                    if resultados and orcamento_esgotado():
+                        break
+                    lote = candidatos[i:i + n_workers]
+                    resultados.extend(paralelo(
+                        delayed(_avaliar_candidato)(params, X_train, y_train, X_val, y_val,
+                                                    n_amostras, n_arvores, random_state)
+                        for params in lote
+                    ))
+                    cpu_total += sum(r['tempo_cpu'] for r in resultados[-len(lote):])
+
+                for params, resultado in zip(candidatos, resultados):
+                    historico.append({'rodada': rodada, 'n_amostras': int(n_amostras),
+                                      'n_arvores': int(n_arvores), 'params': params, **resultado})
+
+                # Rodada incompleta só é usada se nenhuma rodada anterior terminou
+                avaliados = sorted(zip(candidatos, resultados), key=lambda c: c[1]['score'], reverse=True)
+                if len(resultados) == len(candidatos) or melhor is None:
+                    params, resultado = avaliados[0]
+                    melhor = {'params': params, 'n_arvores': int(n_arvores), 'score': resultado['score']}
+                if len(resultados) < len(candidatos):
+                    break
+
+                if len(candidatos) == 1 or (n_amostras == X_train.shape[0] and n_arvores == max_trees):
+                    break
+                candidatos = [params for params, _ in avaliados[:max(1, math.ceil(len(candidatos) / eta))]]
+                rodada += 1
+
+        if melhor is None:
+            print("Erro: O orçamento se esgotou antes de avaliar qualquer candidato.")
+            return None
+
+        busca = {
+            'melhor_configuracao': {**melhor['params'], 'n_estimators': max_trees},
+            'melhor_score_r2': melhor['score'],
+            # Árvores da rodada em que o score acima foi medido
+            'n_arvores_avaliadas': melhor['n_arvores'],
+            'tempo_total': time.perf_counter() - inicio,
+            'tempo_cpu_total': cpu_total,
+            'historico': historico
+        }
+        try:
+            with open(output_file, 'w', encoding='utf-8') as arquivo:
+                json.dump(busca, arquivo, ensure_ascii=False, indent=2)
+            print(f"Melhor configuração (R2 = {melhor['score']:.4f}) salva em: {output_file}")
+        except Exception as e:
+            print(f"Erro ao salvar a busca: {e}")
+
+        return busca['melhor_configuracao']
+
+    @staticmethod
+    def load_best_params(search_file):
+        """Lê a melhor configuração salva por tune_model."""
+        try:
+            with open(search_file, encoding='utf-8') as arquivo:
+                return json.load(arquivo)['melhor_configuracao']
+        except FileNotFoundError:
+            print(f"Erro: O arquivo {search_file} não foi encontrado.")
+            return None
+
+    def save_model(self, output_file):
+        """Salva o modelo treinado e as colunas de entrada."""
+        if self.model is not None:
+            joblib.dump({'model': self.model, 'feature_columns': self.feature_columns,
+                         'precisao': self.precisao, 'motor': self.motor, 'categorias': self.categorias,
+                         'texto': self.extrator.configuracao() if self.extrator is not None else None}, output_file)
+            print(f"Modelo salvo em: {output_file}")
+        else:
+            print("Erro: O modelo não está treinado.")
+
+    def load_model(self, model_file):
+        """Carrega um modelo salvo por save_model."""
+        try:
+            saved = joblib.load(model_file)
+            self.model = saved['model']
+            self.feature_columns = saved['feature_columns']
+            self.precisao = saved.get('precisao', self.precisao)
+            self.motor = saved.get('motor', 'random_forest')
+            self.categorias = saved.get('categorias', {})
+            texto = saved.get('texto')
+            self.extrator = ExtratorTexto.de_configuracao(texto) if texto is not None else None
+            print("Modelo carregado com sucesso.")
+        except FileNotFoundError:
+            print(f"Erro: O arquivo {model_file} não foi encontrado.")
+
+    def predict(self, new_data):
+        """Prevê o preço de linhas novas com o modelo treinado ou carregado."""
+        if self.model is None:
+            print("Erro: O modelo não está treinado.")
+            return None
+        return prever(self.model, self._entrada_nova(new_data))
+
+    def _entrada_nova(self, new_data):
+        """Entrada do modelo para linhas novas; o texto (se usado) é transformado na hora pelo extrator."""
+        features = new_data[self.feature_columns]
+        if self.motor == 'hist_gradient_boosting':
+            features, _ = codificar_categoricas(features, self.categorias)
+        features = para_calculo(features, self.precisao)
+        return self._entrada(features, None if self.extrator is None else self.extrator.transformar(new_data))
+
+    def explain(self, new_data):
+        """Decompõe o preço previsto de cada linha em valor base + contribuição de cada característica.
+
+        Retorna um DataFrame com a coluna 'base', uma coluna de contribuição por
+        característica e 'Predicted Price' (a soma de todas, igual a predict).
+        Com características de texto, as contribuições dos buckets de hash são
+        somadas em 'descricao' e 'itens'.
+        """
+        if self.model is None:
+            print("Erro: O modelo não está treinado.")
+            return None
+        if self.motor != 'random_forest':
+            print("Erro: As contribuições por característica estão disponíveis apenas para o Random Forest.")
+            return None
+        # As variações dos nós são calculadas uma vez por modelo
+        if self.explicador is None or self.explicador.modelo is not self.model:
+            self.explicador = ContribuicoesFloresta(self.model)
+        valores = self.explicador.calcular(self._entrada_nova(new_data))[:, :, 0]
+        n = len(self.feature_columns)
+        contribuicoes = pd.DataFrame(valores[:, :n], columns=self.feature_columns, index=new_data.index)
+        if self.extrator is not None:
+            contribuicoes['descricao'] = valores[:, n:n + self.extrator.n_descricao].sum(axis=1)
+            contribuicoes['itens'] = valores[:, n + self.extrator.n_descricao:].sum(axis=1)
+        contribuicoes.insert(0, 'base', self.explicador.valor_base())
+        contribuicoes['Predicted Price'] = contribuicoes.sum(axis=1)
+        return contribuicoes
+
     def save_predictions(self, output_file):
         """Gera previsões e salva os dados atualizados no local especificado."""
         if self.model is not None and self.features is not None:
-            self.data['Predicted Price'] = self.model.predict(self.features)
+            self.data['Predicted Price'] = prever(self.model, self._entrada(self.features, self.texto))
             try:
                 self.data.to_csv(output_file, index=False)
                 print(f"Dados com previsões salvos em: {output_file}")
@@ -66,16 +339,109 @@ class CarPricePredictor:
         else:
             print("Erro: O modelo não está treinado ou os dados não estão disponíveis.")
 
-# Caminho do arquivo clusterizado e de saída
-input_file_path = os.path.join(os.path.expanduser('~'), 'Desktop', '02_Cars_dataset_clusterizado.csv')
-output_file_path = os.path.join(os.path.expanduser('~'), 'Desktop', '03_Cars_predictions.csv')
+    def save_predictions_parquet(self, output_dir, chunk_size=100000, n_jobs=-1):
+        """Gera previsões em blocos paralelos e grava apenas id da linha e 'Predicted Price' em Parquet.
+
+        Cada bloco vira um arquivo part-NNNNN.parquet no diretório de saída,
+        gravado em arquivo temporário e renomeado ao final, então um bloco
+        existente está sempre completo. Se a execução for interrompida, a
+        próxima chamada com o mesmo modelo e os mesmos dados pula os blocos
+        já gravados. O resultado pode ser lido com pd.read_parquet(output_dir).
+
+        :param output_dir: Diretório de saída das partes Parquet.
+        :param chunk_size: Número de linhas por bloco.
+        :param n_jobs: Número de blocos previstos em paralelo (-1 = núcleos concedidos
+                       pelo controlador de recursos).
+        """
+        if self.model is None or self.features is None:
+            print("Erro: O modelo não está treinado ou os dados não estão disponíveis.")
+            return
+
+        os.makedirs(output_dir, exist_ok=True)
+        manifest_path = os.path.join(output_dir, '_manifest.json')
+        n_chunks = math.ceil(len(self.features) / chunk_size)
+        manifest = {
+            'n_linhas': len(self.features),
+            'colunas': list(self.features.columns),
+            # Conteúdo das linhas (valores e índice) e das características de texto:
+            # um CSV regravado com o mesmo formato não reaproveita partes antigas
+            'dados': str(pd.util.hash_pandas_object(self.features).sum()),
+            'texto': None if self.texto is None else joblib.hash(self.texto),
+            'chunk_size': chunk_size,
+            'motor': self.motor,
+            # Hash das árvores ajustadas: n_jobs muda a cada reserva do controlador e não altera o modelo
+            'modelo': joblib.hash(getattr(self.model, 'estimators_', self.model))
+        }
+
+        # Partes de outro modelo, outros dados ou outro tamanho de bloco não podem ser reaproveitadas
+        try:
+            with open(manifest_path, encoding='utf-8') as arquivo:
+                anterior = json.load(arquivo)
+        except (FileNotFoundError, json.JSONDecodeError):
+            anterior = None
+        if anterior is None or {k: anterior.get(k) for k in manifest} != manifest:
+            for nome in os.listdir(output_dir):
+                if nome.startswith('part-'):
+                    os.remove(os.path.join(output_dir, nome))
+            with open(manifest_path, 'w', encoding='utf-8') as arquivo:
+                json.dump({**manifest, 'concluido': False}, arquivo, indent=2)
+
+        def part_path(i):
+            return os.path.join(output_dir, f'part-{i:05d}.parquet')
+
+        def predict_chunk(i):
+            bloco = self.features.iloc[i * chunk_size:(i + 1) * chunk_size]
+            texto = None if self.texto is None else self.texto[i * chunk_size:(i + 1) * chunk_size]
+            previsoes = pd.DataFrame({
+                'row_id': bloco.index.to_numpy(),
+                'Predicted Price': prever(self.model, self._entrada(bloco, texto))
+            })
+            temporario = os.path.join(output_dir, f'.part-{i:05d}.parquet.tmp')
+            previsoes.to_parquet(temporario, index=False)
+            os.replace(temporario, part_path(i))
+            return i
+
+        pendentes = [i for i in range(n_chunks) if not os.path.exists(part_path(i))]
+        if len(pendentes) < n_chunks:
+            print(f"Retomando: {n_chunks - len(pendentes)} de {n_chunks} blocos já gravados.")
+
+        # prever ajusta o n_jobs do modelo a cada bloco; o valor original volta no final
+        parametros_anteriores = {k: v for k, v in self.model.get_params().items() if k == 'n_jobs'}
+        try:
+            # A predição das árvores libera o GIL, então threads bastam e evitam copiar o modelo.
+            # Um bloco por núcleo concedido agora; cada bloco reserva a sua fatia em prever,
+            # que com todos os blocos em andamento fica perto de um núcleo por bloco.
+            with obter_controlador().reservar() as nucleos:
+                n_blocos = nucleos if n_jobs == -1 else n_jobs
+            with ThreadPoolExecutor(max_workers=n_blocos) as executor:
+                for _ in executor.map(predict_chunk, pendentes):
+                    pass
+            with open(manifest_path, 'w', encoding='utf-8') as arquivo:
+                json.dump({**manifest, 'concluido': True}, arquivo, indent=2)
+            print(f"Previsões salvas em: {output_dir}")
+        except Exception as e:
+            print(f"Erro ao salvar as previsões: {e}")
+        finally:
+            self.model.set_params(**parametros_anteriores)
+
+if __name__ == "__main__":
+    # Caminho do arquivo clusterizado e de saída
+    input_file_path = os.path.join(os.path.expanduser('~'), 'Desktop', '02_Cars_dataset_clusterizado.csv')
+    output_file_path = os.path.join(os.path.expanduser('~'), 'Desktop', '03_Cars_predictions.csv')
+    search_file_path = os.path.join(os.path.expanduser('~'), 'Desktop', '03_Busca_Random_Forest.json')
+    model_file_path = os.path.join(os.path.expanduser('~'), 'Desktop', '03_Modelo_Random_Forest.joblib')
+    tune = False  # True = busca hiperparâmetros (até 10 minutos) antes do treino final
 
-# Instância da classe CarPricePredictor
-predictor = CarPricePredictor(input_file_path)
+    # Instância da classe CarPricePredictor
+    predictor = CarPricePredictor(input_file_path)
 
-# Execução do pipeline de previsão
-predictor.load_data()
-features = ['quilometragem', 'Car Age', 'Cluster']  # Seleção de recursos relevantes
-predictor.prepare_data(features, target_column='preco')
-predictor.train_model()
-predictor.save_predictions(output_file_path)
+    # Execução do pipeline de previsão
+    predictor.load_data()
+    features = ['quilometragem', 'Car Age', 'Cluster']  # Seleção de recursos relevantes
+    predictor.prepare_data(features, target_column='preco')
+    best_params = predictor.tune_model(search_file_path, time_budget=600) if tune else None
+    predictor.train_model(params=best_params)
+    predictor.save_predictions(output_file_path)
+    predictor.save_model(model_file_path)
+    # Sidecar colunar apenas com id da linha e preço previsto (retomável)
+    predictor.save_predictions_parquet(os.path.splitext(output_file_path)[0] + '_previsoes')
@@ -6,17 +6,98 @@ from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.metrics import classification_report, accuracy_score
+from sklearn.neighbors import NearestNeighbors
+from sklearn.utils.class_weight import compute_sample_weight
+from sklearn.utils.validation import has_fit_parameter
 from imblearn.over_sampling import SMOTE
+import joblib
 import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Utility.recursos import ajustar, prever
+
+# Estratégias de reamostragem aceitas em train_evaluate
+AMOSTRADORES = (None, 'smote', 'smote_aproximado', 'peso_classes')
+
+def _smote_aproximado(X, y, k_neighbors=5, max_reference=2000, random_state=42):
+    """SMOTE com vizinhos buscados em uma amostra de referência limitada de cada classe.
+
+    O SMOTE exato procura os k vizinhos entre todos os exemplos da classe, o que
+    cresce com o quadrado do tamanho da classe. Aqui os vizinhos vêm de no máximo
+    max_reference exemplos sorteados, então o custo fica linear no número de
+    amostras sintéticas geradas.
+    """
+    rng = np.random.RandomState(random_state)
+    X_array = np.asarray(X, dtype=float)
+    y_array = np.asarray(y)
+    classes, contagens = np.unique(y_array, return_counts=True)
+    alvo = contagens.max()
+
+    X_novos, y_novos = [X_array], [y_array]
+    for classe, contagem in zip(classes, contagens):
+        n_sinteticos = alvo - contagem
+        if n_sinteticos == 0:
+            continue
+        if contagem < 2:
+            # Sem vizinhos para interpolar, a classe continua minoritária no treino
+            print(f"Aviso: a classe {classe} tem só {contagem} exemplo no treino; "
+                  f"SMOTE não gera amostras sintéticas para ela.")
+            continue
+        X_classe = X_array[y_array == classe]
+        referencia = X_classe[rng.choice(contagem, min(contagem, max_reference), replace=False)]
+        k = min(k_neighbors + 1, len(referencia))
+        vizinhos = NearestNeighbors(n_neighbors=k).fit(referencia)
+
+        bases = X_classe[rng.randint(contagem, size=n_sinteticos)]
+        distancias, indices = vizinhos.kneighbors(bases)
+        # Com mais de max_reference exemplos a base pode não estar na referência:
+        # só quando está (distância zero) o primeiro vizinho é ela mesma e sai
+        na_referencia = distancias[:, :1] == 0
+        indices = np.where(na_referencia, indices[:, 1:], indices[:, :-1])
+        escolhidos = referencia[indices[np.arange(n_sinteticos), rng.randint(indices.shape[1], size=n_sinteticos)]]
+        passo = rng.uniform(size=(n_sinteticos, 1))
+        X_novos.append(bases + passo * (escolhidos - bases))
+        y_novos.append(np.full(n_sinteticos, classe, dtype=y_array.dtype))
+
+    X_reamostrado = np.vstack(X_novos)
+    if isinstance(X, pd.DataFrame):
+        X_reamostrado = pd.DataFrame(X_reamostrado, columns=X.columns)
+    y_reamostrado = np.concatenate(y_novos)
+    if isinstance(y, pd.Series):
+        y_reamostrado = pd.Series(y_reamostrado, name=y.name)
+    return X_reamostrado, y_reamostrado
+
+def _dividir_e_reamostrar(features, target, test_size, random_state, sampler):
+    """Divide os dados e aplica a reamostragem no conjunto de treino."""
+    X_train, X_test, y_train, y_test = train_test_split(
+        features, target, test_size=test_size, random_state=random_state
+    )
+    sample_weight = None
+
+    if sampler == 'smote':
+        X_train, y_train = SMOTE(random_state=random_state).fit_resample(X_train, y_train)
+    elif sampler == 'smote_aproximado':
+        X_train, y_train = _smote_aproximado(X_train, y_train, random_state=random_state)
+    elif sampler == 'peso_classes':
+        sample_weight = compute_sample_weight('balanced', y_train)
+
+    return X_train, X_test, y_train, y_test, sample_weight
 
 class ModelEvaluation:
-    def __init__(self, file_path, target_column):
+    def __init__(self, file_path, target_column, cache_dir=None):
+        """
+        :param cache_dir: Diretório para guardar em disco as divisões reamostradas
+                          entre execuções. Se None, o cache fica só em memória.
+        """
         self.file_path = file_path
         self.target_column = target_column
         self.data = None
         self.features = None
         self.target = None
         self.results = []
+        self.data_hash = None
+        self.splits = {}
+        self.memory = joblib.Memory(cache_dir, verbose=0) if cache_dir else None
 
     def load_data(self):
         try:
@@ -31,23 +112,43 @@ class ModelEvaluation:
         if self.data is not None:
             self.features = self.data[feature_columns]
             self.target = self.data[self.target_column]
+            self.data_hash = joblib.hash((self.features, self.target))
             print("Dados preparados para treinamento e teste.")
         else:
             print("Erro: Os dados não foram carregados.")
 
-    def train_evaluate(self, model, model_name, use_smote=False):
+    def get_split(self, sampler=None, test_size=0.3, random_state=42):
+        """Retorna a divisão treino/teste reamostrada, calculada uma vez por (dados, semente, amostrador)."""
+        if sampler not in AMOSTRADORES:
+            raise ValueError(f"Amostrador inválido: {sampler}. Opções: {AMOSTRADORES}")
+
+        key = (self.data_hash, test_size, random_state, sampler)
+        if key not in self.splits:
+            dividir = self.memory.cache(_dividir_e_reamostrar) if self.memory else _dividir_e_reamostrar
+            self.splits[key] = dividir(self.features, self.target, test_size, random_state, sampler)
+            if sampler:
+                print(f"Reamostragem '{sampler}' calculada para o conjunto de treino.")
+        return self.splits[key]
+
+    def train_evaluate(self, model, model_name, use_smote=False, sampler=None):
+        """Treina e avalia um modelo sobre a divisão compartilhada.
+
+        :param use_smote: Mantido por compatibilidade; equivale a sampler='smote'.
+        :param sampler: None, 'smote', 'smote_aproximado' (vizinhos em amostra limitada,
+                        para bases grandes) ou 'peso_classes' (sem gerar amostras).
+        """
         if self.features is not None and self.target is not None:
-            X_train, X_test, y_train, y_test = train_test_split(
-                self.features, self.target, test_size=0.3, random_state=42
-            )
-
-            if use_smote:
-                smote = SMOTE(random_state=42)
-                X_train, y_train = smote.fit_resample(X_train, y_train)
-                print(f"SMOTE aplicado ao modelo {model_name}.")
-
-            model.fit(X_train, y_train)
-            predictions = model.predict(X_test)
+            if use_smote and sampler is None:
+                sampler = 'smote'
+            X_train, X_test, y_train, y_test, sample_weight = self.get_split(sampler)
+
+            if sample_weight is not None and has_fit_parameter(model, 'sample_weight'):
+                ajustar(model, X_train, y_train, sample_weight=sample_weight)
+            else:
+                if sample_weight is not None:
+                    print(f"Aviso: {model_name} não aceita pesos por amostra; treinando sem pesos.")
+                ajustar(model, X_train, y_train)
+            predictions = prever(model, X_test)
 
             report = classification_report(y_test, predictions, output_dict=True)
             accuracy = accuracy_score(y_test, predictions)
@@ -101,19 +202,23 @@ class ModelEvaluation:
         except Exception as e:
             print(f"Erro ao salvar os resultados: {e}")
 
-input_file_path = os.path.join(os.path.expanduser('~'), 'Desktop', '3_Cars_predictions.csv')
-output_file_path = os.path.join(os.path.expanduser('~'), 'Desktop', 'Evalucao_Modelos.csv')
+if __name__ == "__main__":
+    input_file_path = os.path.join(os.path.expanduser('~'), 'Desktop', '3_Cars_predictions.csv')
+    output_file_path = os.path.join(os.path.expanduser('~'), 'Desktop', 'Evalucao_Modelos.csv')
+
+    cache_dir = os.path.join(os.path.expanduser('~'), 'Desktop', 'cache_avaliacao')
+    sampler = None  # None, 'smote', 'smote_aproximado' ou 'peso_classes'
 
-evaluator = ModelEvaluation(input_file_path, target_column='Cluster')
+    evaluator = ModelEvaluation(input_file_path, target_column='Cluster', cache_dir=cache_dir)
 
-evaluator.load_data()
-features = ['quilometragem', 'Car Age', 'Cluster']
-evaluator.prepare_data(features)
+    evaluator.load_data()
+    features = ['quilometragem', 'Car Age', 'Cluster']
+    evaluator.prepare_data(features)
 
-evaluator.train_evaluate(SVC(), "SVM")
-evaluator.train_evaluate(RandomForestClassifier(), "Random Forest")
-evaluator.train_evaluate(KNeighborsClassifier(), "KNN")
-evaluator.train_evaluate(GradientBoostingClassifier(), "Gradient Boosting")
-evaluator.train_evaluate(DecisionTreeClassifier(), "Decision Tree")
+    evaluator.train_evaluate(SVC(), "SVM", sampler=sampler)
+    evaluator.train_evaluate(RandomForestClassifier(), "Random Forest", sampler=sampler)
+    evaluator.train_evaluate(KNeighborsClassifier(), "KNN", sampler=sampler)
+    evaluator.train_evaluate(GradientBoostingClassifier(), "Gradient Boosting", sampler=sampler)
+    evaluator.train_evaluate(DecisionTreeClassifier(), "Decision Tree", sampler=sampler)
 
-evaluator.save_results(output_file_path)
+    evaluator.save_results(output_file_path)
@@ -4,6 +4,10 @@ from sklearn.cluster import KMeans
 import seaborn as sns
 from sklearn.metrics import confusion_matrix  # Adicionando a importação
 import numpy as np  # Adicionando a importação de numpy
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Utility.recursos import ajustar, ajustar_prever
 
 class CarClusterAnalysis:
     def __init__(self, data):
@@ -16,7 +20,7 @@ class CarClusterAnalysis:
         inertia = []
         for k in range(1, max_clusters + 1):
             kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
-            kmeans.fit(self.X)
+            ajustar(kmeans, self.X)
             inertia.append(kmeans.inertia_)
         
         plt.figure(figsize=(10, 6))
@@ -29,7 +33,7 @@ class CarClusterAnalysis:
 
     def perform_clustering(self, n_clusters):
         self.kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-        self.data['Cluster_Pred'] = self.kmeans.fit_predict(self.X)
+        self.data['Cluster_Pred'] = ajustar_prever(self.kmeans, self.X)
 
         # Gerar uma paleta de cores diferentes para os clusters
         palette = sns.color_palette("Set2", n_colors=n_clusters)
@@ -0,0 +1,3 @@
+from .modulos import registrar_importador
+
+registrar_importador()
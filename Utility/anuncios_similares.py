@@ -0,0 +1,185 @@
+import argparse
+import os
+import sys
+
+import joblib
+import numpy as np
+from sklearn.neighbors import KDTree
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Utility.esquema import carregar_dataset, versao_dataset
+
+DIRETORIO_INDICES = os.path.join('Artefatos', 'similares')
+ARQUIVO_PADRAO = '1_Cars_processado.csv'
+
+# Os anúncios são particionados por marca e modelo; as demais categóricas
+# (poucas categorias cada) entram em one-hot na árvore de cada partição
+CHAVE_PARTICAO = ['marca', 'modelo']
+CARACTERISTICAS_CATEGORICAS = CHAVE_PARTICAO + ['combustivel', 'tipo', 'transmissão']
+CARACTERISTICAS_NUMERICAS = ['ano', 'quilometragem']
+COLUNAS_EXIBIDAS = CARACTERISTICAS_CATEGORICAS + CARACTERISTICAS_NUMERICAS + ['preco']
+
+# Peso das colunas one-hot em relação às numéricas normalizadas: uma categoria
+# diferente custa mais do que alguns desvios-padrão de ano ou quilometragem,
+# então os vizinhos são primeiro do mesmo modelo e só depois parecidos no uso.
+PESO_CATEGORIAS = 3.0
+
+class IndiceSimilares:
+    """
+    Índice de vizinhos mais próximos para buscar anúncios comparáveis, com
+    uma KDTree por marca e modelo sobre as demais características codificadas
+    e normalizadas (8 dimensões, em vez das ~60 do one-hot de todas as
+    categóricas numa árvore só).
+
+    A distância é a mesma do one-hot completo com peso 'peso_categorias':
+    marca ou modelo diferente somam uma penalidade fixa à distância dentro da
+    partição. A busca percorre as partições da menor penalidade para a maior
+    e para quando a penalidade já passa do k-ésimo vizinho encontrado, então
+    na maioria das consultas só a partição da própria marca e modelo é lida.
+    """
+    def __init__(self, peso_categorias=PESO_CATEGORIAS):
+        self.peso_categorias = peso_categorias
+        self.codificador = None
+        self.normalizador = None
+        self.particoes = None
+        self.anuncios = None
+        self.versao = None
+
+    def _codificar(self, df):
+        restantes = [coluna for coluna in CARACTERISTICAS_CATEGORICAS if coluna not in CHAVE_PARTICAO]
+        categoricas = self.codificador.transform(df[restantes]) * self.peso_categorias
+        numericas = self.normalizador.transform(df[CARACTERISTICAS_NUMERICAS])
+        return np.hstack([categoricas, numericas])
+
+    def construir(self, df, versao=None):
+        """Ajusta a codificação e monta uma árvore por marca e modelo sobre os anúncios do DataFrame."""
+        self.anuncios = df[COLUNAS_EXIBIDAS].reset_index(drop=True)
+        restantes = [coluna for coluna in CARACTERISTICAS_CATEGORICAS if coluna not in CHAVE_PARTICAO]
+        self.codificador = OneHotEncoder(handle_unknown='ignore', sparse_output=False)
+        self.codificador.fit(self.anuncios[restantes])
+        self.normalizador = StandardScaler().fit(self.anuncios[CARACTERISTICAS_NUMERICAS])
+        codificados = self._codificar(self.anuncios)
+        self.particoes = {chave: (KDTree(codificados[indices]), indices)
+                          for chave, indices in self.anuncios.groupby(CHAVE_PARTICAO, sort=True).indices.items()}
+        self.versao = versao
+        return self
+
+    def _penalidades(self, chave):
+        """
+        Quadrado da distância que marca e modelo somam em cada partição: 2·peso²
+        por valor diferente (duas posições do one-hot), ou peso² se o valor da
+        consulta nem aparece nos anúncios (one-hot zerado).
+        """
+        chaves = list(self.particoes)
+        penalidades = np.zeros(len(chaves))
+        for posicao, valor in enumerate(chave):
+            valores = np.array([chave_particao[posicao] for chave_particao in chaves], dtype=object)
+            diferente = 2.0 if (valores == valor).any() else 1.0
+            penalidades += np.where(valores == valor, 0.0, diferente * self.peso_categorias ** 2)
+        return chaves, penalidades
+
+    def consultar(self, entrada, k=5):
+        """
+        Retorna os k anúncios mais parecidos com a primeira linha de 'entrada',
+        com a distância no espaço codificado, do mais próximo ao mais distante.
+        """
+        k = min(k, len(self.anuncios))
+        consulta = entrada.iloc[:1]
+        codificada = self._codificar(consulta)
+        chaves, penalidades = self._penalidades(tuple(consulta[CHAVE_PARTICAO].iloc[0]))
+
+        distancias, indices = np.empty(0), np.empty(0, dtype=int)
+        for posicao in np.argsort(penalidades, kind='stable'):
+            if len(indices) == k and np.sqrt(penalidades[posicao]) > distancias[-1]:
+                break
+            arvore, linhas = self.particoes[chaves[posicao]]
+            locais, encontrados = arvore.query(codificada, k=min(k, len(linhas)))
+            distancias = np.concatenate([distancias, np.sqrt(penalidades[posicao] + locais[0] ** 2)])
+            indices = np.concatenate([indices, linhas[encontrados[0]]])
+            ordem = np.lexsort((indices, distancias))[:k]
+            distancias, indices = distancias[ordem], indices[ordem]
+
+        similares = self.anuncios.iloc[indices].copy()
+        similares['distancia'] = distancias
+        return similares
+
+    def salvar(self, caminho):
+        """Salva a codificação, as árvores das partições e os anúncios indexados."""
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = caminho + '.tmp'
+        joblib.dump({
+            'peso_categorias': self.peso_categorias,
+            'codificador': self.codificador,
+            'normalizador': self.normalizador,
+            'particoes': self.particoes,
+            'anuncios': self.anuncios,
+            'versao': self.versao
+        }, temporario)
+        os.replace(temporario, caminho)
+
+    @classmethod
+    def carregar(cls, caminho):
+        """
+        Carrega um índice salvo por salvar, sem reconstruir as árvores.
+        Retorna None para índices salvos antes da partição por marca e modelo.
+        """
+        salvo = joblib.load(caminho)
+        if 'particoes' not in salvo:
+            return None
+        indice = cls(salvo['peso_categorias'])
+        indice.codificador = salvo['codificador']
+        indice.normalizador = salvo['normalizador']
+        indice.particoes = salvo['particoes']
+        indice.anuncios = salvo['anuncios']
+        indice.versao = salvo['versao']
+        return indice
+
+def caminho_indice(nome_arquivo, versao, diretorio_indices=DIRETORIO_INDICES):
+    """Um arquivo por dataset e versão, então uma versão nova nunca lê o índice antigo."""
+    return os.path.join(diretorio_indices, f"{os.path.splitext(nome_arquivo)[0]}-{int(versao * 1000)}.joblib")
+
+def remover_indices_antigos(nome_arquivo, versao_minima, diretorio_indices=DIRETORIO_INDICES):
+    """Remove os índices do dataset de versões anteriores a versao_minima."""
+    prefixo = os.path.splitext(nome_arquivo)[0] + '-'
+    if not os.path.isdir(diretorio_indices):
+        return
+    for nome in os.listdir(diretorio_indices):
+        if nome.startswith(prefixo) and int(os.path.splitext(nome)[0][len(prefixo):]) < int(versao_minima * 1000):
+            try:
+                os.remove(os.path.join(diretorio_indices, nome))
+            except FileNotFoundError:
+                pass
+
+def obter_indice(nome_arquivo=ARQUIVO_PADRAO, versao=None, diretorio_indices=DIRETORIO_INDICES):
+    """
+    Carrega o índice da versão pedida do dataset (padrão: a do arquivo atual),
+    construindo e salvando se ainda não existir. O índice é construído a
+    partir do dataset tipado da mesma versão; se ela já saiu do disco, vale a
+    atual. Índices antigos são removidos pelo observador, depois da troca de
+    versão e de um período de carência (Utility/recarga.py).
+    """
+    atual = versao_dataset(nome_arquivo)
+    versao = atual if versao is None else versao
+    caminho = caminho_indice(nome_arquivo, versao, diretorio_indices)
+    indice = IndiceSimilares.carregar(caminho) if os.path.exists(caminho) else None
+    if indice is not None:
+        return indice
+    try:
+        dados = carregar_dataset(nome_arquivo, COLUNAS_EXIBIDAS, versao=versao)
+    except FileNotFoundError:
+        if versao == atual:
+            raise
+        print(f"[AVISO] Índice da versão {versao} de {nome_arquivo} indisponível; usando a versão atual.")
+        return obter_indice(nome_arquivo, atual, diretorio_indices)
+
+    indice = IndiceSimilares().construir(dados, versao)
+    indice.salvar(caminho)
+    print(f"[INFO] Índice de anúncios similares de {nome_arquivo} construído ({len(indice.anuncios)} anúncios).")
+    return indice
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Constrói o índice de anúncios similares do dataset.")
+    parser.add_argument("--arquivo", default=ARQUIVO_PADRAO, help="Dataset em Datas/ a indexar.")
+    args = parser.parse_args()
+    obter_indice(args.arquivo)
@@ -0,0 +1,101 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Utility.esquema import ESQUEMAS, DIRETORIO_DADOS, caminho_tipado, construir_tipados, versao_dataset
+from Utility.fila_tarefas import CONCLUIDA
+from Utility.modulos import importar_pagina
+
+# Páginas com computações pesadas; cada uma define aquecer(), que prepara a sua
+# configuração padrão e retorna as tarefas submetidas à fila
+PAGINAS_AQUECIDAS = [
+    os.path.join('pages', 'Classificação.py'),
+    os.path.join('pages', 'Clusterização.py'),
+    os.path.join('pages', 'avaliacoes_dos_modelos.py')
+]
+# Sinal de prontidão: existe somente depois de um aquecimento completo
+ARQUIVO_PRONTO = os.environ.get('PISI3_ARQUIVO_PRONTO', os.path.join('Artefatos', 'pronto.json'))
+
+def tipados_desatualizados(diretorio_dados=DIRETORIO_DADOS):
+    """Datasets sem Parquet tipado gravado para a versão atual do CSV."""
+    return [nome for nome in ESQUEMAS
+            if not os.path.isdir(caminho_tipado(nome, versao_dataset(nome, diretorio_dados)))]
+
+def aquecer_paginas(paginas=PAGINAS_AQUECIDAS):
+    """
+    Submete o aquecimento de cada página e espera as tarefas terminarem.
+    :return: {descrição da tarefa: estado final}.
+    """
+    tarefas = []
+    for caminho in paginas:
+        print(f"[INFO] Aquecendo {caminho}...")
+        tarefas.extend(importar_pagina(caminho).aquecer())
+    for tarefa in tarefas:
+        tarefa.aguardar()
+    return {tarefa.descricao: tarefa.estado for tarefa in tarefas}
+
+def aquecer(paginas=PAGINAS_AQUECIDAS, arquivo_pronto=None):
+    """
+    Pré-carrega datasets, índices e modelos da configuração padrão das páginas e
+    espera as tarefas da fila terminarem. Os resultados vão para o cache
+    compartilhado (memória e disco), então servem tanto a este processo quanto
+    ao servidor iniciado depois.
+    :param arquivo_pronto: Sinal de prontidão, refeito ao final. Só a execução
+                           de linha de comando, antes do servidor, o informa.
+    """
+    inicio = time.time()
+    if arquivo_pronto is not None and os.path.exists(arquivo_pronto):
+        os.remove(arquivo_pronto)
+
+    desatualizados = tipados_desatualizados()
+    if desatualizados:
+        construir_tipados(arquivos=desatualizados)
+
+    estados = aquecer_paginas(paginas)
+    falhas = [descricao for descricao, estado in estados.items() if estado != CONCLUIDA]
+    if falhas:
+        print(f"[ERRO] Aquecimento incompleto: {', '.join(falhas)}")
+        return False
+    print(f"[INFO] Aquecimento concluído em {time.time() - inicio:.1f}s.")
+    if arquivo_pronto is None:
+        return True
+
+    os.makedirs(os.path.dirname(arquivo_pronto) or '.', exist_ok=True)
+    with open(arquivo_pronto, 'w', encoding='utf-8') as arquivo:
+        json.dump({'pronto_em': time.strftime('%Y-%m-%d %H:%M:%S'),
+                   'duracao_segundos': round(time.time() - inicio, 1),
+                   'tarefas': estados}, arquivo, ensure_ascii=False, indent=2)
+    return True
+
+def esta_pronto(arquivo_pronto=ARQUIVO_PRONTO):
+    return os.path.exists(arquivo_pronto)
+
+_aquecimento = None
+_lock_aquecimento = threading.Lock()
+
+def iniciar_em_segundo_plano():
+    """
+    Inicia o aquecimento uma única vez por processo, numa thread, sem bloquear
+    quem chamou. Se o aquecimento de linha de comando já rodou (sinal de
+    prontidão presente, como na imagem Docker), não faz nada; o sinal nunca é
+    removido nem gravado por aqui.
+    """
+    global _aquecimento
+    with _lock_aquecimento:
+        if _aquecimento is None and not esta_pronto():
+            _aquecimento = threading.Thread(target=aquecer, name='aquecimento', daemon=True)
+            _aquecimento.start()
+        return _aquecimento
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aquece caches e modelos antes do primeiro acesso.")
+    parser.add_argument("--verificar", action="store_true",
+                        help="Só verifica o sinal de prontidão (código de saída 0 se pronto).")
+    args = parser.parse_args()
+    if args.verificar:
+        sys.exit(0 if esta_pronto() else 1)
+    sys.exit(0 if aquecer(arquivo_pronto=ARQUIVO_PRONTO) else 1)
@@ -0,0 +1,131 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn.metrics import accuracy_score, adjusted_rand_score, r2_score
+from sklearn.model_selection import train_test_split
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Utility.modulos import importar_etapa
+from Utility.precisao import PRECISOES
+from Utility.recursos import ajustar, prever
+
+DIRETORIO_DADOS = 'Datas'
+ARQUIVO_SAIDA = os.path.join('reports', 'benchmark_precisao.json')
+
+def _cronometrar(funcao):
+    inicio = time.perf_counter()
+    resultado = funcao()
+    return resultado, time.perf_counter() - inicio
+
+def medir_clusterizacao(precisao, diretorio_dados, n_clusters=5):
+    """K-Means sobre quilometragem, preço e idade normalizados, como em 2_Clusterizacao_dados."""
+    etapa = importar_etapa('2_Clusterizacao_dados.py')
+    clusterer = etapa.CarDataClusterer(os.path.join(diretorio_dados, '1_Cars_processado.csv'), precisao)
+    clusterer.load_data()
+    clusterer.add_car_age(2025)
+    X = clusterer.preprocess_for_clustering(['quilometragem', 'preco', 'Car Age'])
+    _, segundos = _cronometrar(lambda: clusterer.perform_clustering(X, n_clusters))
+    return {
+        'segundos': segundos,
+        'bytes_matriz': X.nbytes,
+        'inercia': float(clusterer.kmeans.inertia_),
+        'rotulos': clusterer.data['Cluster'].to_numpy()
+    }
+
+def medir_preco(precisao, diretorio_dados, random_state=42):
+    """Floresta de regressão de preço, como em 3_Random_Forest (ajuste e previsão com o controlador de recursos)."""
+    etapa = importar_etapa('3_Random_Forest.py')
+    predictor = etapa.CarPricePredictor(os.path.join(diretorio_dados, '2_Cars_clusterizado.csv'), precisao)
+    predictor.load_data()
+    predictor.prepare_data(['quilometragem', 'Car Age', 'Cluster'], target_column='preco')
+    X_train, X_test, y_train, y_test = train_test_split(
+        predictor.features, predictor.target, test_size=0.3, random_state=random_state
+    )
+    modelo = etapa.RandomForestRegressor(random_state=random_state)
+    _, segundos = _cronometrar(lambda: ajustar(modelo, X_train, y_train))
+    previsoes = prever(modelo, X_test)
+    return {
+        'segundos': segundos,
+        'bytes_matriz': int(predictor.features.memory_usage(index=False).sum()),
+        'r2': r2_score(y_test, previsoes),
+        'previsoes': previsoes
+    }
+
+def medir_classificacao(precisao, diretorio_dados, random_state=42):
+    """Floresta de classificação das faixas de preço, como em 1_Classificacao_dados."""
+    etapa = importar_etapa('1_Classificacao_dados.py')
+    classificador = etapa.ClassificadorCarros(precisao)
+    classificador.carregar_dados(os.path.join(diretorio_dados, '1_Cars_processado.csv'))
+    X, y = classificador.preprocessar_dados()
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=random_state)
+    _, segundos = _cronometrar(lambda: classificador.treinar_modelo(X_train, y_train))
+    previsoes = prever(classificador.modelo, X_test)
+    return {
+        'segundos': segundos,
+        'bytes_matriz': int(X.memory_usage(index=False).sum()),
+        'acuracia': accuracy_score(y_test, previsoes),
+        'previsoes': previsoes
+    }
+
+def comparar(diretorio_dados=DIRETORIO_DADOS, arquivo_saida=ARQUIVO_SAIDA):
+    """
+    Executa cada caminho de cálculo em float64 e em float32 e registra tempo,
+    memória da matriz de características, qualidade e concordância entre as duas
+    precisões. O resultado é impresso e gravado em JSON.
+    """
+    medidas = {nome: {precisao: medir(precisao, diretorio_dados) for precisao in PRECISOES}
+               for nome, medir in (('clusterizacao', medir_clusterizacao),
+                                   ('preco', medir_preco),
+                                   ('classificacao', medir_classificacao))}
+
+    c64, c32 = medidas['clusterizacao']['float64'], medidas['clusterizacao']['float32']
+    p64, p32 = medidas['preco']['float64'], medidas['preco']['float32']
+    k64, k32 = medidas['classificacao']['float64'], medidas['classificacao']['float32']
+    concordancia = {
+        'clusterizacao': {
+            'ari_rotulos': adjusted_rand_score(c64['rotulos'], c32['rotulos']),
+            'diferenca_relativa_inercia': abs(c32['inercia'] - c64['inercia']) / c64['inercia']
+        },
+        'preco': {
+            'diferenca_r2': p32['r2'] - p64['r2'],
+            'diferenca_relativa_maxima': float(np.max(np.abs(p32['previsoes'] - p64['previsoes']) /
+                                                      np.maximum(np.abs(p64['previsoes']), 1)))
+        },
+        'classificacao': {
+            'diferenca_acuracia': k32['acuracia'] - k64['acuracia'],
+            'previsoes_iguais': float(np.mean(k32['previsoes'] == k64['previsoes']))
+        }
+    }
+
+    relatorio = {
+        nome: {
+            'precisoes': {precisao: {chave: valor for chave, valor in medida.items()
+                                     if chave not in ('rotulos', 'previsoes')}
+                          for precisao, medida in por_precisao.items()},
+            'concordancia': concordancia[nome]
+        }
+        for nome, por_precisao in medidas.items()
+    }
+
+    for nome, dados in relatorio.items():
+        print(f"\n[{nome.upper()}]")
+        for precisao, medida in dados['precisoes'].items():
+            print(f"  {precisao}: " + ", ".join(f"{chave}={valor:.4g}" for chave, valor in medida.items()))
+        print("  concordância: " + ", ".join(f"{chave}={valor:.4g}" for chave, valor in dados['concordancia'].items()))
+
+    os.makedirs(os.path.dirname(arquivo_saida), exist_ok=True)
+    with open(arquivo_saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(relatorio, arquivo, ensure_ascii=False, indent=2)
+    print(f"\n[INFO] Resultado salvo em: {arquivo_saida}")
+    return relatorio
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara os caminhos de cálculo em float64 e float32.")
+    parser.add_argument("--dados", default=DIRETORIO_DADOS, help="Diretório com os CSVs derivados.")
+    parser.add_argument("--saida", default=ARQUIVO_SAIDA, help="Arquivo JSON do resultado.")
+    args = parser.parse_args()
+    comparar(args.dados, args.saida)
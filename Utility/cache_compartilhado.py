@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+
+import joblib
+
+DIRETORIO_CACHE = os.environ.get('PISI3_CACHE', os.path.join('Artefatos', 'cache'))
+# Espaço máximo dos resultados persistidos; os usados há mais tempo saem primeiro
+LIMITE_DISCO = int(os.environ.get('PISI3_LIMITE_DISCO_CACHE', 1024 ** 3))
+# Resultados não usados há mais que isto (segundos) são removidos, como os de
+# versões dos dados que já saíram de publicação
+IDADE_MAXIMA = float(os.environ.get('PISI3_IDADE_MAXIMA_CACHE', 7 * 24 * 3600))
+
+class CacheCompartilhado:
+    """
+    Cache de resultados compartilhado por todas as sessões do processo.
+    Os valores ficam em memória e, quando guardados com persistir=True, também
+    em disco (joblib), para sobreviver a reinícios e servir outros processos.
+    O disco é limitado a limite_disco bytes e idade_maxima segundos sem uso
+    (ver limpar); um resultado removido do disco sai também da memória.
+    """
+    def __init__(self, diretorio=DIRETORIO_CACHE, limite_disco=LIMITE_DISCO, idade_maxima=IDADE_MAXIMA):
+        self.diretorio = diretorio
+        self.limite_disco = limite_disco
+        self.idade_maxima = idade_maxima
+        self._memoria = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def chave(*partes):
+        """Gera uma chave estável a partir de qualquer combinação de valores serializáveis."""
+        return joblib.hash(partes)
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, f'{chave}.joblib')
+
+    def contem(self, chave):
+        with self._lock:
+            if chave in self._memoria:
+                return True
+        return os.path.exists(self._caminho(chave))
+
+    def obter(self, chave, padrao=None):
+        """Retorna o valor da memória ou, se não estiver lá, do disco."""
+        with self._lock:
+            if chave in self._memoria:
+                return self._memoria[chave]
+        try:
+            valor = joblib.load(self._caminho(chave))
+            # Marca o uso, para a limpeza remover primeiro os esquecidos
+            os.utime(self._caminho(chave))
+        except (FileNotFoundError, EOFError):
+            return padrao
+        with self._lock:
+            self._memoria[chave] = valor
+        return valor
+
+    def guardar(self, chave, valor, persistir=False):
+        with self._lock:
+            self._memoria[chave] = valor
+        if persistir:
+            os.makedirs(self.diretorio, exist_ok=True)
+            # Grava em arquivo temporário e renomeia, para nunca expor um arquivo pela metade
+            temporario = self._caminho(chave) + f'.{threading.get_ident()}.tmp'
+            joblib.dump(valor, temporario)
+            os.replace(temporario, self._caminho(chave))
+            self.limpar(manter=chave)
+
+    def limpar(self, manter=None):
+        """
+        Remove do disco os resultados sem uso há mais de idade_maxima e, se o
+        diretório ainda passar de limite_disco, os usados há mais tempo.
+        'manter' (o resultado recém-gravado) nunca é removido.
+        """
+        agora = time.time()
+        arquivos = []
+        for nome in os.listdir(self.diretorio):
+            if not nome.endswith('.joblib') or nome == f'{manter}.joblib':
+                continue
+            try:
+                estado = os.stat(os.path.join(self.diretorio, nome))
+            except FileNotFoundError:
+                continue
+            arquivos.append((estado.st_mtime, estado.st_size, nome[:-len('.joblib')]))
+
+        ocupado = sum(tamanho for _, tamanho, _ in arquivos)
+        if manter is not None and os.path.exists(self._caminho(manter)):
+            ocupado += os.path.getsize(self._caminho(manter))
+        for uso, tamanho, chave in sorted(arquivos):
+            if ocupado <= self.limite_disco and agora - uso <= self.idade_maxima:
+                continue
+            self.remover(chave)
+            ocupado -= tamanho
+
+    def remover(self, chave):
+        with self._lock:
+            self._memoria.pop(chave, None)
+        try:
+            os.remove(self._caminho(chave))
+        except FileNotFoundError:
+            pass
+
+_cache = None
+_lock_cache = threading.Lock()
+
+def obter_cache():
+    """Instância única do cache no processo do servidor."""
+    global _cache
+    with _lock_cache:
+        if _cache is None:
+            _cache = CacheCompartilhado()
+        return _cache
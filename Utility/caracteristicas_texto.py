@@ -0,0 +1,139 @@
+import argparse
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+
+# Colunas de texto do dump bruto da OLX descartadas no pré-processamento e o
+# identificador do anúncio usado para alinhar a matriz às linhas dos datasets.
+COLUNA_ID = 'Ad ID'
+COLUNA_DESCRICAO = 'Description'
+COLUNA_ITENS = 'Car Features'
+TAMANHO_BLOCO = 50000
+
+def _separar_itens(texto):
+    """Itens de 'Car Features' ('ABS, Air Bags, ...'): cada item é um token, sem partir em palavras."""
+    return [item.strip().lower() for item in re.split(r'[,;|\n]', texto) if item.strip()]
+
+class ExtratorTexto:
+    """
+    Características esparsas das colunas de texto dos anúncios, por hashing:
+    n-gramas de palavras da descrição e um indicador por item de 'Car Features'.
+    O hashing não tem vocabulário, então o extrator não precisa ser ajustado:
+    qualquer bloco de linhas é transformado sozinho, e o mesmo extrator
+    (salvo junto com o modelo) transforma os anúncios novos na previsão.
+    """
+    def __init__(self, n_descricao=2 ** 14, n_itens=2 ** 9, ngramas=(1, 2), precisao='float32'):
+        """
+        :param n_descricao: Colunas (buckets de hash) dos n-gramas da descrição.
+        :param n_itens: Colunas (buckets de hash) dos itens de 'Car Features'.
+        :param ngramas: Tamanhos mínimo e máximo dos n-gramas da descrição.
+        """
+        self.n_descricao = n_descricao
+        self.n_itens = n_itens
+        self.ngramas = tuple(ngramas)
+        self.precisao = precisao
+        self.descricao = HashingVectorizer(n_features=n_descricao, ngram_range=self.ngramas,
+                                           strip_accents='unicode', alternate_sign=False,
+                                           norm='l2', dtype=np.dtype(precisao))
+        self.itens = HashingVectorizer(n_features=n_itens, tokenizer=_separar_itens, token_pattern=None,
+                                       lowercase=False, alternate_sign=False, binary=True,
+                                       norm=None, dtype=np.dtype(precisao))
+
+    @property
+    def n_caracteristicas(self):
+        return self.n_descricao + self.n_itens
+
+    def configuracao(self):
+        return {'n_descricao': self.n_descricao, 'n_itens': self.n_itens,
+                'ngramas': list(self.ngramas), 'precisao': self.precisao}
+
+    def transformar(self, df):
+        """Matriz CSR (linhas de df × n_caracteristicas). Colunas de texto ausentes contam como vazias."""
+        textos = [df[coluna].fillna('').astype(str) if coluna in df.columns else pd.Series('', index=df.index)
+                  for coluna in (COLUNA_DESCRICAO, COLUNA_ITENS)]
+        return sparse.hstack([self.descricao.transform(textos[0]), self.itens.transform(textos[1])],
+                             format='csr')
+
+    def extrair_arquivo(self, caminho_dump, diretorio_saida, tamanho_bloco=TAMANHO_BLOCO):
+        """
+        Lê o dump bruto em blocos (só o id e as colunas de texto) e grava a
+        matriz esparsa de todas as linhas em diretorio_saida, com os ids na
+        mesma ordem. A memória usada depende do número de entradas não nulas,
+        e não de linhas × colunas.
+        :return: MatrizTexto gravada.
+        """
+        blocos, ids = [], []
+        for bloco in pd.read_csv(caminho_dump, usecols=lambda c: c in (COLUNA_ID, COLUNA_DESCRICAO, COLUNA_ITENS),
+                                 chunksize=tamanho_bloco):
+            blocos.append(self.transformar(bloco))
+            ids.append(bloco[COLUNA_ID].to_numpy())
+            print(f"[INFO] {sum(len(i) for i in ids)} linhas de texto processadas.")
+        matriz = MatrizTexto(sparse.vstack(blocos, format='csr'), np.concatenate(ids), self.configuracao())
+        matriz.salvar(diretorio_saida)
+        return matriz
+
+    @classmethod
+    def de_configuracao(cls, configuracao):
+        return cls(**configuracao)
+
+class MatrizTexto:
+    """
+    Matriz de características de texto gravada em disco (matriz.npz + ids.npy
+    + configuracao.json), com uma linha por anúncio do dump. As linhas são
+    buscadas pelo id do anúncio, então a matriz continua alinhada aos datasets
+    derivados mesmo depois da limpeza descartar ou reordenar linhas.
+    """
+    def __init__(self, matriz, ids, configuracao):
+        self.matriz = matriz.tocsr()
+        self.ids = np.asarray(ids)
+        self.configuracao = configuracao
+        # Anúncios repetidos no dump usam a primeira ocorrência
+        self._ids_unicos, self._primeiras = np.unique(self.ids, return_index=True)
+
+    def extrator(self):
+        """Extrator com a mesma configuração, para transformar anúncios novos."""
+        return ExtratorTexto.de_configuracao(self.configuracao)
+
+    def linhas(self, ids):
+        """Linhas da matriz na ordem de 'ids'; ids ausentes na matriz viram linhas vazias."""
+        ids = np.asarray(ids)
+        posicoes = np.minimum(np.searchsorted(self._ids_unicos, ids), len(self._ids_unicos) - 1)
+        encontrados = self._ids_unicos[posicoes] == ids
+        if not encontrados.all():
+            print(f"[AVISO] {np.count_nonzero(~encontrados)} ids sem texto extraído; usando linhas vazias.")
+        selecao = self.matriz[self._primeiras[posicoes]]
+        return sparse.diags(encontrados.astype(selecao.dtype)) @ selecao
+
+    def salvar(self, diretorio):
+        os.makedirs(diretorio, exist_ok=True)
+        sparse.save_npz(os.path.join(diretorio, 'matriz.npz'), self.matriz)
+        np.save(os.path.join(diretorio, 'ids.npy'), self.ids, allow_pickle=False)
+        with open(os.path.join(diretorio, 'configuracao.json'), 'w', encoding='utf-8') as arquivo:
+            json.dump(self.configuracao, arquivo, indent=2)
+        print(f"[INFO] Características de texto salvas em: {diretorio}\n")
+
+    @classmethod
+    def carregar(cls, diretorio):
+        with open(os.path.join(diretorio, 'configuracao.json'), encoding='utf-8') as arquivo:
+            configuracao = json.load(arquivo)
+        return cls(sparse.load_npz(os.path.join(diretorio, 'matriz.npz')),
+                   np.load(os.path.join(diretorio, 'ids.npy'), allow_pickle=False), configuracao)
+
+def combinar(caracteristicas, texto):
+    """Junta as características tabulares (DataFrame) e as de texto (CSR) numa única matriz CSR."""
+    tabulares = sparse.csr_matrix(caracteristicas.to_numpy())
+    return sparse.hstack([tabulares, texto], format='csr')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extrai as características de texto do dump bruto da OLX.")
+    parser.add_argument("arquivo", help="CSV do dump bruto, com 'Ad ID', 'Description' e 'Car Features'.")
+    parser.add_argument("saida", help="Diretório onde a matriz esparsa e os ids são gravados.")
+    parser.add_argument("--tamanho-bloco", type=int, default=TAMANHO_BLOCO)
+    args = parser.parse_args()
+
+    ExtratorTexto().extrair_arquivo(args.arquivo, args.saida, args.tamanho_bloco)
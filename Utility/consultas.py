@@ -0,0 +1,41 @@
+import pyarrow.compute as pc
+
+from .esquema import abrir_dataset, expressao_filtros
+
+# Consultas das páginas sobre os datasets tipados. Filtros (no formato de
+# esquema.expressao_filtros) e projeção de colunas são repassados à leitura do
+# Arrow, então o custo depende das linhas que atendem ao filtro, e não do
+# tamanho do dataset inteiro. 'versao' escolhe a versão do dataset lida
+# (padrão: a publicada, ver esquema.abrir_dataset).
+
+def _ler(nome_arquivo, colunas, filtros, versao):
+    leitura = list(dict.fromkeys(list(colunas) + list(filtros or {})))
+    dataset, _ = abrir_dataset(nome_arquivo, leitura, versao=versao)
+    return dataset.to_table(columns=list(dict.fromkeys(colunas)), filter=expressao_filtros(filtros))
+
+def agregar(nome_arquivo, grupos, agregacoes, filtros=None, versao=None):
+    """
+    Agrega o dataset por 'grupos' lendo só as colunas envolvidas.
+    :param agregacoes: {coluna_resultado: (coluna, funcao)}, com funções do Arrow
+                       ('sum', 'mean', 'count', 'min', 'max', ...); coluna None
+                       conta as linhas do grupo.
+    :return: DataFrame com as colunas de 'grupos' e as de 'agregacoes'.
+    """
+    colunas = list(grupos) + [coluna for coluna, _ in agregacoes.values() if coluna is not None]
+    tabela = _ler(nome_arquivo, colunas, filtros, versao)
+    especificacao = [([] if coluna is None else coluna, 'count_all' if coluna is None else funcao)
+                     for coluna, funcao in agregacoes.values()]
+    resultado = tabela.group_by(list(grupos)).aggregate(especificacao).to_pandas()
+    nomes_arrow = [f'{coluna}_{funcao}' if coluna is not None else 'count_all'
+                   for coluna, funcao in agregacoes.values()]
+    resultado = resultado.rename(columns=dict(zip(nomes_arrow, agregacoes)))
+    return resultado[list(grupos) + list(agregacoes)].sort_values(list(grupos)).reset_index(drop=True)
+
+def valores_distintos(nome_arquivo, coluna, filtros=None, versao=None):
+    """Valores distintos de uma coluna, ordenados."""
+    return sorted(pc.unique(_ler(nome_arquivo, [coluna], filtros, versao).column(coluna)).to_pylist())
+
+def intervalo(nome_arquivo, coluna, filtros=None, versao=None):
+    """(mínimo, máximo) de uma coluna numérica."""
+    extremos = pc.min_max(_ler(nome_arquivo, [coluna], filtros, versao).column(coluna)).as_py()
+    return extremos['min'], extremos['max']
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+class ContribuicoesFloresta:
+    """
+    Decomposição de cada previsão de uma floresta aleatória (ou de uma árvore)
+    em valor base + contribuição de cada característica, seguindo o caminho
+    da linha em cada árvore: a cada divisão, a mudança no valor do nó (média
+    na regressão, proporção das classes na classificação) é atribuída à
+    característica usada na divisão.
+
+    As mudanças de valor de todos os nós são calculadas uma única vez, numa
+    matriz esparsa nós × (característica, saída). As contribuições de um lote
+    de linhas são então o produto da matriz de caminhos (decision_path) por
+    ela, sem laços em Python sobre linhas ou nós.
+    Para cada linha, base + soma das contribuições = predict_proba (ou predict).
+    """
+    def __init__(self, modelo):
+        self.modelo = modelo
+        self.arvores = getattr(modelo, 'estimators_', [modelo])
+        self.classes = getattr(modelo, 'classes_', None)
+        self.n_caracteristicas = modelo.n_features_in_
+        self.nomes = list(getattr(modelo, 'feature_names_in_', [f'x{i}' for i in range(self.n_caracteristicas)]))
+        self.n_saidas = 1 if self.classes is None else len(self.classes)
+
+        blocos, bases = [], []
+        for arvore in self.arvores:
+            estrutura = arvore.tree_
+            valores = estrutura.value[:, 0, :]
+            if self.classes is not None:
+                valores = valores / valores.sum(axis=1, keepdims=True)
+            pai = np.zeros(estrutura.node_count, dtype=np.intp)
+            internos = np.flatnonzero(estrutura.children_left >= 0)
+            pai[estrutura.children_left[internos]] = internos
+            pai[estrutura.children_right[internos]] = internos
+
+            nos = np.arange(1, estrutura.node_count)
+            variacao = valores[nos] - valores[pai[nos]]
+            colunas = estrutura.feature[pai[nos]][:, None] * self.n_saidas + np.arange(self.n_saidas)
+            blocos.append(sparse.csr_matrix(
+                (variacao.ravel(), (np.repeat(nos, self.n_saidas), colunas.ravel())),
+                shape=(estrutura.node_count, self.n_caracteristicas * self.n_saidas)))
+            bases.append(valores[0])
+
+        self.variacoes = sparse.vstack(blocos, format='csr') / len(self.arvores)
+        self.base = np.mean(bases, axis=0)
+
+    def _caminhos(self, X):
+        if hasattr(self.modelo, 'estimators_'):
+            return self.modelo.decision_path(X)[0]
+        return self.modelo.decision_path(X)
+
+    def calcular(self, X):
+        """Contribuições de um lote de linhas: array (linhas, características, saídas)."""
+        contribuicoes = (self._caminhos(X) @ self.variacoes).toarray()
+        return contribuicoes.reshape(-1, self.n_caracteristicas, self.n_saidas)
+
+    def _saida(self, classe):
+        if self.classes is None:
+            return 0
+        return int(np.flatnonzero(self.classes == classe)[0])
+
+    def explicar(self, X, classe=None):
+        """
+        DataFrame (linhas de X × características) com a contribuição para a
+        probabilidade de 'classe' (rótulo em classes_ do modelo) ou, na
+        regressão, para o valor previsto.
+        """
+        saida = self._saida(classe)
+        indice = X.index if isinstance(X, pd.DataFrame) else None
+        return pd.DataFrame(self.calcular(X)[:, :, saida], columns=self.nomes, index=indice)
+
+    def valor_base(self, classe=None):
+        """Valor de partida (média dos nós raiz) para 'classe' ou para a regressão."""
+        return float(self.base[self._saida(classe)])
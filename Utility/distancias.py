@@ -0,0 +1,159 @@
+import os
+import threading
+
+import numpy as np
+from sklearn.metrics import pairwise_distances
+
+from .recursos import obter_controlador
+
+DIRETORIO_DISTANCIAS = os.path.join('Artefatos', 'distancias')
+# Linhas por bloco: um bloco de distâncias (linhas × n, float32) com n = 20 mil
+# ocupa uns 80 MB; com os ~9 mil anúncios do dataset, uns 37 MB
+TAMANHO_BLOCO = 1024
+# Acima deste número de linhas a matriz completa não é gravada (20 mil linhas
+# já dão 1,6 GB): a silhueta passa a ser calculada numa amostra fixa de linhas,
+# como o sample_size de silhouette_score
+MAXIMO_LINHAS = int(os.environ.get('PISI3_MAXIMO_LINHAS_DISTANCIAS', 20000))
+# Espaço máximo das matrizes no disco; as usadas há mais tempo saem primeiro
+LIMITE_DISCO = int(os.environ.get('PISI3_LIMITE_DISCO_DISTANCIAS', 2 * 1024 ** 3))
+SEMENTE = 42
+
+_locks = {}
+_lock_locks = threading.Lock()
+
+def amostra_linhas(n, maximo_linhas=MAXIMO_LINHAS):
+    """Linhas usadas na silhueta: todas (None) ou uma amostra fixa, ordenada, de maximo_linhas."""
+    if n <= maximo_linhas:
+        return None
+    return np.sort(np.random.default_rng(SEMENTE).choice(n, maximo_linhas, replace=False))
+
+class MatrizDistancias:
+    """
+    Distâncias euclidianas entre as linhas de X, em float32, num arquivo .npy
+    lido como memória mapeada. A matriz é calculada uma vez por configuração e
+    serve para a silhueta de qualquer vetor de rótulos: com ela, a varredura de
+    k e a análise por cluster não recalculam as distâncias.
+    A silhueta também é calculada por blocos de linhas, então a memória usada
+    não depende de n². Com mais de MAXIMO_LINHAS linhas, a matriz e a silhueta
+    ficam restritas a uma amostra fixa de linhas ('amostra').
+    """
+    def __init__(self, caminho, amostra=None, tamanho_bloco=TAMANHO_BLOCO):
+        self.caminho = caminho
+        self.amostra = amostra
+        self.tamanho_bloco = tamanho_bloco
+        self.distancias = np.load(caminho, mmap_mode='r')
+
+    @property
+    def n(self):
+        return self.distancias.shape[0]
+
+    @classmethod
+    def calcular(cls, X, caminho, amostra=None, tamanho_bloco=TAMANHO_BLOCO):
+        """Calcula a matriz bloco a bloco direto no arquivo e retorna a versão mapeada."""
+        if amostra is not None:
+            X = X[amostra]
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        # Grava em arquivo temporário e renomeia, para nunca expor uma matriz pela metade
+        temporario = f'{caminho}.{threading.get_ident()}.tmp.npy'
+        destino = np.lib.format.open_memmap(temporario, mode='w+', dtype=np.float32, shape=(len(X), len(X)))
+        with obter_controlador().reservar():
+            for inicio in range(0, len(X), tamanho_bloco):
+                fim = min(inicio + tamanho_bloco, len(X))
+                destino[inicio:fim] = pairwise_distances(X[inicio:fim], X)
+        destino.flush()
+        del destino
+        os.replace(temporario, caminho)
+        return cls(caminho, amostra, tamanho_bloco)
+
+    def na_amostra(self, valores):
+        """Restringe um vetor com uma posição por linha de X às linhas da matriz."""
+        return valores if self.amostra is None else np.asarray(valores)[self.amostra]
+
+    def silhueta_amostras(self, rotulos):
+        """
+        Coeficiente de silhueta de cada linha da matriz, como silhouette_samples
+        do scikit-learn: linhas de clusters com um único elemento valem 0.
+        'rotulos' tem uma posição por linha de X; com amostra, o resultado vale
+        para as linhas de na_amostra(rotulos).
+        """
+        _, rotulos = np.unique(self.na_amostra(rotulos), return_inverse=True)
+        k = rotulos.max() + 1
+        # Soma das distâncias de cada linha a cada cluster = distâncias × indicadores dos clusters
+        indicadores = np.zeros((self.n, k), dtype=np.float32)
+        indicadores[np.arange(self.n), rotulos] = 1
+        tamanhos = np.bincount(rotulos, minlength=k)
+
+        silhueta = np.zeros(self.n)
+        with obter_controlador().reservar():
+            for inicio in range(0, self.n, self.tamanho_bloco):
+                fim = min(inicio + self.tamanho_bloco, self.n)
+                somas = (self.distancias[inicio:fim] @ indicadores).astype(np.float64)
+                proprio = rotulos[inicio:fim]
+                linhas = np.arange(fim - inicio)
+                tamanho_proprio = tamanhos[proprio]
+                a = somas[linhas, proprio] / np.maximum(tamanho_proprio - 1, 1)
+                somas[linhas, proprio] = np.inf
+                b = np.min(somas / tamanhos, axis=1)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    s = (b - a) / np.maximum(a, b)
+                silhueta[inicio:fim] = np.where(tamanho_proprio > 1, np.nan_to_num(s), 0)
+        return silhueta
+
+    def silhueta(self, rotulos):
+        """Silhueta média, como silhouette_score do scikit-learn (na amostra, se houver)."""
+        return float(np.mean(self.silhueta_amostras(rotulos)))
+
+def caminho_matriz(configuracao, versao, diretorio=DIRETORIO_DISTANCIAS):
+    """Um arquivo por configuração e versão dos dados, como os índices de anúncios similares."""
+    return os.path.join(diretorio, f"{configuracao}-{int((versao or 0) * 1000)}.npy")
+
+def limpar(diretorio, atual, limite_disco=LIMITE_DISCO):
+    """
+    Remove as matrizes da mesma configuração de versões anteriores à de 'atual'
+    e, se o diretório ainda passar de limite_disco, as usadas há mais tempo.
+    Versões mais novas ficam: numa troca de versão (Utility/recarga.py), uma
+    sessão ainda na versão antiga não apaga a matriz já preparada da nova.
+    Matrizes abertas por outras sessões continuam válidas depois de removidas.
+    """
+    configuracao, versao = os.path.splitext(os.path.basename(atual))[0].rsplit('-', 1)
+    arquivos = []
+    for nome in os.listdir(diretorio):
+        caminho = os.path.join(diretorio, nome)
+        if not nome.endswith('.npy') or nome.endswith('.tmp.npy') or caminho == atual:
+            continue
+        outra_configuracao, outra_versao = os.path.splitext(nome)[0].rsplit('-', 1)
+        if outra_configuracao == configuracao and int(outra_versao) < int(versao):
+            os.remove(caminho)
+        else:
+            arquivos.append((os.path.getmtime(caminho), os.path.getsize(caminho), caminho))
+
+    ocupado = os.path.getsize(atual) + sum(tamanho for _, tamanho, _ in arquivos)
+    for _, tamanho, caminho in sorted(arquivos):
+        if ocupado <= limite_disco:
+            break
+        os.remove(caminho)
+        ocupado -= tamanho
+
+def obter_matriz_distancias(X, configuracao, versao=None, diretorio=DIRETORIO_DISTANCIAS,
+                            maximo_linhas=MAXIMO_LINHAS):
+    """
+    Matriz de distâncias de X para 'configuracao' (chave das colunas de X:
+    variáveis, normalização e precisão) na versão dos dados 'versao'.
+    Se ainda não existir, é calculada, e as matrizes antigas são removidas
+    (ver limpar); chamadas simultâneas com a mesma chave esperam o primeiro
+    cálculo em vez de repeti-lo.
+    """
+    caminho = caminho_matriz(configuracao, versao, diretorio)
+    amostra = amostra_linhas(len(X), maximo_linhas)
+    with _lock_locks:
+        lock = _locks.setdefault(caminho, threading.Lock())
+    with lock:
+        if os.path.exists(caminho):
+            matriz = MatrizDistancias(caminho, amostra)
+            if matriz.n == (len(X) if amostra is None else len(amostra)):
+                # Marca o uso, para a limpeza por espaço remover primeiro as esquecidas
+                os.utime(caminho)
+                return matriz
+        matriz = MatrizDistancias.calcular(X, caminho, amostra)
+        limpar(diretorio, caminho)
+        return matriz
@@ -0,0 +1,348 @@
+import json
+import os
+import shutil
+import threading
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+DIRETORIO_DADOS = 'Datas'
+DIRETORIO_TIPADOS = os.path.join(DIRETORIO_DADOS, 'tipados')
+
+# Os datasets tipados são gravados em Parquet particionado por ano e marca
+# (diretórios ano=.../marca=...), então filtros nessas colunas descartam
+# arquivos inteiros antes da leitura. '_ordem' guarda a posição da linha no
+# CSV, para devolver as linhas na ordem original.
+COLUNAS_PARTICAO = pa.schema([('ano', pa.int16()), ('marca', pa.string())])
+COLUNA_ORDEM = '_ordem'
+
+# Colunas comuns aos datasets derivados: nome -> (dtype, unidade)
+COLUNAS_BASE = {
+    'marca': ('object', None),
+    'modelo': ('object', None),
+    'ano': ('int16', 'ano'),
+    'quilometragem': ('float64', 'km'),
+    'preco': ('float64', 'moeda'),
+    'combustivel': ('object', None),
+    'car_documents': ('object', None),
+    'tipo': ('object', None),
+    'transmissão': ('object', None)
+}
+
+# Esquema de cada dataset derivado. 'escala_preco' é o fator pelo qual as colunas
+# de moeda do arquivo estão multiplicadas em relação ao preço do anúncio: os
+# arquivos clusterizado e de previsões foram gerados com o preço multiplicado
+# por 10, e a normalização divide por esse fator para que todas as páginas
+# mostrem o mesmo valor.
+ESQUEMAS = {
+    '1_Cars_processado.csv': {
+        'colunas': {**COLUNAS_BASE,
+                    'year_range': ('int8', 'faixa'),
+                    "km's driven_range": ('int8', 'faixa')},
+        'escala_preco': 1
+    },
+    '2_Cars_clusterizado.csv': {
+        'colunas': {**COLUNAS_BASE,
+                    'full_range': ('int8', 'faixa'),
+                    'type_range': ('int8', 'faixa'),
+                    'Car Age': ('int16', 'anos'),
+                    'Cluster': ('int16', None)},
+        'escala_preco': 10
+    },
+    '3_Cars_predictions.csv': {
+        'colunas': {**COLUNAS_BASE,
+                    'year_range': ('int8', 'faixa'),
+                    "km's driven_range": ('int8', 'faixa'),
+                    'Car Age': ('int16', 'anos'),
+                    'Cluster': ('int16', None),
+                    'Predicted Price': ('float64', 'moeda')},
+        'escala_preco': 10
+    },
+    '5_Cars_classificacao.csv': {
+        'colunas': {**COLUNAS_BASE,
+                    'year_range': ('int8', 'faixa'),
+                    "km's driven_range": ('int8', 'faixa'),
+                    'faixa_preco': ('object', None),
+                    'faixa_preco_prevista': ('object', None),
+                    'valor_estimado': ('float64', 'moeda')},
+        'escala_preco': 1
+    }
+}
+
+def normalizar_moeda(serie):
+    """Converte valores monetários em float de forma vetorizada.
+
+    Aceita números já numéricos e textos como 'R$ 1.234.567,89', '1.234.567'
+    ou '419000.0'. Vírgula é sempre o separador decimal; sem vírgula, o ponto
+    só é tratado como separador de milhar quando aparece mais de uma vez.
+    """
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype('float64')
+
+    texto = serie.astype(str).str.replace('R$', '', regex=False).str.replace(' ', '', regex=False)
+    com_virgula = texto.str.contains(',', regex=False)
+    milhar_com_ponto = com_virgula | (texto.str.count(r'\.') > 1)
+    texto = texto.where(~milhar_com_ponto, texto.str.replace('.', '', regex=False))
+    texto = texto.where(~com_virgula, texto.str.replace(',', '.', regex=False))
+    return pd.to_numeric(texto, errors='coerce')
+
+def aplicar_esquema(df, nome_arquivo):
+    """Converte as colunas presentes para os tipos do esquema e normaliza as colunas de moeda."""
+    esquema = ESQUEMAS[nome_arquivo]
+    df = df.copy()
+    for coluna, (dtype, unidade) in esquema['colunas'].items():
+        if coluna not in df.columns:
+            continue
+        if unidade == 'moeda':
+            df[coluna] = normalizar_moeda(df[coluna]) / esquema['escala_preco']
+        elif dtype != 'object' and not df[coluna].isna().any():
+            df[coluna] = df[coluna].astype(dtype)
+    return df
+
+def validar(df, nome_arquivo):
+    """Retorna a lista de problemas encontrados no DataFrame em relação ao esquema."""
+    problemas = []
+    for coluna, (dtype, unidade) in ESQUEMAS[nome_arquivo]['colunas'].items():
+        if coluna not in df.columns:
+            problemas.append(f"coluna ausente: {coluna}")
+            continue
+        if dtype != 'object' and str(df[coluna].dtype) != dtype:
+            problemas.append(f"{coluna}: tipo {df[coluna].dtype}, esperado {dtype}")
+        if unidade in ('moeda', 'km') and (df[coluna] < 0).any():
+            problemas.append(f"{coluna}: valores negativos")
+        if unidade == 'moeda' and df[coluna].isna().any():
+            problemas.append(f"{coluna}: {df[coluna].isna().sum()} valores não convertidos")
+    return problemas
+
+def particionamento():
+    # Criado a cada uso: um objeto de particionamento do Arrow guardado no
+    # módulo é destruído depois dos pools de threads do Arrow ao encerrar o
+    # interpretador e derruba o processo na saída.
+    return ds.partitioning(COLUNAS_PARTICAO, flavor='hive')
+
+def caminho_tipado(nome_arquivo, versao, diretorio_tipados=DIRETORIO_TIPADOS):
+    """
+    Diretório do dataset tipado e particionado na versão 'versao' do CSV
+    (tipados/<dataset>/<versão em ms>). Cada versão fica no seu diretório:
+    gravar uma nova não mexe nas que as sessões ainda estão lendo.
+    """
+    return os.path.join(diretorio_tipados, os.path.splitext(nome_arquivo)[0], str(int(versao * 1000)))
+
+def versoes_tipadas(nome_arquivo, diretorio_tipados=DIRETORIO_TIPADOS):
+    """Versões (em ms) do dataset com Parquet tipado gravado, em ordem."""
+    try:
+        nomes = os.listdir(os.path.join(diretorio_tipados, os.path.splitext(nome_arquivo)[0]))
+    except FileNotFoundError:
+        return []
+    return sorted(int(nome) for nome in nomes if nome.isdigit())
+
+def remover_tipados_antigos(nome_arquivo, versao_minima, diretorio_tipados=DIRETORIO_TIPADOS):
+    """Remove as versões tipadas do dataset anteriores a versao_minima."""
+    raiz = os.path.join(diretorio_tipados, os.path.splitext(nome_arquivo)[0])
+    for versao in versoes_tipadas(nome_arquivo, diretorio_tipados):
+        if versao < int(versao_minima * 1000):
+            shutil.rmtree(os.path.join(raiz, str(versao)), ignore_errors=True)
+
+def gravar_particionado(df, caminho):
+    """
+    Grava o DataFrame particionado por ano e marca. A gravação é feita num
+    diretório temporário renomeado para 'caminho' no final, então quem lê nunca
+    vê um dataset pela metade. Uma versão gravada não muda mais: se outro
+    processo já gravou 'caminho', esta gravação é descartada.
+    """
+    tabela = pa.Table.from_pandas(df.assign(**{COLUNA_ORDEM: range(len(df))}), preserve_index=False)
+    tabela = tabela.replace_schema_metadata({'colunas': json.dumps(list(df.columns))})
+    temporario = _temporario(caminho)
+    ds.write_dataset(tabela, temporario, format='parquet', partitioning=particionamento())
+    _renomear_versao(temporario, caminho)
+
+def _temporario(caminho):
+    temporario = f'{caminho}.{os.getpid()}-{threading.get_ident()}.tmp'
+    shutil.rmtree(temporario, ignore_errors=True)
+    return temporario
+
+def _renomear_versao(temporario, caminho):
+    try:
+        os.rename(temporario, caminho)
+    except OSError:
+        shutil.rmtree(temporario, ignore_errors=True)
+        if not os.path.isdir(caminho):
+            raise
+
+def _vincular_arquivos(origem, destino):
+    """Replica os arquivos de 'origem' em 'destino' por hard link (cópia se o sistema não permitir)."""
+    for raiz, _, arquivos in os.walk(origem):
+        pasta = os.path.join(destino, os.path.relpath(raiz, origem))
+        os.makedirs(pasta, exist_ok=True)
+        for arquivo in arquivos:
+            try:
+                os.link(os.path.join(raiz, arquivo), os.path.join(pasta, arquivo))
+            except OSError:
+                shutil.copy2(os.path.join(raiz, arquivo), os.path.join(pasta, arquivo))
+
+def construir_tipados(diretorio_dados=DIRETORIO_DADOS, diretorio_tipados=DIRETORIO_TIPADOS, arquivos=None):
+    """
+    Aplica e valida o esquema uma única vez e grava a versão atual de cada
+    dataset em Parquet particionado por ano e marca (ver caminho_tipado).
+    Versões já gravadas são mantidas como estão.
+    :param arquivos: Datasets a construir (padrão: todos os de ESQUEMAS).
+    """
+    for nome_arquivo in arquivos or ESQUEMAS:
+        versao = versao_dataset(nome_arquivo, diretorio_dados)
+        caminho = caminho_tipado(nome_arquivo, versao, diretorio_tipados)
+        if os.path.isdir(caminho):
+            continue
+        df = aplicar_esquema(pd.read_csv(os.path.join(diretorio_dados, nome_arquivo)), nome_arquivo)
+        if versao_dataset(nome_arquivo, diretorio_dados) != versao:
+            raise ValueError(f"{nome_arquivo} foi regravado durante a leitura; tente de novo.")
+        problemas = validar(df, nome_arquivo)
+        if problemas:
+            raise ValueError(f"{nome_arquivo} não segue o esquema: " + "; ".join(problemas))
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        gravar_particionado(df, caminho)
+        print(f"[INFO] {nome_arquivo}: {len(df)} linhas tipadas e validadas.")
+
+def anexar_tipado(df, nome_arquivo, versao_anterior, diretorio_dados=DIRETORIO_DADOS,
+                  diretorio_tipados=DIRETORIO_TIPADOS):
+    """
+    Grava a versão atual do dataset a partir da anterior quando o CSV só
+    recebeu as linhas de 'df' no fim (ingestão incremental). Os arquivos da
+    versão anterior entram na nova por hard link, sem regravar nada, e só 'df'
+    é tipado, validado e gravado em arquivos Parquet novos.
+    Se a versão anterior não está no disco, ou se 'df' não cabe no tipo das
+    colunas gravadas, a versão é reconstruída inteira (construir_tipados).
+    :param df: Linhas anexadas ao CSV, nas colunas do arquivo.
+    :param versao_anterior: Versão do CSV antes de receber as linhas.
+    """
+    versao = versao_dataset(nome_arquivo, diretorio_dados)
+    caminho = caminho_tipado(nome_arquivo, versao, diretorio_tipados)
+    anterior = caminho_tipado(nome_arquivo, versao_anterior, diretorio_tipados)
+    if os.path.isdir(caminho):
+        return
+    if not os.path.isdir(anterior):
+        construir_tipados(diretorio_dados, diretorio_tipados, [nome_arquivo])
+        return
+
+    df = aplicar_esquema(df, nome_arquivo)
+    problemas = validar(df, nome_arquivo)
+    if problemas:
+        raise ValueError(f"Linhas novas de {nome_arquivo} não seguem o esquema: " + "; ".join(problemas))
+    dataset = ds.dataset(anterior, format='parquet', partitioning=particionamento())
+    inicio = dataset.count_rows()
+    tabela = pa.Table.from_pandas(df.assign(**{COLUNA_ORDEM: range(inicio, inicio + len(df))}),
+                                  preserve_index=False)
+    try:
+        tabela = tabela.select(dataset.schema.names).cast(dataset.schema)
+    except (KeyError, pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+        print(f"[AVISO] Linhas novas de {nome_arquivo} mudam o tipo das colunas ({e}); reconstruindo a versão.")
+        construir_tipados(diretorio_dados, diretorio_tipados, [nome_arquivo])
+        return
+
+    temporario = _temporario(caminho)
+    _vincular_arquivos(anterior, temporario)
+    ds.write_dataset(tabela, temporario, format='parquet', partitioning=particionamento(),
+                     basename_template=f'delta-{int(versao * 1000)}-{{i}}.parquet',
+                     existing_data_behavior='overwrite_or_ignore')
+    if versao_dataset(nome_arquivo, diretorio_dados) != versao:
+        shutil.rmtree(temporario, ignore_errors=True)
+        raise ValueError(f"{nome_arquivo} foi regravado durante a gravação; tente de novo.")
+    _renomear_versao(temporario, caminho)
+    print(f"[INFO] {nome_arquivo}: {len(df)} linhas novas tipadas e validadas.")
+
+def versao_dataset(nome_arquivo, diretorio_dados=DIRETORIO_DADOS):
+    """Identifica a versão do dataset pela data de modificação do CSV de origem."""
+    return os.path.getmtime(os.path.join(diretorio_dados, nome_arquivo))
+
+# Versão de cada dataset servida às páginas. Começa na versão do arquivo e só
+# avança quando o observador (Utility/recarga.py) termina de preparar a nova;
+# o dicionário é sempre substituído inteiro, então quem lê vê a versão antiga
+# ou a nova, nunca um meio-termo.
+_versoes_publicadas = {}
+_lock_versoes = threading.Lock()
+
+def versao_publicada(nome_arquivo, diretorio_dados=DIRETORIO_DADOS):
+    """Versão do dataset que as páginas devem usar nesta execução (ver publicar_versoes)."""
+    global _versoes_publicadas
+    versoes = _versoes_publicadas
+    if nome_arquivo not in versoes:
+        with _lock_versoes:
+            if nome_arquivo not in _versoes_publicadas:
+                _versoes_publicadas = {**_versoes_publicadas,
+                                       nome_arquivo: versao_dataset(nome_arquivo, diretorio_dados)}
+            versoes = _versoes_publicadas
+    return versoes[nome_arquivo]
+
+def publicar_versoes(versoes):
+    """Troca, de uma vez, as versões publicadas dos datasets em 'versoes' ({nome: versão})."""
+    global _versoes_publicadas
+    with _lock_versoes:
+        _versoes_publicadas = {**_versoes_publicadas, **versoes}
+
+def expressao_filtros(filtros):
+    """
+    Converte filtros no formato {coluna: condição} numa expressão do Arrow:
+    - tupla (mínimo, máximo): intervalo fechado; None deixa o lado aberto;
+    - lista ou conjunto: a coluna deve estar entre os valores;
+    - qualquer outro valor: igualdade.
+    """
+    expressao = None
+    for coluna, condicao in (filtros or {}).items():
+        campo = ds.field(coluna)
+        if isinstance(condicao, tuple):
+            minimo, maximo = condicao
+            partes = ([campo >= minimo] if minimo is not None else []) + ([campo <= maximo] if maximo is not None else [])
+        elif isinstance(condicao, (list, set, frozenset)):
+            partes = [campo.isin(list(condicao))]
+        else:
+            partes = [campo == condicao]
+        for parte in partes:
+            expressao = parte if expressao is None else expressao & parte
+    return expressao
+
+def abrir_dataset(nome_arquivo, colunas=None, diretorio_dados=DIRETORIO_DADOS,
+                  diretorio_tipados=DIRETORIO_TIPADOS, versao=None):
+    """
+    Dataset do Arrow para consultas com projeção e filtros na leitura, na
+    versão 'versao' (padrão: a publicada, ver versao_publicada).
+    Usa o Parquet particionado dessa versão gravado por construir_tipados. Se
+    ele ainda não existe (ex.: antes do primeiro aquecimento), lê o CSV (só as
+    colunas pedidas) e aplica o esquema na hora, desde que o CSV ainda esteja
+    nessa versão; uma versão que não está mais no disco gera FileNotFoundError,
+    em vez de servir dados de outra versão.
+    Retorna (dataset, colunas na ordem do arquivo).
+    """
+    versao = versao_publicada(nome_arquivo, diretorio_dados) if versao is None else versao
+    caminho = caminho_tipado(nome_arquivo, versao, diretorio_tipados)
+    if os.path.isdir(caminho):
+        dataset = ds.dataset(caminho, format='parquet', partitioning=particionamento())
+        return dataset, json.loads(dataset.schema.metadata[b'colunas'])
+
+    indisponivel = FileNotFoundError(f"A versão {versao} de {nome_arquivo} não está mais disponível.")
+    if versao_dataset(nome_arquivo, diretorio_dados) != versao:
+        raise indisponivel
+    df = aplicar_esquema(pd.read_csv(os.path.join(diretorio_dados, nome_arquivo), usecols=colunas), nome_arquivo)
+    if versao_dataset(nome_arquivo, diretorio_dados) != versao:
+        raise indisponivel
+    dataset = ds.dataset(pa.Table.from_pandas(df.assign(**{COLUNA_ORDEM: range(len(df))}), preserve_index=False))
+    return dataset, list(df.columns)
+
+def carregar_dataset(nome_arquivo, colunas=None, filtros=None, diretorio_dados=DIRETORIO_DADOS,
+                     diretorio_tipados=DIRETORIO_TIPADOS, versao=None):
+    """
+    Lê um dataset derivado já tipado, apenas com as colunas pedidas e as linhas
+    que atendem aos filtros (formato de expressao_filtros). Projeção e filtros
+    são aplicados na leitura: partições de ano e marca fora do filtro nem são
+    abertas, e as demais condições usam as estatísticas dos arquivos Parquet.
+    :param versao: Versão do dataset (padrão: a publicada); ver abrir_dataset.
+    """
+    colunas = list(colunas) if colunas is not None else None
+    leitura = None if colunas is None else list(dict.fromkeys(colunas + list(filtros or {})))
+    dataset, todas = abrir_dataset(nome_arquivo, leitura, diretorio_dados, diretorio_tipados, versao)
+    colunas = colunas if colunas is not None else todas
+    tabela = dataset.to_table(columns=colunas + [COLUNA_ORDEM], filter=expressao_filtros(filtros))
+    df = tabela.sort_by(COLUNA_ORDEM).to_pandas()
+    return df[colunas]
+
+if __name__ == "__main__":
+    construir_tipados()
@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed, dump, load
+from sklearn.cluster import KMeans
+from sklearn.metrics import adjusted_rand_score
+from threadpoolctl import threadpool_limits
+
+from .fila_tarefas import obter_fila
+from .recursos import ajustar_prever, obter_controlador
+
+SEMENTE = 42
+
+def _jaccard_por_cluster(referencia, rotulos, k):
+    """Para cada cluster da referência, o maior índice de Jaccard com algum cluster de 'rotulos'."""
+    contingencia = np.zeros((k, rotulos.max() + 1))
+    np.add.at(contingencia, (referencia, rotulos), 1)
+    tamanhos_ref = contingencia.sum(axis=1, keepdims=True)
+    tamanhos = contingencia.sum(axis=0, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        jaccard = contingencia / (tamanhos_ref + tamanhos - contingencia)
+    return np.nan_to_num(jaccard).max(axis=1)
+
+def _reamostra(caminho_X, referencia, k, semente, n_init):
+    """
+    Uma reamostragem bootstrap, executada num processo do pool. A matriz X é
+    lida do arquivo mapeado em memória, compartilhado por todos os processos.
+    O KMeans é ajustado na reamostra e os rótulos são comparados com a
+    referência sobre todas as linhas.
+    """
+    X = load(caminho_X, mmap_mode='r')
+    indices = np.random.default_rng(semente).integers(0, len(X), len(X))
+    with threadpool_limits(limits=1):
+        kmeans = KMeans(n_clusters=k, random_state=semente, n_init=n_init).fit(X[indices])
+        rotulos = kmeans.predict(X)
+    return k, adjusted_rand_score(referencia, rotulos), _jaccard_por_cluster(referencia, rotulos, k)
+
+def estabilidade_bootstrap(X, ks, n_reamostras=20, n_init='auto', semente=SEMENTE, tarefa=None):
+    """
+    Estabilidade do KMeans para cada k candidato, por reamostragem bootstrap.
+    A referência de cada k é o KMeans com a mesma configuração das páginas
+    (random_state=semente) sobre todos os dados; cada uma das n_reamostras
+    reamostras × k roda em paralelo num pool de processos.
+    :return: dict com
+             - 'resumo': DataFrame por k com o ARI médio e o desvio entre
+               reamostras e referência, e a menor robustez entre os clusters;
+             - 'robustez': {k: DataFrame por cluster com o tamanho e o Jaccard
+               médio com o cluster mais parecido de cada reamostra}.
+    """
+    X = np.ascontiguousarray(X)
+    ks = list(ks)
+    referencias = {k: ajustar_prever(KMeans(n_clusters=k, random_state=semente, n_init=n_init), X) for k in ks}
+    trabalhos = [(k, b) for k in ks for b in range(n_reamostras)]
+
+    ari = {k: [] for k in ks}
+    jaccard = {k: [] for k in ks}
+    diretorio = tempfile.mkdtemp(prefix='estabilidade_')
+    try:
+        caminho_X = os.path.join(diretorio, 'X.joblib')
+        dump(X, caminho_X)
+        with obter_controlador().reservar() as nucleos:
+            resultados = Parallel(n_jobs=nucleos, return_as='generator')(
+                delayed(_reamostra)(caminho_X, referencias[k], k, semente + 1 + b, n_init)
+                for k, b in trabalhos)
+            for feitos, (k, indice_ari, indice_jaccard) in enumerate(resultados, start=1):
+                ari[k].append(indice_ari)
+                jaccard[k].append(indice_jaccard)
+                if tarefa is not None:
+                    tarefa.informar_progresso(feitos / len(trabalhos), f"{feitos}/{len(trabalhos)} REAMOSTRAS")
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    robustez = {k: pd.DataFrame({'cluster': range(k),
+                                 'tamanho': np.bincount(referencias[k], minlength=k),
+                                 'jaccard_medio': np.mean(jaccard[k], axis=0)})
+                for k in ks}
+    resumo = pd.DataFrame({'k': ks,
+                           'ari_medio': [np.mean(ari[k]) for k in ks],
+                           'ari_desvio': [np.std(ari[k]) for k in ks],
+                           'robustez_minima': [robustez[k]['jaccard_medio'].min() for k in ks]})
+    return {'resumo': resumo, 'robustez': robustez}
+
+def submeter_estabilidade(X, ks, n_reamostras=20, n_init='auto', descricao="Estabilidade dos clusters"):
+    """
+    Submete estabilidade_bootstrap à fila de tarefas. A chave inclui a própria
+    matriz X, então cada configuração (variáveis, escala, dados) tem o seu
+    resultado em cache e é calculada uma única vez.
+    """
+    fila = obter_fila()
+    ks = list(ks)
+    return fila.submeter(
+        fila.cache.chave('estabilidade', np.asarray(X), ks, n_reamostras, n_init),
+        lambda tarefa: estabilidade_bootstrap(X, ks, n_reamostras, n_init, tarefa=tarefa),
+        descricao=descricao, persistir=True)
+
+def figura_estabilidade(resumo):
+    """ARI médio (com o desvio) e menor robustez por cluster para cada k."""
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.errorbar(resumo['k'], resumo['ari_medio'], yerr=resumo['ari_desvio'],
+                marker='o', capsize=4, label='ARI MÉDIO (± DESVIO)')
+    ax.plot(resumo['k'], resumo['robustez_minima'], marker='s', linestyle='--',
+            label='MENOR ROBUSTEZ DE CLUSTER (JACCARD)')
+    ax.set_title('ESTABILIDADE DOS CLUSTERS (BOOTSTRAP)', fontweight='bold', pad=15)
+    ax.set_xlabel('NÚMERO DE CLUSTERS (K)', fontweight='bold')
+    ax.set_ylabel('ÍNDICE', fontweight='bold')
+    ax.set_xticks(resumo['k'])
+    ax.set_ylim(0, 1.05)
+    ax.grid(True, linestyle='--', alpha=0.7)
+    ax.legend()
+    return fig
@@ -0,0 +1,209 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from .cache_compartilhado import obter_cache
+
+# Estados possíveis de uma tarefa
+NA_FILA = 'na_fila'
+EXECUTANDO = 'executando'
+CONCLUIDA = 'concluida'
+ERRO = 'erro'
+CANCELADA = 'cancelada'
+
+class TarefaCancelada(Exception):
+    """Lançada dentro da função da tarefa quando o cancelamento foi pedido."""
+
+def sessao_atual():
+    """Id da sessão do Streamlit que executa esta thread; None fora das páginas (aquecimento, observador)."""
+    contexto = get_script_run_ctx(suppress_warning=True)
+    return contexto.session_id if contexto is not None else None
+
+class Tarefa:
+    """
+    Uma computação submetida à fila. A função da tarefa recebe este objeto como
+    primeiro argumento para informar o progresso e verificar o cancelamento.
+    """
+    def __init__(self, chave, descricao='', cache=None):
+        self.chave = chave
+        self.descricao = descricao
+        self.estado = NA_FILA
+        self.progresso = 0.0
+        self.mensagem = 'NA FILA'
+        self.erro = None
+        self._cache = cache
+        # Sessões (ou None, o próprio processo) que esperam o resultado
+        self._assinantes = set()
+        self._cancelamento = threading.Event()
+        self._fim = threading.Event()
+
+    @classmethod
+    def cancelada(cls, chave, descricao='', cache=None):
+        """Tarefa já cancelada, vista pela sessão que a cancelou (não vai para a fila)."""
+        tarefa = cls(chave, descricao, cache)
+        tarefa.estado, tarefa.mensagem = CANCELADA, 'CANCELADA'
+        tarefa._cancelamento.set()
+        tarefa._fim.set()
+        return tarefa
+
+    @property
+    def ativa(self):
+        return self.estado in (NA_FILA, EXECUTANDO)
+
+    @property
+    def resultado(self):
+        """Resultado entregue no cache compartilhado (None enquanto não concluída)."""
+        return self._cache.obter(self.chave) if self.estado == CONCLUIDA else None
+
+    def informar_progresso(self, fracao, mensagem=None):
+        """Atualiza o progresso (0 a 1) e interrompe a tarefa se ela foi cancelada."""
+        self.verificar_cancelamento()
+        self.progresso = min(max(float(fracao), 0.0), 1.0)
+        if mensagem is not None:
+            self.mensagem = mensagem
+
+    def aguardar(self, timeout=None):
+        """Bloqueia até a tarefa terminar (concluída, com erro ou cancelada); retorna False no timeout."""
+        return self._fim.wait(timeout)
+
+    def verificar_cancelamento(self):
+        if self._cancelamento.is_set():
+            raise TarefaCancelada(self.chave)
+
+    def cancelar(self):
+        """Pede o cancelamento; a tarefa para no próximo ponto de verificação."""
+        self._cancelamento.set()
+        if self.estado == NA_FILA:
+            self.estado = CANCELADA
+            self.mensagem = 'CANCELADA'
+            self._fim.set()
+
+class FilaTarefas:
+    """
+    Fila de tarefas pesadas compartilhada por todas as sessões do servidor.
+    - O número de tarefas simultâneas é limitado por max_trabalhadores.
+    - Tarefas idênticas (mesma chave) em andamento são executadas uma única vez:
+      quem submeter de novo recebe a tarefa já existente.
+    - O resultado é guardado no cache compartilhado sob a chave da tarefa, então
+      uma tarefa já concluída não é executada novamente.
+    - Cada sessão que submete uma tarefa passa a assiná-la. O cancelamento de uma
+      sessão vale só para ela e fica registrado: as próximas submissões da mesma
+      chave por essa sessão recebem a tarefa cancelada, até ela pedir retomar.
+      A execução compartilhada só é interrompida quando nenhuma sessão (nem o
+      processo, no aquecimento) espera mais por ela.
+    """
+    def __init__(self, max_trabalhadores=None, cache=None):
+        if max_trabalhadores is None:
+            max_trabalhadores = int(os.environ.get('PISI3_TRABALHADORES', max(1, (os.cpu_count() or 2) // 2)))
+        self.max_trabalhadores = max_trabalhadores
+        self.cache = cache or obter_cache()
+        self._executor = ThreadPoolExecutor(max_workers=max_trabalhadores, thread_name_prefix='fila_tarefas')
+        self._tarefas = {}
+        # {sessão: chaves canceladas por ela}
+        self._canceladas = {}
+        self._lock = threading.Lock()
+
+    def submeter(self, chave, funcao, *args, descricao='', persistir=False, **kwargs):
+        """
+        Submete funcao(tarefa, *args, **kwargs) à fila e retorna a Tarefa,
+        assinada pela sessão atual (ver sessao_atual).
+        :param persistir: Guarda o resultado também em disco.
+        """
+        sessao = sessao_atual()
+        with self._lock:
+            if chave in self._canceladas.get(sessao, ()):
+                return Tarefa.cancelada(chave, descricao, self.cache)
+            tarefa = self._submeter(chave, funcao, args, kwargs, descricao, persistir)
+            tarefa._assinantes.add(sessao)
+            return tarefa
+
+    def _submeter(self, chave, funcao, args, kwargs, descricao, persistir):
+        """Tarefa existente para a chave, ou uma nova na fila (com o lock já adquirido)."""
+        tarefa = self._tarefas.get(chave)
+        # Um resultado concluído pode ter saído do cache (limite de disco ou idade)
+        if tarefa is not None and (tarefa.ativa or (tarefa.estado == CONCLUIDA and self.cache.contem(chave))):
+            return tarefa
+
+        tarefa = Tarefa(chave, descricao, self.cache)
+        if self.cache.contem(chave):
+            tarefa.estado, tarefa.progresso, tarefa.mensagem = CONCLUIDA, 1.0, 'CONCLUÍDA'
+            tarefa._fim.set()
+        else:
+            self._executor.submit(self._executar, tarefa, funcao, args, kwargs, persistir)
+        self._tarefas[chave] = tarefa
+        return tarefa
+
+    def obter(self, chave):
+        """Retorna a tarefa com esta chave, se já foi submetida (cancelada, se a sessão atual a cancelou)."""
+        with self._lock:
+            tarefa = self._tarefas.get(chave)
+            if tarefa is not None and chave in self._canceladas.get(sessao_atual(), ()):
+                return Tarefa.cancelada(chave, tarefa.descricao, self.cache)
+            return tarefa
+
+    def cancelar(self, chave):
+        """
+        Cancela a tarefa para a sessão atual. A execução só é interrompida se
+        nenhuma outra sessão a assina.
+        """
+        sessao = sessao_atual()
+        with self._lock:
+            self._canceladas.setdefault(sessao, set()).add(chave)
+            tarefa = self._tarefas.get(chave)
+            if tarefa is None:
+                return
+            tarefa._assinantes.discard(sessao)
+            if not tarefa._assinantes:
+                tarefa.cancelar()
+
+    def cancelada(self, chave):
+        """Se a sessão atual cancelou esta chave (e ainda não pediu para retomar)."""
+        with self._lock:
+            return chave in self._canceladas.get(sessao_atual(), ())
+
+    def retomar(self, chave):
+        """
+        Desfaz o cancelamento da sessão atual: ela volta a assinar a execução em
+        andamento, se houver; senão a próxima submissão da chave a executa de novo.
+        """
+        sessao = sessao_atual()
+        with self._lock:
+            canceladas = self._canceladas.get(sessao, set())
+            canceladas.discard(chave)
+            if not canceladas:
+                self._canceladas.pop(sessao, None)
+            tarefa = self._tarefas.get(chave)
+            if tarefa is not None and tarefa.ativa and not tarefa._cancelamento.is_set():
+                tarefa._assinantes.add(sessao)
+
+    def _executar(self, tarefa, funcao, args, kwargs, persistir):
+        if tarefa.estado == CANCELADA:
+            return
+        tarefa.estado = EXECUTANDO
+        tarefa.mensagem = 'EXECUTANDO'
+        try:
+            resultado = funcao(tarefa, *args, **kwargs)
+            self.cache.guardar(tarefa.chave, resultado, persistir=persistir)
+            tarefa.progresso, tarefa.mensagem = 1.0, 'CONCLUÍDA'
+            tarefa.estado = CONCLUIDA
+        except TarefaCancelada:
+            tarefa.estado, tarefa.mensagem = CANCELADA, 'CANCELADA'
+        except Exception as e:
+            tarefa.erro = e
+            tarefa.estado, tarefa.mensagem = ERRO, f'ERRO: {e}'
+            print(f"[ERRO] Tarefa '{tarefa.descricao or tarefa.chave}' falhou: {e}")
+        finally:
+            tarefa._fim.set()
+
+_fila = None
+_lock_fila = threading.Lock()
+
+def obter_fila():
+    """Instância única da fila no processo do servidor."""
+    global _fila
+    with _lock_fila:
+        if _fila is None:
+            _fila = FilaTarefas()
+        return _fila
@@ -0,0 +1,278 @@
+import argparse
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+# Colunas que identificam o mesmo carro entre dumps. Ficam de fora o ID do
+# anúncio, as imagens e o texto, que mudam quando o carro é reanunciado.
+COLUNAS_CHAVE = ['Make', 'Model', 'Year', "KM's driven", 'Price', 'Fuel', 'Transmission',
+                 'Assembly', 'Registration city', 'Seller Location']
+
+def impressoes_digitais(df, colunas_chave=COLUNAS_CHAVE):
+    """Calcula um hash de 64 bits por linha a partir das colunas-chave, de forma vetorizada.
+
+    Números são convertidos para float e textos são normalizados (sem espaços
+    nas pontas, minúsculos), para que '54000' e '54000.0' ou 'Toyota ' e
+    'toyota' gerem a mesma impressão em dumps diferentes.
+    """
+    chaves = pd.DataFrame(index=df.index)
+    for coluna in colunas_chave:
+        valores = df[coluna]
+        if pd.api.types.is_numeric_dtype(valores):
+            chaves[coluna] = valores.astype('float64')
+        else:
+            chaves[coluna] = valores.astype(str).str.strip().str.lower()
+    return pd.util.hash_pandas_object(chaves, index=False).to_numpy(dtype=np.uint64)
+
+# Razão entre os tamanhos de segmentos vizinhos: um segmento é fundido com o
+# anterior enquanto o anterior não passar de FATOR_SEGMENTOS vezes o seu tamanho
+FATOR_SEGMENTOS = 4
+
+class IndiceDuplicatas:
+    """
+    Índice persistente de impressões digitais das linhas já vistas em dumps anteriores.
+    As impressões ficam em segmentos de uint64 ordenados no disco (8 bytes por
+    linha), lidos por memória mapeada. Cada salvar() grava só as impressões novas
+    num segmento próprio, e os segmentos recentes são fundidos quando ficam
+    do tamanho dos anteriores (FATOR_SEGMENTOS): os tamanhos caem em progressão
+    geométrica, uma busca olha O(log n) segmentos e cada impressão é regravada
+    O(log n) vezes ao longo do histórico, não uma vez por ingestão.
+    Filtros de Bloom encadeados descartam sem busca as linhas certamente novas,
+    que são a maioria em um dump diário: quando o filtro atual chega à sua
+    capacidade, um novo, com o dobro dela, passa a receber as inserções, então a
+    taxa de falsos positivos continua limitada com o histórico crescendo.
+    """
+    def __init__(self, diretorio, colunas_chave=COLUNAS_CHAVE, usar_bloom=True,
+                 capacidade=1000000, taxa_falsos_positivos=0.01, fator_segmentos=FATOR_SEGMENTOS):
+        """
+        :param diretorio: Diretório onde o índice é salvo.
+        :param colunas_chave: Colunas usadas na impressão digital.
+        :param usar_bloom: Usa filtros de Bloom como pré-filtro.
+        :param capacidade: Linhas do primeiro filtro de Bloom; os seguintes dobram.
+        :param taxa_falsos_positivos: Taxa máxima de falsos positivos somando todos os filtros.
+        """
+        self.diretorio = diretorio
+        self.caminho_meta = os.path.join(diretorio, 'meta.json')
+        self.fator_segmentos = fator_segmentos
+        os.makedirs(diretorio, exist_ok=True)
+
+        if os.path.exists(self.caminho_meta):
+            with open(self.caminho_meta, encoding='utf-8') as arquivo:
+                meta = json.load(arquivo)
+        else:
+            meta = {'colunas_chave': list(colunas_chave), 'usar_bloom': usar_bloom,
+                    'capacidade': capacidade, 'taxa_falsos_positivos': taxa_falsos_positivos}
+        if 'segmentos' not in meta:
+            # Índices gravados antes dos segmentos: um único hashes.npy e um único filtro
+            existe = os.path.exists(os.path.join(diretorio, 'hashes.npy'))
+            meta['segmentos'] = ['hashes.npy'] if existe else []
+            meta['proximo_segmento'] = 0
+            if 'n_bits' in meta:
+                meta['filtros'] = [{'arquivo': 'bloom.npy', 'n_bits': meta.pop('n_bits'),
+                                    'n_hashes': meta.pop('n_hashes'), 'capacidade': capacidade,
+                                    'inseridos': 0}]
+        self.colunas_chave = meta['colunas_chave']
+        self.usar_bloom = meta['usar_bloom']
+        self.capacidade = meta.get('capacidade', capacidade)
+        self.taxa_falsos_positivos = meta.get('taxa_falsos_positivos', taxa_falsos_positivos)
+        self.nomes_segmentos = list(meta['segmentos'])
+        self.proximo_segmento = meta['proximo_segmento']
+        self.segmentos = [np.load(os.path.join(diretorio, nome), mmap_mode='r') for nome in self.nomes_segmentos]
+
+        self.filtros, self.blooms = [], []
+        if self.usar_bloom:
+            for filtro in meta.get('filtros', []):
+                caminho = os.path.join(diretorio, filtro['arquivo'])
+                self.filtros.append(dict(filtro))
+                self.blooms.append(np.load(caminho) if os.path.exists(caminho)
+                                   else np.zeros((filtro['n_bits'] + 7) // 8, dtype=np.uint8))
+            if self.filtros and self.filtros[0]['inseridos'] == 0 and self.segmentos:
+                # Filtro antigo sem contagem: conta o histórico todo nele
+                self.filtros[0]['inseridos'] = sum(len(segmento) for segmento in self.segmentos)
+        self._filtros_alterados = set()
+        self.pendentes = []
+
+    def __len__(self):
+        return sum(len(segmento) for segmento in self.segmentos) + sum(len(p) for p in self.pendentes)
+
+    def _novo_filtro(self, capacidade):
+        """Acrescenta um filtro de Bloom para 'capacidade' linhas, com metade da taxa do anterior."""
+        taxa = self.taxa_falsos_positivos / 2 ** (len(self.filtros) + 1)
+        n_bits = math.ceil(-capacidade * math.log(taxa) / math.log(2) ** 2)
+        self.filtros.append({'arquivo': f'bloom-{len(self.filtros):03d}.npy', 'n_bits': n_bits,
+                             'n_hashes': max(1, round(n_bits / capacidade * math.log(2))),
+                             'capacidade': capacidade, 'inseridos': 0})
+        self.blooms.append(np.zeros((n_bits + 7) // 8, dtype=np.uint8))
+
+    @staticmethod
+    def _posicoes_bloom(hashes, filtro):
+        """Posições dos bits de cada hash no filtro (hashing duplo sobre as metades do hash de 64 bits)."""
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        i = np.arange(filtro['n_hashes'], dtype=np.uint64)
+        return (h1[:, None] + i[None, :] * h2[:, None]) % np.uint64(filtro['n_bits'])
+
+    def _talvez_contidos(self, hashes):
+        talvez = np.zeros(len(hashes), dtype=bool)
+        for filtro, bloom in zip(self.filtros, self.blooms):
+            posicoes = self._posicoes_bloom(hashes, filtro)
+            bits = (bloom[posicoes >> np.uint64(3)] >> (posicoes & np.uint64(7)).astype(np.uint8)) & 1
+            talvez |= bits.all(axis=1)
+        return talvez
+
+    def contem(self, hashes):
+        """Indica quais hashes já estão no índice (salvos ou pendentes)."""
+        contidos = np.zeros(len(hashes), dtype=bool)
+        candidatos = self._talvez_contidos(hashes) if self.usar_bloom else np.ones(len(hashes), dtype=bool)
+        if not candidatos.any():
+            return contidos
+
+        busca = hashes[candidatos]
+        encontrados = np.zeros(len(busca), dtype=bool)
+        for segmento in self.segmentos:
+            posicoes = np.minimum(np.searchsorted(segmento, busca), len(segmento) - 1)
+            encontrados |= np.asarray(segmento[posicoes]) == busca
+        for pendentes in self.pendentes:
+            encontrados |= np.isin(busca, pendentes)
+        contidos[candidatos] = encontrados
+        return contidos
+
+    def adicionar(self, hashes):
+        """Registra hashes novos; só vão para o disco em salvar()."""
+        hashes = np.unique(hashes)
+        self.pendentes.append(hashes)
+        if not self.usar_bloom or not len(hashes):
+            return
+        if not self.filtros:
+            self._novo_filtro(max(self.capacidade, len(hashes)))
+        elif self.filtros[-1]['inseridos'] + len(hashes) > self.filtros[-1]['capacidade']:
+            self._novo_filtro(max(2 * self.filtros[-1]['capacidade'], len(hashes)))
+        filtro, bloom = self.filtros[-1], self.blooms[-1]
+        posicoes = self._posicoes_bloom(hashes, filtro).ravel()
+        np.bitwise_or.at(bloom, posicoes >> np.uint64(3), (1 << (posicoes & np.uint64(7))).astype(np.uint8))
+        filtro['inseridos'] += len(hashes)
+        self._filtros_alterados.add(len(self.filtros) - 1)
+
+    def filtrar_novos(self, df):
+        """
+        Retorna apenas as linhas do DataFrame que não estão no índice nem repetidas
+        dentro dele, e registra essas linhas como vistas.
+        """
+        hashes = impressoes_digitais(df, self.colunas_chave)
+        novos = ~self.contem(hashes) & ~pd.Series(hashes).duplicated().to_numpy()
+        self.adicionar(hashes[novos])
+        return df[novos]
+
+    def _gravar_segmento(self, hashes):
+        """Grava um segmento ordenado (arquivo temporário renomeado) e retorna o nome."""
+        nome = f'segmento-{self.proximo_segmento:06d}.npy'
+        self.proximo_segmento += 1
+        temporario = os.path.join(self.diretorio, nome + '.tmp.npy')
+        np.save(temporario, hashes)
+        os.replace(temporario, os.path.join(self.diretorio, nome))
+        return nome
+
+    def _fundir_segmentos(self, inicio):
+        """Troca os segmentos a partir de 'inicio' por um só, com a união deles."""
+        unidos = self.segmentos[inicio]
+        for segmento in self.segmentos[inicio + 1:]:
+            unidos = np.union1d(unidos, segmento)
+        nome = self._gravar_segmento(unidos)
+        removidos = self.nomes_segmentos[inicio:]
+        self.nomes_segmentos[inicio:] = [nome]
+        self.segmentos[inicio:] = [np.load(os.path.join(self.diretorio, nome), mmap_mode='r')]
+        return removidos
+
+    def salvar(self):
+        """
+        Grava os hashes pendentes como um segmento novo, funde os segmentos
+        recentes que ficaram do tamanho dos anteriores e grava os filtros
+        alterados. O custo é proporcional às linhas novas, mais as fusões.
+        """
+        removidos = []
+        novos = np.unique(np.concatenate(self.pendentes)) if self.pendentes else []
+        self.pendentes = []
+        if len(novos):
+            nome = self._gravar_segmento(novos)
+            self.nomes_segmentos.append(nome)
+            self.segmentos.append(np.load(os.path.join(self.diretorio, nome), mmap_mode='r'))
+            inicio = len(self.segmentos) - 1
+            tamanho = len(self.segmentos[inicio])
+            while inicio > 0 and len(self.segmentos[inicio - 1]) <= self.fator_segmentos * tamanho:
+                inicio -= 1
+                tamanho += len(self.segmentos[inicio])
+            if inicio < len(self.segmentos) - 1:
+                removidos = self._fundir_segmentos(inicio)
+        self._gravar_meta(removidos)
+
+    def compactar(self):
+        """Funde todos os segmentos em um só (ex.: numa janela de manutenção)."""
+        if len(self.segmentos) > 1:
+            self._gravar_meta(self._fundir_segmentos(0))
+
+    def _gravar_meta(self, removidos=()):
+        for i in sorted(self._filtros_alterados):
+            np.save(os.path.join(self.diretorio, self.filtros[i]['arquivo']), self.blooms[i])
+        self._filtros_alterados = set()
+        meta = {'colunas_chave': self.colunas_chave, 'usar_bloom': self.usar_bloom,
+                'capacidade': self.capacidade, 'taxa_falsos_positivos': self.taxa_falsos_positivos,
+                'segmentos': self.nomes_segmentos, 'proximo_segmento': self.proximo_segmento,
+                'filtros': self.filtros}
+        temporario = self.caminho_meta + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(meta, arquivo, ensure_ascii=False, indent=2)
+        os.replace(temporario, self.caminho_meta)
+        # Os segmentos fundidos só saem depois que o meta novo deixou de apontar para eles
+        for nome in removidos:
+            os.remove(os.path.join(self.diretorio, nome))
+
+    def semear_arquivo(self, caminho, tamanho_bloco=100000):
+        """
+        Registra como vistas todas as linhas de um dump já processado (só as
+        colunas-chave são lidas, em blocos) e salva o índice. Serve para montar
+        o índice a partir dos dumps que formam o histórico atual.
+        :return: Número de linhas lidas.
+        """
+        lidas = 0
+        for bloco in pd.read_csv(caminho, usecols=self.colunas_chave, chunksize=tamanho_bloco):
+            self.adicionar(impressoes_digitais(bloco, self.colunas_chave))
+            lidas += len(bloco)
+        self.salvar()
+        print(f"[INFO] {lidas} linhas de {caminho} registradas no índice de duplicatas.")
+        return lidas
+
+    def deduplicar_arquivo(self, caminho_entrada, caminho_saida, tamanho_bloco=100000):
+        """
+        Lê um dump em blocos e grava apenas as linhas nunca vistas, sem carregar o arquivo inteiro.
+        :return: Tupla (linhas lidas, linhas novas).
+        """
+        lidas, novas = 0, 0
+        cabecalho = True
+        for bloco in pd.read_csv(caminho_entrada, chunksize=tamanho_bloco):
+            filtrado = self.filtrar_novos(bloco)
+            filtrado.to_csv(caminho_saida, mode='w' if cabecalho else 'a', header=cabecalho, index=False)
+            cabecalho = False
+            lidas += len(bloco)
+            novas += len(filtrado)
+        self.salvar()
+        print(f"[INFO] {lidas} linhas lidas, {lidas - novas} já vistas em dumps anteriores, "
+              f"{novas} novas salvas em: {caminho_saida}")
+        return lidas, novas
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deduplica um dump da OLX contra todo o histórico.")
+    parser.add_argument("entrada", help="CSV do dump bruto.")
+    parser.add_argument("saida", help="CSV de saída só com as linhas novas.")
+    parser.add_argument("--indice", default=os.path.join('Artefatos', 'indice_duplicatas'))
+    parser.add_argument("--sem-bloom", action="store_true", help="Desativa o pré-filtro de Bloom.")
+    parser.add_argument("--compactar", action="store_true",
+                        help="Funde todos os segmentos do índice em um só depois de deduplicar.")
+    args = parser.parse_args()
+
+    indice = IndiceDuplicatas(args.indice, usar_bloom=not args.sem_bloom)
+    indice.deduplicar_arquivo(args.entrada, args.saida)
+    if args.compactar:
+        indice.compactar()
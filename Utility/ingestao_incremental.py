@@ -0,0 +1,297 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Utility.esquema import anexar_tipado, construir_tipados, versao_dataset
+from Utility.indice_duplicatas import IndiceDuplicatas
+from Utility.monitor_drift import ARQUIVO_REFERENCIA, LIMIARES_DRIFT, MonitorDrift
+from Utility.modulos import importar_etapa
+
+tratamento = importar_etapa('0_ Tratamento_Dados.py')
+classificacao = importar_etapa('1_Classificacao_dados.py')
+clusterizacao = importar_etapa('2_Clusterizacao_dados.py')
+random_forest = importar_etapa('3_Random_Forest.py')
+
+DIRETORIO_DADOS = 'Datas'
+DIRETORIO_ARTEFATOS = 'Artefatos'
+
+ARQUIVOS_DERIVADOS = {
+    'processado': '1_Cars_processado.csv',
+    'clusterizado': '2_Cars_clusterizado.csv',
+    'previsoes': '3_Cars_predictions.csv',
+    'classificacao': '5_Cars_classificacao.csv'
+}
+ARTEFATOS = {
+    'regras': 'regras_tratamento.json',
+    'clusterizacao': 'modelo_clusterizacao.joblib',
+    'preco': 'modelo_random_forest.joblib',
+    'busca_preco': 'busca_random_forest.json',
+    'classificacao': 'modelo_classificacao.joblib',
+    'referencia_drift': ARQUIVO_REFERENCIA,
+    'indice_duplicatas': 'indice_duplicatas'
+}
+
+# Tradução do dump bruto da OLX para as colunas e valores dos datasets derivados
+RENOMEAR_COLUNAS = {
+    'Make': 'marca', 'Model': 'modelo', 'Year': 'ano', "KM's driven": 'quilometragem',
+    'Price': 'preco', 'Fuel': 'combustivel', 'Car documents': 'car_documents',
+    'Assembly': 'tipo', 'Transmission': 'transmissão',
+    'Year_Range': 'year_range', "KM's driven_Range": "km's driven_range"
+}
+TRADUCAO_VALORES = {
+    'combustivel': {'Petrol': 'Gasolina', 'CNG': 'GNV'},
+    'tipo': {'Imported': 'Importado', 'Local': 'Nacional'}
+}
+# O dataset clusterizado usa outros nomes para as colunas de faixa
+APELIDOS_COLUNAS = {
+    'clusterizado': {'year_range': 'full_range', "km's driven_range": 'type_range'}
+}
+# Os datasets clusterizado e de previsões publicados guardam o preço multiplicado por 10
+ESCALA_PRECO = {'clusterizado': 10, 'previsoes': 10}
+
+ANO_ATUAL = 2025
+N_CLUSTERS = 5
+CARACTERISTICAS_CLUSTER = ['quilometragem', 'preco', 'Car Age']
+CARACTERISTICAS_PRECO = ['quilometragem', 'Car Age', 'Cluster']
+CARACTERISTICAS_CLASSIFICACAO = ['marca', 'modelo', 'ano', 'quilometragem', 'combustivel',
+                                 'car_documents', 'tipo', 'transmissão']
+
+class IngestaoIncremental:
+    """
+    Anexa anúncios novos aos datasets derivados sem refazer o pipeline inteiro.
+    As linhas novas passam pelas regras de limpeza e faixas salvas, recebem o
+    cluster do centróide mais próximo e são pontuadas com os modelos salvos.
+    O retreino completo só acontece quando o drift passa do limiar.
+    """
+    def __init__(self, diretorio_dados=DIRETORIO_DADOS, diretorio_artefatos=DIRETORIO_ARTEFATOS,
+                 limiar_drift=None):
+        """
+        :param limiar_drift: Maior distância aceita em cada coluna monitorada antes de retreinar
+                             tudo (KS nas numéricas, L2 nas categóricas). None usa LIMIARES_DRIFT.
+        """
+        self.diretorio_dados = diretorio_dados
+        self.diretorio_artefatos = diretorio_artefatos
+        self.limiar_drift = limiar_drift
+        os.makedirs(diretorio_artefatos, exist_ok=True)
+
+    def caminho_dados(self, nome):
+        return os.path.join(self.diretorio_dados, ARQUIVOS_DERIVADOS[nome])
+
+    def caminho_artefato(self, nome):
+        return os.path.join(self.diretorio_artefatos, ARTEFATOS[nome])
+
+    def indice_duplicatas(self):
+        return IndiceDuplicatas(self.caminho_artefato('indice_duplicatas'))
+
+    def semear_indice(self, caminhos_dumps):
+        """
+        Registra no índice de duplicatas as linhas dos dumps brutos que já estão
+        no histórico. Sem isso, o primeiro dump ingerido não é comparado com nada.
+        O dataset processado não serve para isso, pois não tem todas as colunas-chave.
+        """
+        indice = self.indice_duplicatas()
+        for caminho in caminhos_dumps:
+            indice.semear_arquivo(caminho)
+
+    def limpar(self, novos, indice=None):
+        """
+        Aplica as regras de limpeza e as faixas salvas apenas às linhas novas.
+        :param indice: IndiceDuplicatas contra o qual os anúncios já vistos são descartados
+                       antes da limpeza; as linhas novas ficam pendentes nele, sem salvar.
+        """
+        regras = tratamento.carregar_regras(self.caminho_artefato('regras'))
+        limpos = tratamento.DataPreprocessing(novos, regras, indice).preprocess()
+
+        discretizador = tratamento.DataDiscretization(limpos, regras)
+        discretizador.discretize_year()
+        discretizador.discretize_km_driven()
+        fora_das_faixas = discretizador.df[["Year_Range", "KM's driven_Range"]].isna().any(axis=1)
+        if fora_das_faixas.any():
+            print(f"[AVISO] {fora_das_faixas.sum()} linhas fora das faixas salvas foram descartadas.")
+        discretizador.df = discretizador.df[~fora_das_faixas]
+        discretizador.convert_to_integer()
+
+        df = discretizador.df.rename(columns=RENOMEAR_COLUNAS)
+        for coluna, traducao in TRADUCAO_VALORES.items():
+            df[coluna] = df[coluna].replace(traducao)
+        colunas = pd.read_csv(self.caminho_dados('processado'), nrows=0).columns
+        return df.reindex(columns=colunas).reset_index(drop=True)
+
+    def salvar_referencia(self, df=None):
+        """Guarda os esboços (t-digest e count sketch) de referência usados no cálculo do drift."""
+        if df is None:
+            monitor = MonitorDrift.de_csv(self.caminho_dados('processado'))
+        else:
+            monitor = MonitorDrift().observar(df)
+        monitor.salvar(self.caminho_artefato('referencia_drift'))
+
+    def calcular_drift(self, df):
+        """Compara os esboços das linhas novas com a referência; relatório por coluna monitorada."""
+        limiares = None
+        if self.limiar_drift is not None:
+            limiares = dict.fromkeys(LIMIARES_DRIFT, self.limiar_drift)
+        referencia = MonitorDrift.carregar(self.caminho_artefato('referencia_drift'))
+        return referencia.comparar(MonitorDrift().observar(df), limiares)
+
+    def pontuar(self, df):
+        """Atribui clusters e previsões às linhas novas usando os modelos salvos."""
+        clusterer = clusterizacao.CarDataClusterer(None)
+        clusterer.load_model(self.caminho_artefato('clusterizacao'))
+        com_cluster = clusterer.assign_clusters(df)
+
+        clusterizado = com_cluster.assign(preco=com_cluster['preco'] * ESCALA_PRECO['clusterizado'])
+        clusterizado = clusterizado.rename(columns=APELIDOS_COLUNAS['clusterizado'])
+
+        predictor = random_forest.CarPricePredictor(None)
+        predictor.load_model(self.caminho_artefato('preco'))
+        previsoes = com_cluster.assign(preco=com_cluster['preco'] * ESCALA_PRECO['previsoes'])
+        previsoes['Predicted Price'] = predictor.predict(previsoes)
+
+        classificador = classificacao.ClassificadorCarros()
+        classificador.carregar_modelo(self.caminho_artefato('classificacao'))
+        classificado = df.copy()
+        classificado['faixa_preco'] = pd.cut(classificado['preco'], bins=classificador.FAIXAS_PRECO,
+                                             labels=classificador.ROTULOS_PRECO)
+        # Categorias que o classificador nunca viu ficam sem previsão até o próximo retreino
+        conhecidas = np.ones(len(df), dtype=bool)
+        for coluna, codificador in classificador.codificadores.items():
+            if coluna in CARACTERISTICAS_CLASSIFICACAO:
+                conhecidas &= df[coluna].isin(codificador.classes_).to_numpy()
+        classificado['faixa_preco_prevista'] = None
+        classificado['valor_estimado'] = np.nan
+        if conhecidas.any():
+            faixas, valores = classificador.prever(df.loc[conhecidas, CARACTERISTICAS_CLASSIFICACAO].copy())
+            classificado.loc[conhecidas, 'faixa_preco_prevista'] = faixas
+            classificado.loc[conhecidas, 'valor_estimado'] = valores
+
+        return {'clusterizado': clusterizado, 'previsoes': previsoes, 'classificacao': classificado}
+
+    def anexar(self, nome, df):
+        """
+        Anexa linhas ao fim de um dataset derivado, na ordem de colunas do arquivo,
+        e grava só essas linhas na versão tipada nova (esquema.anexar_tipado).
+        """
+        caminho = self.caminho_dados(nome)
+        versao_anterior = versao_dataset(ARQUIVOS_DERIVADOS[nome], self.diretorio_dados)
+        linhas = df.reindex(columns=pd.read_csv(caminho, nrows=0).columns)
+        linhas.to_csv(caminho, mode='a', header=False, index=False)
+        print(f"[INFO] {len(df)} linhas anexadas em: {caminho}")
+        anexar_tipado(linhas, ARQUIVOS_DERIVADOS[nome], versao_anterior, self.diretorio_dados,
+                      os.path.join(self.diretorio_dados, 'tipados'))
+
+    def reconstruir(self):
+        """
+        Retreina clusterização, previsão e classificação sobre todo o histórico processado.
+        O índice de duplicatas não é montado aqui; use semear_indice (--semear) com os
+        dumps brutos do histórico.
+        """
+        print("[INFO] Reconstruindo datasets derivados e modelos...")
+        if not os.path.exists(self.caminho_artefato('regras')):
+            tratamento.salvar_regras(self.caminho_artefato('regras'))
+
+        clusterer = clusterizacao.CarDataClusterer(self.caminho_dados('processado'))
+        clusterer.load_data()
+        clusterer.add_car_age(ANO_ATUAL)
+        clusterer.perform_clustering(clusterer.preprocess_for_clustering(CARACTERISTICAS_CLUSTER), N_CLUSTERS)
+        clusterer.save_model(self.caminho_artefato('clusterizacao'))
+        processado = clusterer.data
+
+        clusterizado = processado.assign(preco=processado['preco'] * ESCALA_PRECO['clusterizado'])
+        clusterizado = clusterizado.rename(columns=APELIDOS_COLUNAS['clusterizado'])
+        colunas = pd.read_csv(self.caminho_dados('clusterizado'), nrows=0).columns
+        clusterizado.reindex(columns=colunas).to_csv(self.caminho_dados('clusterizado'), index=False)
+
+        predictor = random_forest.CarPricePredictor(None)
+        predictor.data = processado.assign(preco=processado['preco'] * ESCALA_PRECO['previsoes'])
+        predictor.prepare_data(CARACTERISTICAS_PRECO, target_column='preco')
+        params = None
+        # A busca salva é de hiperparâmetros do Random Forest
+        if predictor.motor == 'random_forest' and os.path.exists(self.caminho_artefato('busca_preco')):
+            params = predictor.load_best_params(self.caminho_artefato('busca_preco'))
+        predictor.train_model(params=params)
+        predictor.save_model(self.caminho_artefato('preco'))
+        colunas = pd.read_csv(self.caminho_dados('previsoes'), nrows=0).columns
+        predictor.data = predictor.data.reindex(columns=colunas[colunas != 'Predicted Price'])
+        predictor.save_predictions(self.caminho_dados('previsoes'))
+
+        classificador = classificacao.ClassificadorCarros()
+        dados = classificador.carregar_dados(self.caminho_dados('processado'))
+        X, y = classificador.preprocessar_dados()
+        classificador.treinar_modelo(X, y)
+        classificador.salvar_modelo(self.caminho_artefato('classificacao'))
+        faixas, valores = classificador.prever(dados[CARACTERISTICAS_CLASSIFICACAO].copy())
+        dados['faixa_preco_prevista'] = faixas
+        dados['valor_estimado'] = valores
+        dados.to_csv(self.caminho_dados('classificacao'), index=False)
+
+        # Datasets regravados inteiros: tipagem e validação também sobre tudo
+        construir_tipados(self.diretorio_dados, os.path.join(self.diretorio_dados, 'tipados'),
+                          arquivos=list(ARQUIVOS_DERIVADOS.values()))
+        self.salvar_referencia(processado)
+        print("[INFO] Reconstrução concluída!\n")
+
+    def ingerir(self, caminho_novos):
+        """
+        Processa um dump de anúncios novos e anexa o resultado aos datasets derivados.
+        :param caminho_novos: CSV com os anúncios novos, no formato do dump bruto da OLX.
+        :return: Dicionário com o número de linhas, a distância de drift por coluna e se houve retreino.
+        """
+        if not os.path.exists(self.caminho_artefato('preco')):
+            print("[ERRO] Modelos salvos não encontrados. Execute antes com --reconstruir.")
+            return None
+        if not os.path.exists(self.caminho_artefato('referencia_drift')):
+            # Artefatos de antes dos esboços: a referência é montada do histórico numa passada
+            print("[INFO] Montando os esboços de referência do drift a partir do histórico.")
+            self.salvar_referencia()
+
+        indice = self.indice_duplicatas()
+        if not len(indice):
+            print("[AVISO] Índice de duplicatas vazio; semeie com os dumps do histórico (--semear).")
+        novos = self.limpar(pd.read_csv(caminho_novos), indice)
+        if novos.empty:
+            print("[INFO] Nenhuma linha nova após a limpeza.")
+            indice.salvar()
+            return {'linhas': 0, 'drift': {}, 'retreinado': False}
+
+        relatorio = self.calcular_drift(novos)
+        drift = {coluna: resultado['distancia'] for coluna, resultado in relatorio.items()}
+        print(f"[INFO] Drift das linhas novas: {drift}")
+        self.anexar('processado', novos)
+
+        acima = [coluna for coluna, resultado in relatorio.items() if resultado['acima']]
+        retreinar = bool(acima)
+        if retreinar:
+            print(f"[INFO] Drift acima do limiar em {acima}; retreinando sobre todo o histórico.")
+            self.reconstruir()
+        else:
+            for nome, df in self.pontuar(novos).items():
+                self.anexar(nome, df)
+
+        # Só agora as linhas do dump contam como vistas: se algo antes falhar, o mesmo
+        # dump pode ser ingerido de novo sem ser descartado como repetido
+        indice.salvar()
+
+        return {'linhas': len(novos), 'drift': drift, 'retreinado': retreinar}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingestão incremental de anúncios novos da OLX.")
+    parser.add_argument("arquivo", nargs="?", help="CSV com os anúncios novos (dump bruto).")
+    parser.add_argument("--reconstruir", action="store_true",
+                        help="Retreina todos os modelos sobre o histórico e salva os artefatos.")
+    parser.add_argument("--semear", nargs="+", metavar="DUMP",
+                        help="Dumps brutos já presentes no histórico, registrados no índice de duplicatas.")
+    parser.add_argument("--limiar-drift", type=float, default=None,
+                        help="Limiar único para todas as colunas monitoradas (padrão: LIMIARES_DRIFT).")
+    args = parser.parse_args()
+
+    ingestao = IngestaoIncremental(limiar_drift=args.limiar_drift)
+    if args.reconstruir:
+        ingestao.reconstruir()
+    if args.semear:
+        ingestao.semear_indice(args.semear)
+    if args.arquivo:
+        ingestao.ingerir(args.arquivo)
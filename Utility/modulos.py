@@ -0,0 +1,52 @@
+import importlib
+import importlib.abc
+import importlib.util
+import os
+import re
+import sys
+
+DIRETORIO_UTILITY = os.path.dirname(os.path.abspath(__file__))
+PREFIXO_ETAPA = 'Utility.etapa_'
+
+def nome_modulo_etapa(nome_arquivo):
+    """Nome importável de um script numerado (ex.: '2_Clusterizacao_dados.py' -> 'Utility.etapa_2_Clusterizacao_dados')."""
+    return PREFIXO_ETAPA + re.sub(r'\W', '_', os.path.splitext(nome_arquivo)[0])
+
+class ImportadorEtapas(importlib.abc.MetaPathFinder):
+    """
+    Localiza os scripts numerados da pasta Utility pelo nome importável.
+    Fica registrado em sys.meta_path ao importar o pacote Utility, então também
+    resolve os nomes em processos filhos (joblib/multiprocessing) que recebem
+    funções desses scripts por pickle.
+    """
+    def find_spec(self, fullname, path=None, target=None):
+        if not fullname.startswith(PREFIXO_ETAPA):
+            return None
+        for nome_arquivo in os.listdir(DIRETORIO_UTILITY):
+            if nome_arquivo.endswith('.py') and nome_modulo_etapa(nome_arquivo) == fullname:
+                return importlib.util.spec_from_file_location(fullname, os.path.join(DIRETORIO_UTILITY, nome_arquivo))
+        return None
+
+def registrar_importador():
+    if not any(isinstance(finder, ImportadorEtapas) for finder in sys.meta_path):
+        sys.meta_path.append(ImportadorEtapas())
+
+def importar_etapa(nome_arquivo):
+    """Importa um script numerado da pasta Utility (ex.: '2_Clusterizacao_dados.py').
+
+    Os nomes dos scripts das etapas começam com números e têm espaços, então não
+    podem ser importados com 'import'. O módulo recebe um nome válido, é
+    carregado uma única vez e pode ser serializado por pickle/joblib.
+    """
+    registrar_importador()
+    return importlib.import_module(nome_modulo_etapa(nome_arquivo))
+
+def importar_pagina(caminho):
+    """Importa um arquivo de pages/ como módulo, sem executar o main() da página."""
+    nome = 'pagina_' + re.sub(r'\W', '_', os.path.splitext(os.path.basename(caminho))[0])
+    if nome not in sys.modules:
+        spec = importlib.util.spec_from_file_location(nome, caminho)
+        modulo = importlib.util.module_from_spec(spec)
+        sys.modules[nome] = modulo
+        spec.loader.exec_module(modulo)
+    return sys.modules[nome]
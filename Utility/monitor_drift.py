@@ -0,0 +1,261 @@
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Utility.esquema import normalizar_moeda
+
+# Colunas monitoradas: distribuição numérica (t-digest) e frequência de categorias (count sketch)
+COLUNAS_NUMERICAS = ['preco', 'quilometragem', 'ano']
+COLUNAS_CATEGORICAS = ['marca', 'modelo']
+# Distância máxima aceita por coluna: Kolmogorov-Smirnov nas numéricas e
+# distância L2 entre as proporções de cada categoria nas categóricas
+LIMIARES_DRIFT = {'preco': 0.1, 'quilometragem': 0.1, 'ano': 0.1, 'marca': 0.1, 'modelo': 0.1}
+# Só o ruído de amostragem já afasta um lote pequeno da referência: cerca de
+# sqrt(1/n + 1/N) nas duas métricas (n e N linhas dos lotes comparados). O limiar
+# efetivo nunca fica abaixo desse ruído vezes o fator: 1.95 é o valor crítico do
+# teste KS a 0,1% (com cinco colunas por dump, 5% dispararia retreinos à toa com
+# frequência); nas categóricas, 3 vezes a distância L2 esperada.
+FATORES_RUIDO = {'ks': 1.95, 'l2': 3.0}
+# Nome do arquivo dos esboços de referência, gravado pela ingestão em Artefatos/
+ARQUIVO_REFERENCIA = 'referencia_drift_esbocos.json'
+TAMANHO_BLOCO = 50000
+
+class TDigest:
+    """
+    Resumo compacto e mesclável de uma distribuição numérica (t-digest com a
+    função de escala k1): centróides (média, peso) pequenos nas caudas e
+    maiores no meio, então os quantis extremos ficam precisos com poucas
+    centenas de centróides, qualquer que seja o número de valores vistos.
+    """
+    def __init__(self, compressao=200):
+        self.compressao = compressao
+        self.medias = np.empty(0)
+        self.pesos = np.empty(0)
+        self.minimo = np.inf
+        self.maximo = -np.inf
+
+    @property
+    def total(self):
+        return float(self.pesos.sum())
+
+    def _comprimir(self, medias, pesos):
+        ordem = np.argsort(medias, kind='stable')
+        medias, pesos = medias[ordem], pesos[ordem]
+        # Posição (quantil) do centro de cada ponto ou centróide, levada à escala k1;
+        # tudo o que cai na mesma unidade de k vira um único centróide
+        centro = (np.cumsum(pesos) - pesos / 2) / pesos.sum()
+        k = self.compressao / (2 * np.pi) * np.arcsin(2 * centro - 1)
+        _, grupo = np.unique(np.floor(k), return_inverse=True)
+        soma_pesos = np.bincount(grupo, weights=pesos)
+        self.medias = np.bincount(grupo, weights=pesos * medias) / soma_pesos
+        self.pesos = soma_pesos
+
+    def atualizar(self, valores):
+        """Acrescenta um lote de valores (NaN são ignorados)."""
+        valores = np.asarray(valores, dtype=float)
+        valores = valores[~np.isnan(valores)]
+        if len(valores):
+            self.minimo = min(self.minimo, valores.min())
+            self.maximo = max(self.maximo, valores.max())
+            self._comprimir(np.concatenate([self.medias, valores]),
+                            np.concatenate([self.pesos, np.ones(len(valores))]))
+        return self
+
+    def mesclar(self, outro):
+        """Combina com outro t-digest, como se os dois lotes de valores tivessem sido vistos aqui."""
+        if len(outro.pesos):
+            self.minimo = min(self.minimo, outro.minimo)
+            self.maximo = max(self.maximo, outro.maximo)
+            self._comprimir(np.concatenate([self.medias, outro.medias]),
+                            np.concatenate([self.pesos, outro.pesos]))
+        return self
+
+    def _pontos(self):
+        centros = (np.cumsum(self.pesos) - self.pesos / 2) / self.total
+        return np.r_[self.minimo, self.medias, self.maximo], np.r_[0.0, centros, 1.0]
+
+    def cdf(self, x):
+        """Fração estimada dos valores menores ou iguais a x."""
+        valores, fracoes = self._pontos()
+        return np.interp(x, valores, fracoes, left=0.0, right=1.0)
+
+    def quantil(self, q):
+        valores, fracoes = self._pontos()
+        return np.interp(q, fracoes, valores)
+
+    def distancia_ks(self, outro):
+        """Maior diferença entre as duas funções de distribuição (Kolmogorov-Smirnov)."""
+        # As duas CDFs são lineares por partes: o máximo da diferença está num dos pontos de quebra
+        pontos = np.union1d(self._pontos()[0], outro._pontos()[0])
+        return float(np.max(np.abs(self.cdf(pontos) - outro.cdf(pontos))))
+
+    def para_dict(self):
+        return {'compressao': self.compressao, 'minimo': self.minimo, 'maximo': self.maximo,
+                'medias': self.medias.tolist(), 'pesos': self.pesos.tolist()}
+
+    @classmethod
+    def de_dict(cls, dados):
+        digest = cls(dados['compressao'])
+        digest.minimo, digest.maximo = dados['minimo'], dados['maximo']
+        digest.medias = np.asarray(dados['medias'], dtype=float)
+        digest.pesos = np.asarray(dados['pesos'], dtype=float)
+        return digest
+
+class CountSketch:
+    """
+    Frequências aproximadas de categorias num tamanho fixo (profundidade × largura
+    contadores): cada categoria soma ±1 num contador de cada linha, escolhido por
+    hash. O esboço é linear, então esboços com os mesmos parâmetros podem ser
+    somados (mesclar) e a diferença entre dois estima a distância L2 entre as
+    distribuições sem guardar as categorias.
+    """
+    def __init__(self, largura=512, profundidade=5):
+        self.largura = largura
+        self.profundidade = profundidade
+        self.tabela = np.zeros((profundidade, largura), dtype=np.int64)
+        self.total = 0
+
+    def _posicoes(self, chaves):
+        """Contador e sinal de cada chave em cada linha; hash estável entre processos."""
+        chaves = np.asarray(chaves, dtype=object)
+        hashes = np.stack([pd.util.hash_array(chaves, hash_key=f'esboco{linha:010d}')
+                           for linha in range(self.profundidade)])
+        contadores = (hashes % np.uint64(self.largura)).astype(np.intp)
+        sinais = ((hashes >> np.uint64(32)) & np.uint64(1)).astype(np.int64) * 2 - 1
+        return contadores, sinais
+
+    def atualizar(self, valores):
+        """Acrescenta um lote de categorias (valores ausentes são ignorados)."""
+        contagem = pd.Series(valores).dropna().astype(str).value_counts()
+        if len(contagem):
+            contadores, sinais = self._posicoes(contagem.index.to_numpy())
+            for linha in range(self.profundidade):
+                np.add.at(self.tabela[linha], contadores[linha], sinais[linha] * contagem.to_numpy())
+            self.total += int(contagem.sum())
+        return self
+
+    def mesclar(self, outro):
+        self.tabela += outro.tabela
+        self.total += outro.total
+        return self
+
+    def estimar(self, chaves):
+        """Frequência estimada de cada chave."""
+        contadores, sinais = self._posicoes([str(chave) for chave in chaves])
+        linhas = np.arange(self.profundidade)[:, None]
+        return np.median(sinais * self.tabela[linhas, contadores], axis=0)
+
+    def distancia_l2(self, outro):
+        """Distância L2 estimada entre as proporções de cada categoria nos dois esboços."""
+        diferenca = self.tabela / max(self.total, 1) - outro.tabela / max(outro.total, 1)
+        return float(np.sqrt(np.median(np.sum(diferenca ** 2, axis=1))))
+
+    def para_dict(self):
+        return {'largura': self.largura, 'profundidade': self.profundidade,
+                'total': self.total, 'tabela': self.tabela.tolist()}
+
+    @classmethod
+    def de_dict(cls, dados):
+        esboco = cls(dados['largura'], dados['profundidade'])
+        esboco.tabela = np.asarray(dados['tabela'], dtype=np.int64)
+        esboco.total = dados['total']
+        return esboco
+
+class MonitorDrift:
+    """
+    Esboços das colunas monitoradas de um conjunto de anúncios. O dos dados de
+    treino fica salvo como referência (alguns KB); um dump novo passa uma vez
+    pelos mesmos esboços e é comparado com ela, sem reler o histórico.
+    """
+    def __init__(self):
+        self.digests = {coluna: TDigest() for coluna in COLUNAS_NUMERICAS}
+        self.esbocos = {coluna: CountSketch() for coluna in COLUNAS_CATEGORICAS}
+        self.linhas = 0
+
+    def observar(self, df):
+        """Passa um bloco de linhas (formato do dataset processado) pelos esboços."""
+        for coluna, digest in self.digests.items():
+            digest.atualizar(normalizar_moeda(df[coluna]) if coluna == 'preco' else df[coluna])
+        for coluna, esboco in self.esbocos.items():
+            esboco.atualizar(df[coluna])
+        self.linhas += len(df)
+        return self
+
+    def mesclar(self, outro):
+        for coluna, digest in self.digests.items():
+            digest.mesclar(outro.digests[coluna])
+        for coluna, esboco in self.esbocos.items():
+            esboco.mesclar(outro.esbocos[coluna])
+        self.linhas += outro.linhas
+        return self
+
+    def comparar(self, novos, limiares=None):
+        """
+        Distância entre esta referência e os esboços de 'novos', por coluna.
+        O limiar de cada coluna é elevado até o ruído de amostragem esperado
+        para os tamanhos dos dois lotes (ver FATORES_RUIDO), então um lote
+        pequeno e sem mudança real não passa do limiar só por acaso.
+        :param limiares: {coluna: limiar}; as colunas ausentes usam LIMIARES_DRIFT.
+        :return: {coluna: {'metrica', 'distancia', 'ruido', 'limiar', 'acima'}}
+        """
+        limiares = {**LIMIARES_DRIFT, **(limiares or {})}
+        relatorio = {}
+        for coluna, digest in self.digests.items():
+            outro = novos.digests[coluna]
+            relatorio[coluna] = {'metrica': 'ks', 'distancia': digest.distancia_ks(outro),
+                                 'linhas': (digest.total, outro.total)}
+        for coluna, esboco in self.esbocos.items():
+            outro = novos.esbocos[coluna]
+            relatorio[coluna] = {'metrica': 'l2', 'distancia': esboco.distancia_l2(outro),
+                                 'linhas': (esboco.total, outro.total)}
+        for coluna, resultado in relatorio.items():
+            referencia, lote = resultado.pop('linhas')
+            resultado['ruido'] = FATORES_RUIDO[resultado['metrica']] * np.sqrt(1 / max(referencia, 1) + 1 / max(lote, 1))
+            resultado['limiar'] = max(limiares[coluna], resultado['ruido'])
+            resultado['acima'] = resultado['distancia'] > resultado['limiar']
+        return relatorio
+
+    def salvar(self, caminho):
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            json.dump({'linhas': self.linhas,
+                       'digests': {coluna: d.para_dict() for coluna, d in self.digests.items()},
+                       'esbocos': {coluna: e.para_dict() for coluna, e in self.esbocos.items()}}, arquivo)
+
+    @classmethod
+    def carregar(cls, caminho):
+        with open(caminho, encoding='utf-8') as arquivo:
+            dados = json.load(arquivo)
+        monitor = cls()
+        monitor.linhas = dados['linhas']
+        monitor.digests = {coluna: TDigest.de_dict(d) for coluna, d in dados['digests'].items()}
+        monitor.esbocos = {coluna: CountSketch.de_dict(e) for coluna, e in dados['esbocos'].items()}
+        return monitor
+
+    @classmethod
+    def de_csv(cls, caminho, tamanho_bloco=TAMANHO_BLOCO):
+        """Esboços de um CSV no formato do dataset processado, lido em blocos numa única passada."""
+        monitor = cls()
+        for bloco in pd.read_csv(caminho, usecols=COLUNAS_NUMERICAS + COLUNAS_CATEGORICAS, chunksize=tamanho_bloco):
+            monitor.observar(bloco)
+        return monitor
+
+if __name__ == "__main__":
+    from Utility.ingestao_incremental import DIRETORIO_ARTEFATOS
+
+    parser = argparse.ArgumentParser(description="Compara um CSV de anúncios processados com a referência de drift.")
+    parser.add_argument("arquivo", help="CSV no formato de Datas/1_Cars_processado.csv.")
+    parser.add_argument("--referencia", default=os.path.join(DIRETORIO_ARTEFATOS, ARQUIVO_REFERENCIA),
+                        help="Esboços de referência (gravados pela ingestão incremental).")
+    args = parser.parse_args()
+
+    relatorio = MonitorDrift.carregar(args.referencia).comparar(MonitorDrift.de_csv(args.arquivo))
+    for coluna, resultado in relatorio.items():
+        marcador = "ACIMA DO LIMIAR" if resultado['acima'] else "ok"
+        print(f"{coluna:>15}: {resultado['metrica']} = {resultado['distancia']:.4f} "
+              f"(limiar {resultado['limiar']:.4f}) {marcador}")
+    sys.exit(1 if any(resultado['acima'] for resultado in relatorio.values()) else 0)
@@ -0,0 +1,95 @@
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import (HistGradientBoostingClassifier, HistGradientBoostingRegressor,
+                              RandomForestClassifier, RandomForestRegressor)
+
+MOTORES = ('random_forest', 'hist_gradient_boosting')
+NOMES_MOTORES = {'random_forest': 'Random Forest', 'hist_gradient_boosting': 'Gradient Boosting (histogramas)'}
+
+# Motor de treino dos classificadores e do preditor de preço. O padrão continua
+# o Random Forest; PISI3_MOTOR=hist_gradient_boosting troca pelo gradient
+# boosting por histogramas, com ajuste bem mais rápido e modelos menores.
+MOTOR = os.environ.get('PISI3_MOTOR', 'random_forest')
+
+# Colunas tratadas como categóricas nativas pelo gradient boosting (divisões por
+# conjuntos de categorias, e não por limiares sobre os códigos do LabelEncoder)
+COLUNAS_CATEGORICAS = ['marca', 'modelo', 'combustivel', 'tipo', 'transmissão']
+
+# O gradient boosting só aceita categóricas com até max_bins categorias (255
+# por padrão), codificadas de 0 a max_bins - 1. No dataset atual a maior é
+# 'modelo', com 44; o limite protege dumps futuros com mais modelos
+MAXIMO_CATEGORIAS = 255
+
+# Early stopping: 10% do treino fica para validação e o ajuste para quando a
+# perda não melhora por 10 iterações seguidas
+PARAMETROS_HGB = {'max_iter': 500, 'learning_rate': 0.1, 'early_stopping': True,
+                  'validation_fraction': 0.1, 'n_iter_no_change': 10}
+
+def nome_motor(motor=None):
+    """Retorna o motor pedido (padrão: PISI3_MOTOR), validado."""
+    motor = motor or MOTOR
+    if motor not in MOTORES:
+        raise ValueError(f"Motor inválido: {motor}. Use um de {MOTORES}.")
+    return motor
+
+def categoricas(colunas, maximo_categorias=MAXIMO_CATEGORIAS):
+    """
+    Colunas de 'colunas' tratadas como categóricas nativas.
+    Com o DataFrame de treino no lugar dos nomes, as colunas com mais de
+    maximo_categorias categorias, ou com códigos a partir de maximo_categorias
+    (um LabelEncoder ajustado em mais dados que o treino), ficam como
+    numéricas, com divisões por limiares sobre os códigos.
+    """
+    selecionadas = [coluna for coluna in colunas if coluna in COLUNAS_CATEGORICAS]
+    if not isinstance(colunas, pd.DataFrame):
+        return selecionadas
+
+    def excede(valores):
+        if valores.nunique() > maximo_categorias:
+            return True
+        return pd.api.types.is_numeric_dtype(valores) and valores.max() >= maximo_categorias
+
+    excedentes = [coluna for coluna in selecionadas if excede(colunas[coluna])]
+    if excedentes:
+        print(f"[AVISO] Mais de {maximo_categorias} categorias em {', '.join(excedentes)}; "
+              f"tratadas como numéricas pelo gradient boosting.")
+    return [coluna for coluna in selecionadas if coluna not in excedentes]
+
+def criar_modelo(tarefa, motor=None, colunas=(), random_state=42, **params):
+    """
+    Cria o estimador do motor pedido.
+    :param tarefa: 'classificacao' ou 'regressao'.
+    :param colunas: Nomes das colunas de entrada, para marcar as categóricas no gradient boosting,
+        ou o próprio X de treino, para checar também quantas categorias cada uma tem (ver categoricas).
+    :param params: Hiperparâmetros repassados ao estimador (sobrepõem os padrões).
+    """
+    if nome_motor(motor) == 'random_forest':
+        classe = RandomForestClassifier if tarefa == 'classificacao' else RandomForestRegressor
+        return classe(random_state=random_state, **params)
+    classe = HistGradientBoostingClassifier if tarefa == 'classificacao' else HistGradientBoostingRegressor
+    params = {**PARAMETROS_HGB, **params}
+    colunas_categoricas = categoricas(colunas, params.get('max_bins', MAXIMO_CATEGORIAS))
+    return classe(categorical_features=colunas_categoricas or None, random_state=random_state, **params)
+
+def codificar_categoricas(df, categorias=None, maximo_categorias=MAXIMO_CATEGORIAS):
+    """
+    Troca as colunas categóricas de texto de df pelos seus códigos (0, 1, ...),
+    como o gradient boosting espera. Com 'categorias' (as do treino), usa os
+    mesmos códigos; categorias desconhecidas viram NaN, que o modelo trata como
+    ausentes. Uma coluna com mais de maximo_categorias categorias fica só com
+    as mais frequentes; as raras também viram NaN.
+    :return: (DataFrame codificado, {coluna: lista de categorias}).
+    """
+    df = df.copy()
+    categorias = dict(categorias or {})
+    for coluna in categoricas(df.columns):
+        if not pd.api.types.is_object_dtype(df[coluna]):
+            continue
+        if coluna not in categorias:
+            frequentes = df[coluna].value_counts().index[:maximo_categorias]
+            categorias[coluna] = sorted(frequentes)
+        codigos = pd.Categorical(df[coluna], categories=categorias[coluna]).codes
+        df[coluna] = np.where(codigos < 0, np.nan, codigos)
+    return df, categorias
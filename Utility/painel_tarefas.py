@@ -0,0 +1,40 @@
+import time
+
+import streamlit as st
+
+from .fila_tarefas import CANCELADA, CONCLUIDA, ERRO, obter_fila
+
+def exibir_tarefa(tarefa, rotulo):
+    """
+    Mostra o andamento de uma tarefa da fila na página.
+    Retorna o resultado quando a tarefa terminou; enquanto ela estiver na fila ou
+    executando, mostra a barra de progresso e o botão de cancelar e retorna None.
+    O cancelamento vale para esta sessão até o usuário pedir para tentar de novo.
+    """
+    if tarefa.estado == CONCLUIDA:
+        return tarefa.resultado
+    if tarefa.estado == ERRO:
+        st.error(f"ERRO EM {rotulo}: {tarefa.erro}")
+        return None
+    if tarefa.estado == CANCELADA:
+        st.warning(f"{rotulo}: CANCELADO.")
+        if st.button("TENTAR NOVAMENTE", key=f"retomar_{tarefa.chave}"):
+            obter_fila().retomar(tarefa.chave)
+            st.rerun()
+        return None
+
+    st.progress(tarefa.progresso, text=f"{rotulo}: {tarefa.mensagem}")
+    if st.button("CANCELAR", key=f"cancelar_{tarefa.chave}"):
+        obter_fila().cancelar(tarefa.chave)
+        st.rerun()
+    return None
+
+def aguardar_pendentes(*tarefas, intervalo=0.5):
+    """
+    Chamada no fim da página: se alguma tarefa ainda está ativa, espera um pouco
+    e executa a página de novo para atualizar o progresso. Como o restante da
+    página já foi desenhado, a interface continua utilizável durante a espera.
+    """
+    if any(tarefa is not None and tarefa.ativa for tarefa in tarefas):
+        time.sleep(intervalo)
+        st.rerun()
@@ -0,0 +1,81 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+
+DIRETORIO_DADOS = 'Datas'
+DIRETORIO_RELATORIOS = 'reports'
+ARQUIVO_INDICE = 'indice_perfis.json'
+
+def hash_arquivo(caminho, tamanho_bloco=1 << 20):
+    """SHA-256 do conteúdo do arquivo, lido em blocos."""
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(tamanho_bloco), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+def carregar_indice(diretorio_relatorios=DIRETORIO_RELATORIOS):
+    """Lê o índice {dataset: metadados do relatório} gerado por gerar_relatorios."""
+    try:
+        with open(os.path.join(diretorio_relatorios, ARQUIVO_INDICE), encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except FileNotFoundError:
+        return {}
+
+def gerar_relatorios(diretorio_dados=DIRETORIO_DADOS, diretorio_relatorios=DIRETORIO_RELATORIOS,
+                     limite_linhas=50000, random_state=42):
+    """
+    Gera o relatório de perfil (HTML e JSON) de cada Datas/*.csv que ainda não tenha um.
+    Os arquivos são nomeados pelo hash do CSV, então uma versão já perfilada
+    não é processada de novo. Usa o modo mínimo do ydata-profiling e, acima de
+    limite_linhas, perfila uma amostra desse tamanho.
+    """
+    # Importado aqui porque é pesado e só o job offline precisa dele
+    from ydata_profiling import ProfileReport
+
+    os.makedirs(diretorio_relatorios, exist_ok=True)
+    indice = carregar_indice(diretorio_relatorios)
+
+    for caminho in sorted(glob.glob(os.path.join(diretorio_dados, '*.csv'))):
+        nome = os.path.basename(caminho)
+        versao = hash_arquivo(caminho)
+        base = f"{os.path.splitext(nome)[0]}-{versao[:16]}"
+        html, json_relatorio = base + '.html', base + '.json'
+        if all(os.path.exists(os.path.join(diretorio_relatorios, f)) for f in (html, json_relatorio)):
+            print(f"[INFO] {nome}: relatório da versão {versao[:16]} já existe.")
+        else:
+            print(f"[INFO] Gerando relatório de {nome}...")
+            df = pd.read_csv(caminho)
+            linhas = len(df)
+            amostrado = linhas > limite_linhas
+            if amostrado:
+                df = df.sample(limite_linhas, random_state=random_state)
+            relatorio = ProfileReport(df, title=f"Perfil - {nome}", minimal=True)
+            relatorio.to_file(os.path.join(diretorio_relatorios, html))
+            relatorio.to_file(os.path.join(diretorio_relatorios, json_relatorio))
+            indice[nome] = {
+                'hash': versao,
+                'html': html,
+                'json': json_relatorio,
+                'linhas': linhas,
+                'amostra': limite_linhas if amostrado else None,
+                'tamanho_csv': os.path.getsize(caminho),
+                'modificado_csv': os.path.getmtime(caminho),
+                'gerado_em': time.strftime('%Y-%m-%d %H:%M:%S')
+            }
+
+        with open(os.path.join(diretorio_relatorios, ARQUIVO_INDICE), 'w', encoding='utf-8') as arquivo:
+            json.dump(indice, arquivo, ensure_ascii=False, indent=2)
+    print("[INFO] Relatórios de perfil atualizados.\n")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera os relatórios de perfil dos datasets.")
+    parser.add_argument("--limite-linhas", type=int, default=50000,
+                        help="Acima deste número de linhas o perfil é feito sobre uma amostra.")
+    args = parser.parse_args()
+    gerar_relatorios(limite_linhas=args.limite_linhas)
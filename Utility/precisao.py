@@ -0,0 +1,28 @@
+import os
+
+import numpy as np
+
+PRECISOES = ('float64', 'float32')
+
+# Precisão das matrizes de características usadas na normalização, no K-Means e
+# nas florestas. O padrão continua float64; PISI3_PRECISAO=float32 ativa o modo
+# de 32 bits, que reduz pela metade a memória e o tráfego dessas matrizes.
+# O impacto na qualidade é medido por Utility/benchmark_precisao.py.
+PRECISAO = os.environ.get('PISI3_PRECISAO', 'float64')
+
+def dtype_calculo(precisao=None):
+    """Retorna o dtype numpy da precisão pedida (padrão: PISI3_PRECISAO)."""
+    precisao = precisao or PRECISAO
+    if precisao not in PRECISOES:
+        raise ValueError(f"Precisão inválida: {precisao}. Use uma de {PRECISOES}.")
+    return np.dtype(precisao)
+
+def para_calculo(X, precisao=None):
+    """Converte a matriz de características (DataFrame ou array) para a precisão
+    de cálculo, sem copiar quando ela já está nesse dtype."""
+    dtype = dtype_calculo(precisao)
+    if isinstance(X, np.ndarray):
+        return X.astype(dtype, copy=False)
+    if all(tipo == dtype for tipo in X.dtypes):
+        return X
+    return X.astype(dtype)
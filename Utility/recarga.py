@@ -0,0 +1,142 @@
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Utility.anuncios_similares import ARQUIVO_PADRAO as ARQUIVO_SIMILARES, obter_indice, remover_indices_antigos
+from Utility.aquecimento import PAGINAS_AQUECIDAS, aquecer_paginas
+from Utility.esquema import (ESQUEMAS, DIRETORIO_DADOS, construir_tipados, publicar_versoes,
+                             remover_tipados_antigos, versao_dataset, versao_publicada)
+from Utility.fila_tarefas import CONCLUIDA
+
+# Segundos entre duas verificações dos CSVs de Datas/
+INTERVALO = float(os.environ.get('PISI3_INTERVALO_RECARGA', 10))
+# Segundos que as versões anteriores (Parquet tipado e índice de similares)
+# ficam no disco depois da troca, para as execuções que ainda as leem
+CARENCIA = float(os.environ.get('PISI3_CARENCIA_VERSOES', 600))
+
+class ObservadorDados:
+    """
+    Observa os CSVs dos datasets derivados (data de modificação e tamanho) e
+    troca as páginas para a versão nova sem reiniciar o servidor.
+
+    Um CSV alterado só é considerado pronto quando aparece igual em duas
+    verificações seguidas, ou seja, quando o pipeline terminou de gravá-lo.
+    A versão nova é então preparada nesta thread, fora das requisições:
+    Parquet tipado (com validação do esquema), índice de anúncios similares e
+    o aquecimento das páginas, que treina os modelos e roda as varreduras na
+    fila com as chaves da versão nova. Só depois ela é publicada
+    (publicar_versoes). As páginas leem a versão publicada no início de cada
+    execução: as execuções em andamento terminam na versão antiga e as
+    seguintes já encontram os caches da nova prontos.
+    Se a validação ou o aquecimento falha, a versão antiga continua publicada.
+    Cada versão tem seu diretório tipado e seu índice, então a preparação
+    nunca mexe no que a versão publicada lê; as versões anteriores são
+    removidas 'carencia' segundos depois da troca.
+
+    Só os CSVs são observados: as páginas não carregam os artefatos do
+    pipeline (Artefatos/), elas treinam os próprios modelos na fila com
+    chaves da versão publicada dos dados, então um artefato novo não muda
+    nada do que é servido.
+    """
+    def __init__(self, paginas=PAGINAS_AQUECIDAS, intervalo=INTERVALO, diretorio_dados=DIRETORIO_DADOS,
+                 carencia=CARENCIA):
+        self.paginas = paginas
+        self.intervalo = intervalo
+        self.diretorio_dados = diretorio_dados
+        self.carencia = carencia
+        self._vistos = {}
+        self._falhas = {}
+        self._remocoes = []
+        self._parar = threading.Event()
+
+    def _assinatura(self, nome_arquivo):
+        try:
+            estado = os.stat(os.path.join(self.diretorio_dados, nome_arquivo))
+        except FileNotFoundError:
+            return None
+        return estado.st_mtime, estado.st_size
+
+    def remover_antigas(self, agora=None):
+        """Remove as versões anteriores cuja carência já terminou."""
+        agora = time.time() if agora is None else agora
+        vencidas = [remocao for remocao in self._remocoes if remocao[0] <= agora]
+        self._remocoes = [remocao for remocao in self._remocoes if remocao[0] > agora]
+        for _, nome_arquivo, versao in vencidas:
+            remover_tipados_antigos(nome_arquivo, versao)
+            if nome_arquivo == ARQUIVO_SIMILARES:
+                remover_indices_antigos(nome_arquivo, versao)
+
+    def verificar(self):
+        """Uma rodada de verificação; prepara e publica os datasets novos já estáveis."""
+        self.remover_antigas()
+        prontos = []
+        for nome_arquivo in ESQUEMAS:
+            assinatura = self._assinatura(nome_arquivo)
+            if assinatura is None or assinatura[0] == versao_publicada(nome_arquivo, self.diretorio_dados):
+                self._vistos.pop(nome_arquivo, None)
+                continue
+            # Uma versão que já falhou só é tentada de novo se o arquivo mudar outra vez
+            if self._vistos.get(nome_arquivo) == assinatura and self._falhas.get(nome_arquivo) != assinatura:
+                prontos.append(nome_arquivo)
+            self._vistos[nome_arquivo] = assinatura
+        return self.recarregar(prontos) if prontos else []
+
+    def recarregar(self, nomes_arquivos):
+        """
+        Prepara a versão atual dos datasets e a publica.
+        :return: Datasets publicados.
+        """
+        versoes = {nome: versao_dataset(nome, self.diretorio_dados) for nome in nomes_arquivos}
+        assinaturas = {nome: self._assinatura(nome) for nome in nomes_arquivos}
+        print(f"[INFO] Preparando a versão nova de {', '.join(nomes_arquivos)}...")
+        try:
+            construir_tipados(self.diretorio_dados, arquivos=nomes_arquivos)
+            if ARQUIVO_SIMILARES in nomes_arquivos:
+                obter_indice(ARQUIVO_SIMILARES, versoes[ARQUIVO_SIMILARES])
+            estados = aquecer_paginas(self.paginas)
+        except Exception as e:
+            print(f"[ERRO] Falha ao preparar {', '.join(nomes_arquivos)}; a versão anterior continua publicada: {e}")
+            self._falhas.update(assinaturas)
+            return []
+
+        falhas = [descricao for descricao, estado in estados.items() if estado != CONCLUIDA]
+        if falhas:
+            print(f"[ERRO] Aquecimento incompleto ({', '.join(falhas)}); a versão anterior continua publicada.")
+            self._falhas.update(assinaturas)
+            return []
+
+        # Arquivos regravados durante a preparação ficam para a próxima verificação
+        prontas = {nome: versao for nome, versao in versoes.items()
+                   if versao_dataset(nome, self.diretorio_dados) == versao}
+        publicar_versoes(prontas)
+        # As execuções iniciadas antes da troca ainda podem ler a versão anterior
+        self._remocoes.extend((time.time() + self.carencia, nome, versao) for nome, versao in prontas.items())
+        for nome in prontas:
+            self._falhas.pop(nome, None)
+        if prontas:
+            print(f"[INFO] Versão nova publicada: {', '.join(prontas)}.")
+        return list(prontas)
+
+    def executar(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.verificar()
+            except Exception as e:
+                print(f"[ERRO] Observador de dados: {e}")
+
+    def parar(self):
+        self._parar.set()
+
+_observador = None
+_lock_observador = threading.Lock()
+
+def iniciar_observador():
+    """Inicia o observador uma única vez por processo, numa thread em segundo plano."""
+    global _observador
+    with _lock_observador:
+        if _observador is None:
+            _observador = ObservadorDados()
+            threading.Thread(target=_observador.executar, name='observador-dados', daemon=True).start()
+        return _observador
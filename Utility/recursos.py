@@ -0,0 +1,77 @@
+import os
+import threading
+from contextlib import contextmanager
+
+from threadpoolctl import threadpool_limits
+
+class ControladorRecursos:
+    """
+    Divide um orçamento de núcleos entre os ajustes e previsões em andamento no processo.
+    Cada trabalho reserva uma fatia do orçamento, usada como n_jobs do estimador e
+    como limite de threads BLAS/OpenMP (threadpoolctl) enquanto ele executa:
+    - com um único trabalho, ele usa todo o orçamento;
+    - com vários, o orçamento é dividido igualmente entre eles;
+    - se a carga da máquina (load average) já passa do número de núcleos, a fatia
+      é reduzida na mesma proporção.
+    Toda fatia tem pelo menos um núcleo.
+    """
+    def __init__(self, nucleos=None):
+        self.nucleos = nucleos or int(os.environ.get('PISI3_NUCLEOS', os.cpu_count() or 1))
+        self._ativos = 0
+        self._lock = threading.Lock()
+
+    def _fatia(self):
+        fatia = self.nucleos // max(self._ativos, 1)
+        try:
+            carga = os.getloadavg()[0]
+        except (AttributeError, OSError):
+            carga = 0
+        total = os.cpu_count() or 1
+        if carga > total:
+            fatia = int(fatia * total / carga)
+        return max(fatia, 1)
+
+    @contextmanager
+    def reservar(self, maximo=None):
+        """Reserva núcleos para um trabalho; entrega o número de núcleos concedido."""
+        with self._lock:
+            self._ativos += 1
+            n = self._fatia()
+        if maximo is not None:
+            n = max(1, min(n, maximo))
+        try:
+            with threadpool_limits(limits=n):
+                yield n
+        finally:
+            with self._lock:
+                self._ativos -= 1
+
+    def executar(self, estimador, metodo, *args, **kwargs):
+        """Chama estimador.metodo(*args, **kwargs) dentro de uma reserva, ajustando n_jobs se o estimador tiver."""
+        with self.reservar() as n:
+            if 'n_jobs' in estimador.get_params(deep=False):
+                estimador.set_params(n_jobs=n)
+            return getattr(estimador, metodo)(*args, **kwargs)
+
+_controlador = None
+_lock_controlador = threading.Lock()
+
+def obter_controlador():
+    """Instância única do controlador no processo."""
+    global _controlador
+    with _lock_controlador:
+        if _controlador is None:
+            _controlador = ControladorRecursos()
+        return _controlador
+
+def ajustar(estimador, *args, **kwargs):
+    """estimador.fit(...) com núcleos e threads concedidos pelo controlador."""
+    return obter_controlador().executar(estimador, 'fit', *args, **kwargs)
+
+def prever(estimador, *args, **kwargs):
+    """estimador.predict(...) com núcleos e threads concedidos pelo controlador."""
+    return obter_controlador().executar(estimador, 'predict', *args, **kwargs)
+
+def ajustar_prever(estimador, *args, **kwargs):
+    """estimador.fit_predict(...) com núcleos e threads concedidos pelo controlador."""
+    return obter_controlador().executar(estimador, 'fit_predict', *args, **kwargs)
@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from scipy.ndimage import gaussian_filter1d
+
+# Os gráficos de caixa, violino e densidade são montados a partir de resumos
+# calculados no servidor (quartis, curvas KDE e histogramas 2D), então o tamanho
+# da figura enviada ao navegador depende do número de grupos e de bins, e não
+# do número de linhas do dataset.
+
+def resumo_caixa(df, grupo, valor, limite_outliers=100):
+    """
+    Quartis, limites dos bigodes (1,5 × IQR, como no Plotly) e outliers de 'valor' por 'grupo'.
+    Retorna (resumo, outliers): resumo tem uma linha por grupo e outliers guarda,
+    por grupo, no máximo limite_outliers valores espaçados ao longo dos outliers ordenados.
+    """
+    linhas, outliers = [], {}
+    for nome, valores in df.groupby(grupo, sort=False)[valor]:
+        valores = np.sort(valores.dropna().to_numpy())
+        if len(valores) == 0:
+            continue
+        q1, mediana, q3 = np.quantile(valores, [0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        dentro = valores[(valores >= q1 - 1.5 * iqr) & (valores <= q3 + 1.5 * iqr)]
+        fora = valores[(valores < q1 - 1.5 * iqr) | (valores > q3 + 1.5 * iqr)]
+        if len(fora) > limite_outliers:
+            fora = fora[np.linspace(0, len(fora) - 1, limite_outliers).astype(int)]
+        linhas.append({'grupo': nome, 'q1': q1, 'mediana': mediana, 'q3': q3,
+                       'limite_inferior': dentro.min(), 'limite_superior': dentro.max(),
+                       'n': len(valores)})
+        outliers[nome] = fora
+    colunas = ['grupo', 'q1', 'mediana', 'q3', 'limite_inferior', 'limite_superior', 'n']
+    return pd.DataFrame(linhas, columns=colunas), outliers
+
+def _largura_banda(valores):
+    """Regra de Silverman (a mesma usada pelo violino do Plotly)."""
+    desvio = valores.std()
+    iqr = np.subtract(*np.quantile(valores, [0.75, 0.25]))
+    escala = min(desvio, iqr / 1.349) if iqr > 0 else desvio
+    if escala <= 0:
+        escala = max(abs(valores.mean()) * 0.05, 1.0)
+    return 1.059 * escala * len(valores) ** (-1 / 5)
+
+def curvas_kde(df, grupo, valor, n_pontos=64):
+    """
+    Curva de densidade (KDE gaussiano) de 'valor' por 'grupo', calculada sobre um
+    histograma fino suavizado: custo linear no número de linhas.
+    Retorna {grupo: (grade, densidade)}.
+    """
+    curvas = {}
+    for nome, valores in df.groupby(grupo, sort=False)[valor]:
+        valores = valores.dropna().to_numpy(dtype=float)
+        if len(valores) == 0:
+            continue
+        largura = _largura_banda(valores)
+        grade = np.linspace(valores.min() - 2 * largura, valores.max() + 2 * largura, n_pontos)
+        passo = grade[1] - grade[0]
+        contagens, _ = np.histogram(valores, bins=n_pontos, range=(grade[0] - passo / 2, grade[-1] + passo / 2))
+        densidade = gaussian_filter1d(contagens.astype(float), largura / passo, mode='constant')
+        curvas[nome] = (grade, densidade / (len(valores) * passo))
+    return curvas
+
+def histograma_2d(df, x, y, bins=40):
+    """Contagens de um histograma 2D de (x, y); retorna (centros_x, centros_y, contagens[y, x])."""
+    contagens, bordas_x, bordas_y = np.histogram2d(df[x].to_numpy(dtype=float), df[y].to_numpy(dtype=float), bins=bins)
+    return (bordas_x[:-1] + bordas_x[1:]) / 2, (bordas_y[:-1] + bordas_y[1:]) / 2, contagens.T
+
+def _cores(grupos, cores):
+    paleta = px.colors.qualitative.Plotly
+    cores = cores or {}
+    return {g: cores.get(g, paleta[i % len(paleta)]) for i, g in enumerate(grupos)}
+
+def figura_caixa(resumo, outliers, cores=None):
+    """Boxplot a partir de resumo_caixa: um traço por grupo mais os outliers como pontos."""
+    cores = _cores(resumo['grupo'], cores)
+    fig = go.Figure()
+    for linha in resumo.itertuples(index=False):
+        fig.add_trace(go.Box(
+            x=[linha.grupo], q1=[linha.q1], median=[linha.mediana], q3=[linha.q3],
+            lowerfence=[linha.limite_inferior], upperfence=[linha.limite_superior],
+            name=str(linha.grupo), marker_color=cores[linha.grupo], boxpoints=False
+        ))
+        if len(outliers[linha.grupo]):
+            fig.add_trace(go.Scatter(
+                x=[linha.grupo] * len(outliers[linha.grupo]), y=outliers[linha.grupo], mode='markers',
+                marker=dict(color=cores[linha.grupo], size=4), name=str(linha.grupo), hoverinfo='y'
+            ))
+    return fig
+
+def figura_violino(curvas, resumo, cores=None, largura=0.8):
+    """
+    Violino a partir de curvas_kde (contorno) e resumo_caixa (caixa interna).
+    Cada grupo ocupa uma posição inteira do eixo x, rotulada com o nome do grupo.
+    """
+    grupos = list(curvas)
+    cores = _cores(grupos, cores)
+    resumo = resumo.set_index('grupo')
+    maximo = max((densidade.max() for _, densidade in curvas.values()), default=1) or 1
+    fig = go.Figure()
+    for posicao, nome in enumerate(grupos):
+        grade, densidade = curvas[nome]
+        # Arredondado: casas além destas não mudam o desenho e só aumentam a figura
+        meia_largura = np.round(densidade / maximo * largura / 2, 3)
+        grade = np.round(grade, 1)
+        fig.add_trace(go.Scatter(
+            x=np.concatenate([posicao - meia_largura, (posicao + meia_largura)[::-1]]),
+            y=np.concatenate([grade, grade[::-1]]),
+            fill='toself', mode='lines', line=dict(color=cores[nome], width=1),
+            name=str(nome), hoverinfo='name'
+        ))
+        caixa = resumo.loc[nome]
+        fig.add_trace(go.Box(
+            x=[posicao], q1=[caixa['q1']], median=[caixa['mediana']], q3=[caixa['q3']],
+            lowerfence=[caixa['limite_inferior']], upperfence=[caixa['limite_superior']],
+            width=largura / 8, marker_color=cores[nome], fillcolor='white',
+            name=str(nome), boxpoints=False
+        ))
+    fig.update_xaxes(tickmode='array', tickvals=list(range(len(grupos))), ticktext=[str(g) for g in grupos])
+    return fig
+
+def figura_contorno(centros_x, centros_y, contagens):
+    """Mapa de contorno de densidade a partir de histograma_2d."""
+    return go.Figure(go.Contour(x=centros_x, y=centros_y, z=contagens, colorscale='Blues',
+                                contours_coloring='lines', showscale=False))
@@ -4,61 +4,146 @@ import plotly.express as px
 import plotly.graph_objects as go
 import seaborn as sns
 import matplotlib.pyplot as plt
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from Utility.esquema import carregar_dataset, versao_publicada
+from Utility.consultas import agregar, intervalo
+from Utility.resumos_graficos import resumo_caixa, figura_caixa
 
 # Função para formatar valores como moeda brasileira
 def format_brl(value):
     return f"R${value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
 
-# Função para converter valores de string para float
-def convert_to_float(value):
-    return float(str(value).replace('R$', '').replace('.', '').replace(',', '.'))
+# Colunas usadas pelos gráficos desta página
+COLUNAS = ['marca', 'modelo', 'ano', 'quilometragem', 'preco', 'combustivel', 'tipo']
+
+@st.cache_data(show_spinner=False)
+def carregar_dados(nome_arquivo, colunas, filtros, versao):
+    """Lê só as colunas e as linhas filtradas do dataset tipado; 'versao' invalida o cache quando o arquivo muda."""
+    return carregar_dataset(nome_arquivo, colunas, filtros, versao=versao)
+
+@st.cache_data(show_spinner=False)
+def consultar_agregado(nome_arquivo, grupos, agregacoes, filtros, versao):
+    return agregar(nome_arquivo, grupos, agregacoes, filtros, versao)
+
+@st.cache_data(show_spinner=False)
+def calcular_resumo_caixa(nome_arquivo, filtros, versao):
+    """Quartis e outliers da quilometragem por marca para um estado dos filtros."""
+    return resumo_caixa(carregar_dados(nome_arquivo, COLUNAS, filtros, versao), 'marca', 'quilometragem')
+
+@st.cache_data(show_spinner=False)
+def calcular_correlacao(nome_arquivo, filtros, versao):
+    """Correlação entre preço, quilometragem e ano para um estado dos filtros."""
+    return carregar_dataset(nome_arquivo, ['preco', 'quilometragem', 'ano'], filtros, versao=versao).corr()
+
+def calcular_em_paralelo(funcoes):
+    """
+    Executa as funções de dados de uma seção ao mesmo tempo num pool de threads
+    e devolve os resultados na mesma ordem. As leituras e agregações do Arrow
+    liberam o GIL; cada thread recebe o contexto da sessão para usar o cache
+    do Streamlit.
+    """
+    contexto = get_script_run_ctx()
+
+    def executar(funcao):
+        add_script_run_ctx(threading.current_thread(), contexto)
+        return funcao()
+
+    with ThreadPoolExecutor(max_workers=max(len(funcoes), 1), thread_name_prefix='graficos') as executor:
+        return list(executor.map(executar, funcoes))
+
+@st.fragment
+def exibir_secao(app):
+    """Seção de gráficos num fragmento: trocar de seção não reexecuta o painel de filtros."""
+    app.show_section()
+
+@st.cache_data(show_spinner=False)
+def carregar_dominio(nome_arquivo, versao):
+    """As 10 marcas com mais veículos e os limites dos filtros, sem carregar o dataset."""
+    contagem = agregar(nome_arquivo, ['marca'], {'unidades': (None, 'count')}, versao=versao)
+    marcas = contagem.sort_values('unidades', ascending=False, kind='stable')['marca'].head(10).tolist()
+    return {'marcas': marcas,
+            'ano': intervalo(nome_arquivo, 'ano', {'marca': marcas}, versao),
+            'quilometragem': intervalo(nome_arquivo, 'quilometragem', {'marca': marcas}, versao)}
 
 class CarAnalysisApp:
     def __init__(self, data_path):
         self.data_path = data_path
-        self.df = None
+        self.nome_arquivo = os.path.basename(data_path)
+        self.versao = None
+        self.dominio = None
+        self.filtros = {}
         self.brand_colors = {}
 
     def load_data(self):
-        """Carrega os dados do arquivo CSV."""
+        """Carrega as marcas e os limites dos filtros; as linhas são lidas já filtradas em dashboard_controls."""
         try:
-            self.df = pd.read_csv(self.data_path)
-            self.df['preco'] = self.df['preco'].apply(convert_to_float)
+            self.versao = versao_publicada(self.nome_arquivo)
+            self.dominio = carregar_dominio(self.nome_arquivo, self.versao)
             st.sidebar.success("DADOS CARREGADOS COM SUCESSO!")
         except Exception as e:
             st.sidebar.error(f"ERRO AO CARREGAR OS DADOS: {e}")
 
     def filter_top_10_brands(self):
-        """Filtra as 10 marcas com mais veículos."""
-        if self.df is not None:
-            top_brands = self.df['marca'].value_counts().head(10).index
-            self.df = self.df[self.df['marca'].isin(top_brands)]
+        """Restringe a análise às 10 marcas com mais veículos."""
+        if self.dominio is not None:
+            top_brands = self.dominio['marcas']
+            self.filtros = {'marca': top_brands}
             self.brand_colors = {brand: px.colors.qualitative.Plotly[i] for i, brand in enumerate(top_brands)}
 
-    def show_boxplot_by_quilometragem(self):
+    def agregado(self, grupos, agregacoes):
+        """Agregação feita na leitura, com os mesmos filtros do painel."""
+        return consultar_agregado(self.nome_arquivo, grupos, agregacoes, self.filtros, self.versao)
+
+    def secoes(self):
+        """
+        Gráficos da página por seção: {seção: [(dados, exibir)]}. 'dados' calcula
+        (ou busca no cache, por estado dos filtros) o que o gráfico precisa e
+        'exibir' desenha o gráfico a partir desse resultado.
+        """
+        return {
+            "MARCAS": [
+                (lambda: calcular_resumo_caixa(self.nome_arquivo, self.filtros, self.versao),
+                 self.show_boxplot_by_quilometragem),
+                (lambda: self.agregado(['marca'], {'unidades': (None, 'count')}), self.show_histogram_by_brand),
+                (lambda: carregar_dados(self.nome_arquivo, COLUNAS, self.filtros, self.versao), self.show_scatter_plot)
+            ],
+            "PREÇOS POR ANO": [
+                (lambda: self.agregado(['ano'], {'preco': ('preco', 'sum')}), self.show_bar_chart_preco_ano),
+                (lambda: self.agregado(['ano'], {'preco': ('preco', 'mean')}), self.show_line_chart_price_over_time)
+            ],
+            "COMPOSIÇÃO E CORRELAÇÃO": [
+                (lambda: self.agregado(['combustivel'], {'unidades': (None, 'count')}), self.show_pie_chart_by_fuel),
+                (lambda: self.agregado(['ano', 'tipo'], {'contagem': (None, 'count')}), self.show_stacked_bar_chart),
+                (lambda: calcular_correlacao(self.nome_arquivo, self.filtros, self.versao), self.show_heatmap)
+            ]
+        }
+
+    def show_boxplot_by_quilometragem(self, resumo_outliers):
         st.subheader("BOXPLOT: QUILOMETRAGEM POR MARCA")
-        if self.df is not None:
-            fig = px.box(self.df, x='marca', y='quilometragem', title='BOXPLOT DAS MARCAS POR QUILOMETRAGEM', 
-                         color='marca', color_discrete_map=self.brand_colors)
-            fig.update_layout(showlegend=False, xaxis_title='MARCA', yaxis_title='QUILOMETRAGEM (KM)')
+        if resumo_outliers is not None:
+            # Quartis e outliers calculados no servidor; o navegador recebe só o resumo por marca
+            resumo, outliers = resumo_outliers
+            fig = figura_caixa(resumo, outliers, self.brand_colors)
+            fig.update_layout(title='BOXPLOT DAS MARCAS POR QUILOMETRAGEM', showlegend=False,
+                              xaxis_title='MARCA', yaxis_title='QUILOMETRAGEM (KM)')
             st.plotly_chart(fig)
 
-    def show_histogram_by_brand(self):
+    def show_histogram_by_brand(self, vehicle_counts):
         st.subheader("HISTOGRAMA: QUANTIDADE DE VEÍCULOS POR MARCA")
-        if self.df is not None:
-            vehicle_counts = self.df['marca'].value_counts().reset_index()
-            vehicle_counts.columns = ['marca', 'unidades']
+        if vehicle_counts is not None:
+            vehicle_counts = vehicle_counts.sort_values('unidades', ascending=False)
 
             fig = px.bar(vehicle_counts, x='marca', y='unidades', title='HISTOGRAMA DA QUANTIDADE DE VEÍCULOS POR MARCA', 
                          color='marca', color_discrete_map=self.brand_colors)
             fig.update_layout(showlegend=False, xaxis_title='MARCA', yaxis_title='UNIDADES')
             st.plotly_chart(fig)
 
-    def show_bar_chart_preco_ano(self):
+    def show_bar_chart_preco_ano(self, price_per_year):
         st.subheader("GRÁFICO DE BARRAS: PREÇO TOTAL ACUMULADO POR ANO")
-        if self.df is not None:
-            price_per_year = self.df.groupby('ano')['preco'].sum().reset_index()
-
+        if price_per_year is not None:
             fig = px.bar(price_per_year, x='ano', y='preco', 
                          title='RELAÇÃO ENTRE PREÇOS TOTAIS ACUMULADOS POR ANO', 
                          color='ano', color_continuous_scale='Viridis')
@@ -70,75 +155,79 @@ class CarAnalysisApp:
             )
             st.plotly_chart(fig)
 
-    def show_scatter_plot(self):
+    def show_scatter_plot(self, df):
         st.subheader("GRÁFICO DE DISPERSÃO")
-        if self.df is not None:
-            fig = px.scatter(self.df, x='preco', y='quilometragem', color='marca', 
+        if df is not None:
+            fig = px.scatter(df, x='preco', y='quilometragem', color='marca', 
                              hover_data=['ano', 'modelo', 'combustivel', 'tipo'],
                              title='GRÁFICO DE DISPERSÃO: PREÇO X QUILOMETRAGEM', 
                              color_discrete_map=self.brand_colors)
             fig.update_layout(yaxis_title="QUILOMETRAGEM (KM)", xaxis_title="PREÇO (R$)", showlegend=False)
             st.plotly_chart(fig)
 
-    def show_pie_chart_by_fuel(self):
+    def show_pie_chart_by_fuel(self, fuel_counts):
         st.subheader("GRÁFICO DE PIZZA: DISTRIBUIÇÃO POR COMBUSTÍVEL")
-        if self.df is not None:
-            fuel_counts = self.df['combustivel'].value_counts().reset_index()
-            fuel_counts.columns = ['combustivel', 'unidades']
+        if fuel_counts is not None:
+            fuel_counts = fuel_counts.sort_values('unidades', ascending=False)
 
             fig = px.pie(fuel_counts, values='unidades', names='combustivel', title='DISTRIBUIÇÃO DE VEÍCULOS POR COMBUSTÍVEL')
             st.plotly_chart(fig)
 
-    def show_line_chart_price_over_time(self):
+    def show_line_chart_price_over_time(self, avg_price_per_year):
         st.subheader("GRÁFICO DE LINHA: PREÇO AO LONGO DOS ANOS")
-        if self.df is not None:
-            avg_price_per_year = self.df.groupby('ano')['preco'].mean().reset_index()
-
+        if avg_price_per_year is not None:
             fig = px.line(avg_price_per_year, x='ano', y='preco', title='PREÇO MÉDIO AO LONGO DOS ANOS')
             fig.update_layout(yaxis_title="PREÇO MÉDIO (R$)", xaxis_title="ANO")
             st.plotly_chart(fig)
 
-    def show_stacked_bar_chart(self):
+    def show_stacked_bar_chart(self, stacked_data):
         st.subheader("GRÁFICO BARRAS EMPILHADAS: TIPO DE VEÍCULO POR ANO")
-        if self.df is not None:
-            stacked_data = self.df.groupby(['ano', 'tipo']).size().reset_index(name='contagem')
+        if stacked_data is not None:
             fig = px.bar(stacked_data, x='ano', y='contagem', color='tipo', title='DISTRIBUIÇÃO DE VEÍCULOS POR TIPO E ANO')
             st.plotly_chart(fig)
 
-    def show_heatmap(self):
+    def show_heatmap(self, corr):
         st.subheader("MAPA DE CALOR: CORRELAÇÃO ENTRE VARIÁVEIS")
-        if self.df is not None:
-            corr = self.df[['preco', 'quilometragem', 'ano']].corr()
+        if corr is not None:
             plt.figure(figsize=(8, 6))
             sns.heatmap(corr, annot=True, cmap='coolwarm', fmt='.2f', vmin=-1, vmax=1)
             st.pyplot(plt)
 
     def dashboard_controls(self):
+        if self.dominio is None:
+            return
         st.sidebar.title("PAINEL DE CONTROLE")
-        marcas_selecionadas = st.sidebar.multiselect("SELECIONE AS MARCAS", self.df['marca'].unique(), default=self.df['marca'].unique())
-        ano_min, ano_max = st.sidebar.slider("ANO DE FABRICAÇÃO", int(self.df['ano'].min()), int(self.df['ano'].max()), (int(self.df['ano'].min()), int(self.df['ano'].max()))
-        )
-        quilometragem_max = st.sidebar.slider("QUILOMETRAGEM MÁXIMA", 0, int(self.df['quilometragem'].max()), int(self.df['quilometragem'].max()))
-
-        self.df = self.df[(self.df['marca'].isin(marcas_selecionadas)) & 
-                          (self.df['ano'] >= ano_min) & 
-                          (self.df['ano'] <= ano_max) & 
-                          (self.df['quilometragem'] <= quilometragem_max)]
+        marcas = self.dominio['marcas']
+        (ano_inicial, ano_final), (_, quilometragem_limite) = self.dominio['ano'], self.dominio['quilometragem']
+        # Os controles ficam num formulário: ajustá-los não reexecuta a página até APLICAR FILTROS
+        with st.sidebar.form("filtros"):
+            marcas_selecionadas = st.multiselect("SELECIONE AS MARCAS", marcas, default=marcas)
+            ano_min, ano_max = st.slider("ANO DE FABRICAÇÃO", int(ano_inicial), int(ano_final), (int(ano_inicial), int(ano_final))
+            )
+            quilometragem_max = st.slider("QUILOMETRAGEM MÁXIMA", 0, int(quilometragem_limite), int(quilometragem_limite))
+            st.form_submit_button("APLICAR FILTROS")
+
+        # Os filtros vão para a leitura: partições de outros anos e marcas nem são abertas
+        self.filtros = {'marca': marcas_selecionadas, 'ano': (ano_min, ano_max),
+                        'quilometragem': (None, quilometragem_max)}
+
+    def show_section(self):
+        """Calcula e exibe apenas os gráficos da seção aberta; as outras não custam nada no rerun."""
+        if self.dominio is None:
+            return
+        secoes = self.secoes()
+        secao = st.radio("SEÇÃO", list(secoes), horizontal=True, label_visibility="collapsed")
+        graficos = secoes[secao]
+        resultados = calcular_em_paralelo([dados for dados, _ in graficos])
+        for (_, exibir), resultado in zip(graficos, resultados):
+            exibir(resultado)
 
     def run_app(self):
         st.title("PRIMEIRAS ANÁLISES")
         self.load_data()
         self.filter_top_10_brands()
         self.dashboard_controls()
-
-        self.show_boxplot_by_quilometragem()
-        self.show_histogram_by_brand()
-        self.show_bar_chart_preco_ano()
-        self.show_scatter_plot()
-        self.show_pie_chart_by_fuel()
-        self.show_line_chart_price_over_time()
-        self.show_stacked_bar_chart()
-        self.show_heatmap()
+        exibir_secao(self)
 
 if __name__ == "__main__":
     data_path = "Datas/1_Cars_processado.csv"
@@ -1,68 +1,100 @@
 import pandas as pd
 import streamlit as st
 import plotly.express as px
+import os
+from Utility.esquema import carregar_dataset, versao_publicada
+from Utility.consultas import agregar, intervalo, valores_distintos
+from Utility.resumos_graficos import (resumo_caixa, curvas_kde, histograma_2d,
+                                      figura_caixa, figura_violino, figura_contorno)
 
 # Função para formatar valores para Real Brasileiro
 def format_to_brl(value):
     return f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
 
+# Colunas usadas pelos gráficos desta página
+COLUNAS = ['marca', 'modelo', 'ano', 'quilometragem', 'preco']
+
+@st.cache_data(show_spinner=False)
+def carregar_dados(nome_arquivo, colunas, filtros, versao):
+    """Lê só as colunas e as linhas filtradas do dataset tipado; 'versao' invalida o cache quando o arquivo muda."""
+    return carregar_dataset(nome_arquivo, colunas, filtros, versao=versao)
+
+@st.cache_data(show_spinner=False)
+def consultar_agregado(nome_arquivo, grupos, agregacoes, filtros, versao):
+    return agregar(nome_arquivo, grupos, agregacoes, filtros, versao)
+
+@st.cache_data(show_spinner=False)
+def carregar_dominio(nome_arquivo, versao):
+    """Opções e limites dos filtros, lidos coluna a coluna sem carregar o dataset."""
+    return {'marcas': valores_distintos(nome_arquivo, 'marca', versao=versao),
+            'modelos': valores_distintos(nome_arquivo, 'modelo', versao=versao),
+            'ano': intervalo(nome_arquivo, 'ano', versao=versao),
+            'preco': intervalo(nome_arquivo, 'preco', versao=versao)}
+
 class CarAnalysisApp:
     def __init__(self, data_path):
         self.data_path = data_path
-        self.df = None
+        self.nome_arquivo = os.path.basename(data_path)
+        self.versao = None
+        self.dominio = None
+        self.filtros = {}
         self.df_filtered = None
 
     def load_data(self):
-        """Carrega os dados do arquivo CSV."""
+        """Carrega as opções dos filtros; as linhas são lidas já filtradas em add_filters."""
         try:
-            self.df = pd.read_csv(self.data_path)
-            self.df_filtered = self.df.copy()
+            self.versao = versao_publicada(self.nome_arquivo)
+            self.dominio = carregar_dominio(self.nome_arquivo, self.versao)
             st.sidebar.success("Dados carregados com sucesso!")
         except Exception as e:
             st.sidebar.error(f"Erro ao carregar os dados: {e}")
 
     def add_filters(self):
         """Adiciona filtros interativos no painel lateral."""
-        if self.df is not None:
-            marcas = sorted(self.df['marca'].unique())
-            modelos = sorted(self.df['modelo'].unique())
+        if self.dominio is not None:
+            marcas, modelos = self.dominio['marcas'], self.dominio['modelos']
+            (ano_inicial, ano_final), (preco_inicial, preco_final) = self.dominio['ano'], self.dominio['preco']
 
-            marca_selecionada = st.sidebar.multiselect("Selecione a Marca:", marcas, default=marcas)
-            modelo_selecionado = st.sidebar.multiselect("Selecione o Modelo:", modelos, default=modelos)
+            # Os controles ficam num formulário: ajustá-los não reexecuta a página até Aplicar Filtros
+            with st.sidebar.form("filtros"):
+                marca_selecionada = st.multiselect("Selecione a Marca:", marcas, default=marcas)
+                # Sem seleção = todos os modelos, em vez de dezenas de opções pré-selecionadas
+                modelo_selecionado = st.multiselect("Selecione o Modelo:", modelos, placeholder="Todos os modelos")
 
-            ano_min, ano_max = st.sidebar.slider("Ano de Fabricação:", int(self.df['ano'].min()), int(self.df['ano'].max()), (2000, 2023))
-            preco_min, preco_max = st.sidebar.slider("Faixa de Preço (R$):", int(self.df['preco'].min()), int(self.df['preco'].max()), (245000, 5000000))
+                ano_min, ano_max = st.slider("Ano de Fabricação:", int(ano_inicial), int(ano_final), (2000, 2023))
+                preco_min, preco_max = st.slider("Faixa de Preço (R$):", int(preco_inicial), int(preco_final), (245000, 5000000))
+                st.form_submit_button("Aplicar Filtros")
 
-            self.df_filtered = self.df[(self.df['marca'].isin(marca_selecionada)) &
-                                       (self.df['modelo'].isin(modelo_selecionado)) &
-                                       (self.df['ano'] >= ano_min) & (self.df['ano'] <= ano_max) &
-                                       (self.df['preco'] >= preco_min) & (self.df['preco'] <= preco_max)]
+            # Os filtros vão para a leitura; seleções com todas as opções não restringem nada e ficam de fora
+            self.filtros = {'ano': (ano_min, ano_max), 'preco': (preco_min, preco_max)}
+            if len(marca_selecionada) < len(marcas):
+                self.filtros['marca'] = marca_selecionada
+            if 0 < len(modelo_selecionado) < len(modelos):
+                self.filtros['modelo'] = modelo_selecionado
+            self.df_filtered = carregar_dados(self.nome_arquivo, COLUNAS, self.filtros, self.versao)
 
     def show_price_distribution(self):
         """Distribuição de Preços por Marca e Modelo."""
-        fig = px.box(self.df_filtered, x='marca', y='preco', color='marca',
-                     title='Distribuição de Preços por Marca',
-                     labels={'marca': 'Marca', 'preco': 'Preço (R$)'}
-                     )
-        fig.update_layout(showlegend=False)
+        resumo, outliers = resumo_caixa(self.df_filtered, 'marca', 'preco')
+        fig = figura_caixa(resumo, outliers)
+        fig.update_layout(title='Distribuição de Preços por Marca', showlegend=False,
+                          xaxis_title='Marca', yaxis_title='Preço (R$)')
         st.plotly_chart(fig)
 
     def show_kilometer_distribution(self):
         """Distribuição de Quilometragem por Marca (Gráfico de Violino)."""
-        fig = px.violin(self.df_filtered, y='quilometragem', x='marca', color='marca',
-                        box=True, points='all',
-                        title='Distribuição de Quilometragem dos Veículos',
-                        labels={'quilometragem': 'Quilometragem (km)', 'marca': 'Marca'}
-                        )
-        fig.update_layout(showlegend=False)
+        # Curvas KDE e caixas calculadas por marca no servidor, sem enviar cada ponto
+        resumo, _ = resumo_caixa(self.df_filtered, 'marca', 'quilometragem')
+        fig = figura_violino(curvas_kde(self.df_filtered, 'marca', 'quilometragem'), resumo)
+        fig.update_layout(title='Distribuição de Quilometragem dos Veículos', showlegend=False,
+                          xaxis_title='Marca', yaxis_title='Quilometragem (km)')
         st.plotly_chart(fig)
 
     def show_avg_price_by_model(self):
         """Preço Médio por Modelo."""
         avg_price = (
-            self.df_filtered.groupby(['modelo', 'marca'])['preco']
-            .mean()
-            .reset_index()
+            consultar_agregado(self.nome_arquivo, ['modelo', 'marca'], {'preco': ('preco', 'mean')},
+                               self.filtros, self.versao)
             .sort_values(by='preco', ascending=False)
         )
         fig = px.bar(
@@ -81,10 +113,12 @@ class CarAnalysisApp:
 
     def show_density_contour(self):
         """Mapa de Densidade entre Preço e Ano de Fabricação."""
-        fig = px.density_contour(self.df_filtered, x='ano', y='preco',
-                                 title='Densidade de Preço por Ano',
-                                 labels={'ano': 'Ano de Fabricação', 'preco': 'Preço (R$)'}
-                                 )
+        if self.df_filtered.empty:
+            st.warning("Nenhum veículo para os filtros selecionados.")
+            return
+        fig = figura_contorno(*histograma_2d(self.df_filtered, 'ano', 'preco'))
+        fig.update_layout(title='Densidade de Preço por Ano',
+                          xaxis_title='Ano de Fabricação', yaxis_title='Preço (R$)')
         st.plotly_chart(fig)
 
     def run_app(self):
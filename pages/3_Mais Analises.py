@@ -6,6 +6,18 @@ import seaborn as sns
 from sklearn.metrics import confusion_matrix
 import numpy as np
 import os
+from Utility.esquema import carregar_dataset, versao_publicada
+from Utility.estabilidade_clusters import submeter_estabilidade, figura_estabilidade
+from Utility.painel_tarefas import exibir_tarefa, aguardar_pendentes
+from Utility.recursos import ajustar, ajustar_prever
+
+# Colunas usadas pela análise de clusters
+COLUNAS = ['ano', 'full_range', 'quilometragem', 'preco', 'Car Age', 'Cluster']
+
+@st.cache_data(show_spinner=False)
+def carregar_dados(nome_arquivo, colunas, versao):
+    """Lê o dataset já tipado; 'versao' invalida o cache quando o arquivo muda."""
+    return carregar_dataset(nome_arquivo, colunas, versao=versao)
 
 # Classe para Análise de Cluster de Carros
 class CarClusterAnalysis:
@@ -19,7 +31,7 @@ class CarClusterAnalysis:
         inertia = []
         for k in range(1, max_clusters + 1):
             kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
-            kmeans.fit(self.X)
+            ajustar(kmeans, self.X)
             inertia.append(kmeans.inertia_)
 
         fig, ax = plt.subplots(figsize=(10, 6))
@@ -32,7 +44,7 @@ class CarClusterAnalysis:
 
     def perform_clustering(self, n_clusters):
         self.kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-        self.data['Cluster_Pred'] = self.kmeans.fit_predict(self.X)
+        self.data['Cluster_Pred'] = ajustar_prever(self.kmeans, self.X)
 
         # Gerar uma paleta de cores diferentes para os clusters
         palette = sns.color_palette("Set2", n_colors=n_clusters)
@@ -96,6 +108,14 @@ class CarClusterAnalysis:
         plt.ylim(0, cm.shape[0])
         st.pyplot(fig)
 
+    def stability_analysis(self, max_clusters, n_reamostras):
+        """Estabilidade bootstrap do KMeans desta página (mesmas variáveis e n_init) para k de 2 a max_clusters."""
+        tarefa = submeter_estabilidade(self.X.to_numpy(), range(2, max_clusters + 1), n_reamostras, n_init=10)
+        estabilidade = exibir_tarefa(tarefa, "CALCULANDO ESTABILIDADE")
+        if estabilidade is not None:
+            st.pyplot(figura_estabilidade(estabilidade['resumo']))
+        aguardar_pendentes(tarefa)
+
 # Interface no Streamlit
 def main():
     st.title("ANÁLISE DE CLUSTERS DE CARROS")
@@ -106,7 +126,8 @@ def main():
 
     if os.path.exists(file_path):
         # Carregando os dados
-        df = pd.read_csv(file_path)
+        nome_arquivo = os.path.basename(file_path)
+        df = carregar_dados(nome_arquivo, COLUNAS, versao_publicada(nome_arquivo))
         st.success("DADOS CARREGADOS COM SUCESSO!")
 
         # Criando uma instância da classe
@@ -116,6 +137,9 @@ def main():
         st.sidebar.header("CONFIGURAÇÕES")
         max_clusters = st.sidebar.slider("NÚMERO MÁXIMO DE CLUSTERS (MÉTODO DO COTOVELO):", 2, 12, 12)
         num_clusters = st.sidebar.slider("NÚMERO DE CLUSTERS (MATRIZ):", 1, 5, 5)
+        analisar_estabilidade = st.sidebar.checkbox("ANALISAR ESTABILIDADE (BOOTSTRAP)")
+        n_reamostras = st.sidebar.slider("NÚMERO DE REAMOSTRAS (ESTABILIDADE):", 10, 100, 20, step=10,
+                                         disabled=not analisar_estabilidade)
 
         # Exibir os gráficos
         st.subheader("MÉTODO DO COTOVELO")
@@ -127,6 +151,10 @@ def main():
         st.subheader("MATRIZ DE CONFUSÃO NORMALIZADA")
         analysis.plot_confusion_matrix()
 
+        if analisar_estabilidade:
+            st.subheader("ESTABILIDADE DOS CLUSTERS (BOOTSTRAP)")
+            analysis.stability_analysis(max_clusters, n_reamostras)
+
     else:
         st.error(f"ARQUIVO NÃO ENCONTRADO NO CAMINHO: {file_path}")
 
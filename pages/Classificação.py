@@ -3,22 +3,61 @@ import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder, StandardScaler
-from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report, confusion_matrix
 import seaborn as sns
 import matplotlib.pyplot as plt
+import os
+from Utility.esquema import carregar_dataset, versao_dataset, versao_publicada
+from Utility.fila_tarefas import obter_fila
+from Utility.painel_tarefas import exibir_tarefa, aguardar_pendentes
+from Utility.precisao import PRECISAO, para_calculo
+from Utility.anuncios_similares import obter_indice
+from Utility.contribuicoes import ContribuicoesFloresta
+from Utility.motores import MOTOR, MOTORES, NOMES_MOTORES, criar_modelo, nome_motor
+from Utility.recursos import ajustar, prever
+
+# Colunas usadas pelo classificador
+COLUNAS = ['marca', 'modelo', 'ano', 'quilometragem', 'preco', 'combustivel',
+           'car_documents', 'tipo', 'transmissão']
+CAMINHO_ARQUIVO = 'Datas/1_Cars_processado.csv'
+
+@st.cache_data(show_spinner=False)
+def carregar_dados(nome_arquivo, colunas, versao):
+    """Lê o dataset já tipado; 'versao' invalida o cache quando o arquivo muda."""
+    return carregar_dataset(nome_arquivo, colunas, versao=versao)
+
+@st.cache_resource(show_spinner=False)
+def carregar_indice_similares(nome_arquivo, versao):
+    """Índice de anúncios similares da versão do dataset (lido do disco ou construído uma vez)."""
+    return obter_indice(nome_arquivo, versao)
+
+@st.cache_resource(show_spinner=False)
+def carregar_explicador(chave_modelo, _modelo):
+    """Contribuições por previsão do classificador treinado, preparadas uma vez por modelo."""
+    return ContribuicoesFloresta(_modelo)
+
+def treinar_sistema(tarefa, sistema):
+    """Pré-processa os dados e treina o classificador fora da thread da página."""
+    tarefa.informar_progresso(0.0, "PRÉ-PROCESSANDO")
+    X, y = sistema.preprocessar_dados()
+    sistema.treinar_modelo(X, y, tarefa)
+    # Apenas os componentes treinados, que podem ser persistidos no cache em disco
+    return {'modelo': sistema.modelo, 'codificadores': sistema.codificadores,
+            'normalizador': sistema.normalizador, 'X': X, 'y': y}
 
 class SistemaClassificacaoCarros:
-    def __init__(self):
+    def __init__(self, motor=None):
+        self.motor = nome_motor(motor)
         self.dados = None
         self.modelo = None
         self.codificadores = {}
         self.normalizador = StandardScaler()
         self.coluna_alvo = 'faixa_preco'
         
-    def carregar_dados(self, caminho_arquivo):
-        """Carrega e pré-processa o conjunto de dados de carros"""
-        self.dados = pd.read_csv(caminho_arquivo)
+    def carregar_dados(self, caminho_arquivo, versao):
+        """Carrega e pré-processa o conjunto de dados de carros na versão indicada"""
+        nome_arquivo = os.path.basename(caminho_arquivo)
+        self.dados = carregar_dados(nome_arquivo, COLUNAS, versao)
         # Criar faixas de preço para classificação
         faixas_preco = [0, 200000, 300000, 400000, float('inf')]
         rotulos_preco = ['Econômico', 'Intermediário', 'Premium', 'Luxo']
@@ -38,6 +77,7 @@ class SistemaClassificacaoCarros:
         for coluna in X.select_dtypes(include=['object']):
             self.codificadores[coluna] = LabelEncoder()
             X[coluna] = self.codificadores[coluna].fit_transform(X[coluna])
+        X = para_calculo(X)
         
         # Normalizar características numéricas
         caracteristicas_numericas = ['ano', 'quilometragem']
@@ -58,6 +98,7 @@ class SistemaClassificacaoCarros:
         X = dados_filtrados[caracteristicas].copy()
         for coluna in X.select_dtypes(include=['object']):
             X[coluna] = self.codificadores[coluna].transform(X[coluna])
+        X = para_calculo(X)
         
         # Normalizar características numéricas
         caracteristicas_numericas = ['ano', 'quilometragem']
@@ -65,25 +106,66 @@ class SistemaClassificacaoCarros:
         
         return X
     
-    def treinar_modelo(self, X, y):
-        """Treina o classificador Random Forest"""
-        self.modelo = RandomForestClassifier(n_estimators=100, random_state=42)
-        self.modelo.fit(X, y)
+    def treinar_modelo(self, X, y, tarefa=None, lote=10):
+        """Treina o classificador com o motor escolhido.
+        Com uma tarefa da fila, as árvores (Random Forest) ou as iterações
+        (gradient boosting) são adicionadas em lotes (warm_start), informando o
+        progresso e permitindo o cancelamento entre os lotes."""
+        if self.motor != 'random_forest':
+            return self.treinar_gradient_boosting(X, y, tarefa)
+        n_arvores = 100
+        self.modelo = criar_modelo('classificacao', self.motor, n_estimators=n_arvores)
+        if tarefa is None:
+            ajustar(self.modelo, X, y)
+            return self.modelo
+
+        self.modelo.set_params(warm_start=True)
+        for n in range(lote, n_arvores + 1, lote):
+            tarefa.informar_progresso((n - lote) / n_arvores, f"{n - lote}/{n_arvores} ÁRVORES")
+            self.modelo.set_params(n_estimators=n)
+            ajustar(self.modelo, X, y)
+        return self.modelo
+
+    def treinar_gradient_boosting(self, X, y, tarefa=None, lote=50):
+        """Gradient boosting com marca, modelo, combustível, tipo e transmissão como
+        categorias nativas. O ajuste para sozinho quando a validação interna não
+        melhora (early stopping), possivelmente antes de max_iter."""
+        self.modelo = criar_modelo('classificacao', self.motor, X)
+        if tarefa is None:
+            ajustar(self.modelo, X, y)
+            return self.modelo
+
+        maximo = self.modelo.max_iter
+        self.modelo.set_params(warm_start=True)
+        for n in range(lote, maximo + lote, lote):
+            tarefa.informar_progresso((n - lote) / maximo, f"{n - lote}/{maximo} ITERAÇÕES")
+            self.modelo.set_params(max_iter=min(n, maximo))
+            ajustar(self.modelo, X, y)
+            if self.modelo.n_iter_ < min(n, maximo):
+                break
         return self.modelo
     
-    def prever(self, dados_entrada):
-        """Realiza previsões para novos dados"""
+    def codificar_entrada(self, dados_entrada):
+        """Codifica e normaliza os dados de entrada como no treinamento; retorna
+        uma cópia, exatamente o que o modelo recebe, sem alterar dados_entrada"""
         # Pré-processar dados de entrada
+        dados_entrada = dados_entrada.copy()
         for coluna in dados_entrada.columns:
             if coluna in self.codificadores:
                 dados_entrada[coluna] = self.codificadores[coluna].transform(dados_entrada[coluna])
+        dados_entrada = para_calculo(dados_entrada)
         
         # Normalizar características numéricas
         caracteristicas_numericas = ['ano', 'quilometragem']
         dados_entrada[caracteristicas_numericas] = self.normalizador.transform(dados_entrada[caracteristicas_numericas])
+        return dados_entrada
+    
+    def prever(self, dados_entrada):
+        """Realiza previsões para novos dados"""
+        dados_entrada = self.codificar_entrada(dados_entrada)
         
         # Fazer previsão
-        previsao = self.modelo.predict(dados_entrada)
+        previsao = prever(self.modelo, dados_entrada)
         faixa_preco = self.codificadores[self.coluna_alvo].inverse_transform(previsao)[0]
         
         # Calcular valor estimado (média da faixa)
@@ -91,19 +173,44 @@ class SistemaClassificacaoCarros:
         
         return faixa_preco, valor_estimado
 
+def submeter_treinamento(sistema, versao):
+    """Submete o treinamento à fila de tarefas (um único treinamento por versão dos dados)."""
+    fila = obter_fila()
+    return fila.submeter(fila.cache.chave('classificacao', versao, PRECISAO, sistema.motor), treinar_sistema, sistema,
+                         descricao="Classificador de faixas de preço", persistir=True)
+
+def aquecer():
+    """Prepara a configuração padrão da página antes do primeiro acesso (ver Utility/aquecimento.py)."""
+    nome_arquivo = os.path.basename(CAMINHO_ARQUIVO)
+    obter_indice(nome_arquivo)
+    versao = versao_dataset(nome_arquivo)
+    sistema = SistemaClassificacaoCarros()
+    sistema.carregar_dados(CAMINHO_ARQUIVO, versao)
+    return [submeter_treinamento(sistema, versao)]
+
 def main():
     st.set_page_config(page_title="Sistema de Classificação de Preços de Carros", layout="wide")
     st.title("Sistema de Classificação de Preços")
     
-    # Inicializar o sistema de classificação
-    sistema = SistemaClassificacaoCarros()
+    # Inicializar o sistema de classificação com o motor escolhido
+    motor = st.sidebar.selectbox("Motor do Classificador", MOTORES, index=MOTORES.index(nome_motor(MOTOR)),
+                                 format_func=NOMES_MOTORES.get)
+    sistema = SistemaClassificacaoCarros(motor)
     
-    # Carregar dados
-    dados = sistema.carregar_dados('Datas/1_Cars_processado.csv')
+    # Carregar dados da versão publicada (lida uma vez por execução)
+    versao = versao_publicada(os.path.basename(CAMINHO_ARQUIVO))
+    dados = sistema.carregar_dados(CAMINHO_ARQUIVO, versao)
     
-    # Treinar modelo
-    X, y = sistema.preprocessar_dados()
-    sistema.treinar_modelo(X, y)
+    # Treinar modelo na fila de tarefas
+    tarefa = submeter_treinamento(sistema, versao)
+    treinado = exibir_tarefa(tarefa, "TREINANDO O CLASSIFICADOR")
+    if treinado is None:
+        aguardar_pendentes(tarefa)
+        return
+    sistema.modelo = treinado['modelo']
+    sistema.codificadores = treinado['codificadores']
+    sistema.normalizador = treinado['normalizador']
+    X, y = treinado['X'], treinado['y']
     
     # Interface do usuário
     st.sidebar.header("Previsão de Faixa de Preço")
@@ -114,6 +221,7 @@ def main():
     combustivel = st.sidebar.selectbox("Tipo de Combustível", dados['combustivel'].unique())
     tipo = st.sidebar.selectbox("Tipo de Veículo", dados['tipo'].unique())
     transmissao = st.sidebar.selectbox("Tipo de Transmissão", dados['transmissão'].unique())
+    n_similares = st.sidebar.slider("Número de Anúncios Similares", 1, 20, 5)
     
     # Criar DataFrame com os dados de entrada
     dados_entrada = pd.DataFrame({
@@ -127,9 +235,21 @@ def main():
         'transmissão': [transmissao]
     })
     
+    # Buscar anúncios comparáveis
+    indice = carregar_indice_similares(os.path.basename(CAMINHO_ARQUIVO), versao)
+    similares = indice.consultar(dados_entrada, k=n_similares)
+    
     # Fazer previsão
     previsao, valor_estimado = sistema.prever(dados_entrada)
     
+    # Contribuição de cada característica para a probabilidade da faixa prevista (caminhos das árvores do Random Forest)
+    if sistema.motor == 'random_forest':
+        explicador = carregar_explicador(tarefa.chave, sistema.modelo)
+        classe_prevista = sistema.codificadores[sistema.coluna_alvo].transform([previsao])[0]
+        # Explica a entrada codificada e normalizada, a mesma que o modelo recebeu na previsão
+        contribuicoes = explicador.explicar(sistema.codificar_entrada(dados_entrada), classe_prevista).iloc[0]
+        probabilidade_base = explicador.valor_base(classe_prevista)
+    
     # Área de visualização
     st.subheader("DISTRIBUIÇÃO DAS FAIXAS DE PREÇO")
     fig1, ax1 = plt.subplots(figsize=(12, 6))
@@ -161,12 +281,12 @@ def main():
         X_filtrado = sistema.preprocessar_dados_filtrados(dados_filtrados)
         y_filtrado = sistema.codificadores[sistema.coluna_alvo].transform(dados_filtrados[sistema.coluna_alvo])
         X_treino, X_teste, y_treino, y_teste = train_test_split(X_filtrado, y_filtrado, test_size=0.2, random_state=42)
-        y_pred = sistema.modelo.predict(X_teste)
+        y_pred = prever(sistema.modelo, X_teste)
         cm = confusion_matrix(y_teste, y_pred)
     else:
         # Usar o conjunto de dados completo se os dados filtrados forem insuficientes
         X_treino, X_teste, y_treino, y_teste = train_test_split(X, y, test_size=0.2, random_state=42)
-        y_pred = sistema.modelo.predict(X_teste)
+        y_pred = prever(sistema.modelo, X_teste)
         cm = confusion_matrix(y_teste, y_pred)
     
     fig2, ax2 = plt.subplots(figsize=(12, 8))
@@ -193,6 +313,40 @@ def main():
             
         )
         st.markdown("<style>div.stSuccess { text-align: center; font-size: 18px; padding: 20px; }</style>", unsafe_allow_html=True)
+    
+    st.subheader("CONTRIBUIÇÃO DE CADA CARACTERÍSTICA PARA A PREVISÃO")
+    if sistema.motor == 'random_forest':
+        st.caption(f"Probabilidade de {previsao}: {probabilidade_base:.0%} em média nos dados de treino, "
+                   f"{probabilidade_base + contribuicoes.sum():.0%} para este veículo.")
+        contribuicoes = contribuicoes.sort_values()
+        rotulos = [f"{coluna} = {dados_entrada[coluna].iloc[0]}" for coluna in contribuicoes.index]
+        fig3, ax3 = plt.subplots(figsize=(12, 5))
+        ax3.barh(rotulos, contribuicoes.to_numpy() * 100,
+                 color=['tab:red' if valor < 0 else 'tab:green' for valor in contribuicoes])
+        ax3.axvline(0, color='black', linewidth=0.8)
+        plt.title(f'CONTRIBUIÇÃO PARA A PROBABILIDADE DE {previsao.upper()}', fontsize=12, pad=20, color='black')
+        plt.xlabel('PONTOS PERCENTUAIS', fontsize=10, color='black')
+        plt.tight_layout()
+        st.pyplot(fig3)
+    else:
+        st.info("As contribuições por característica estão disponíveis apenas para o motor Random Forest.")
+    
+    st.subheader("ANÚNCIOS SIMILARES")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("PREÇO MEDIANO DOS SIMILARES",
+                  f"R$ {similares['preco'].median():,.2f}".replace(',', '_').replace('.', ',').replace('_', '.'))
+    with col2:
+        st.metric("FAIXA DE PREÇO DOS SIMILARES",
+                  f"R$ {similares['preco'].min():,.0f} - R$ {similares['preco'].max():,.0f}".replace(',', '.'))
+    st.dataframe(
+        similares.rename(columns={
+            'marca': 'MARCA', 'modelo': 'MODELO', 'combustivel': 'COMBUSTÍVEL', 'tipo': 'TIPO',
+            'transmissão': 'TRANSMISSÃO', 'ano': 'ANO', 'quilometragem': 'QUILOMETRAGEM',
+            'preco': 'PREÇO (R$)', 'distancia': 'DISTÂNCIA'
+        }),
+        hide_index=True, use_container_width=True
+    )
 
 if __name__ == "__main__":
     main()
@@ -6,8 +6,14 @@ import numpy as np
 import os
 import matplotlib.ticker as mticker
 from sklearn.cluster import KMeans
-from sklearn.metrics import silhouette_score, silhouette_samples
 from sklearn.preprocessing import StandardScaler
+from Utility.distancias import obter_matriz_distancias
+from Utility.esquema import carregar_dataset, versao_dataset, versao_publicada
+from Utility.estabilidade_clusters import submeter_estabilidade, figura_estabilidade
+from Utility.fila_tarefas import obter_fila
+from Utility.painel_tarefas import exibir_tarefa, aguardar_pendentes
+from Utility.precisao import PRECISAO, para_calculo
+from Utility.recursos import ajustar, ajustar_prever
 
 # Configuração de estilo
 try:
@@ -17,6 +23,18 @@ except OSError:
 
 sns.set_palette("husl")
 
+# Colunas que podem ser usadas no clustering
+COLUNAS = ['quilometragem', 'preco', 'ano', 'full_range', 'Car Age']
+CAMINHO_ARQUIVO = 'Datas/2_Cars_clusterizado.csv'
+# Configuração inicial da página, também usada no aquecimento
+VARIAVEIS_PADRAO = ['quilometragem', 'preco', 'ano']
+MAX_CLUSTERS_PADRAO = 20
+
+@st.cache_data(show_spinner=False)
+def carregar_dados(nome_arquivo, colunas, versao):
+    """Lê o dataset já tipado; 'versao' invalida o cache quando o arquivo muda."""
+    return carregar_dataset(nome_arquivo, colunas, versao=versao)
+
 class CarClusterAnalysis:
     def __init__(self, data):
         self.data = data
@@ -24,6 +42,8 @@ class CarClusterAnalysis:
         self.kmeans = None
         self.n_clusters = None
         self.features = None
+        self.chave_distancias = None
+        self.versao = None
         self.LABEL_MAP = {
             'quilometragem': 'QUILOMETRAGEM (Km)',
             'preco': 'PREÇO (R$)',
@@ -32,30 +52,42 @@ class CarClusterAnalysis:
             'Car Age': 'IDADE DO VEÍCULO (Anos)'
         }
 
-    def prepare_data(self, features):
+    def prepare_data(self, features, versao=None):
         try:
             self.features = features
-            X = self.data[features]
+            # Identifica a matriz de distâncias de X: variáveis, normalização e precisão, na versão dos dados
+            self.chave_distancias = obter_fila().cache.chave('distancias', features, 'StandardScaler', PRECISAO)
+            self.versao = versao
+            X = para_calculo(self.data[features])
             return self.scaler.fit_transform(X)
         except KeyError as e:
             st.error(f"VARIÁVEL NÃO ENCONTRADA NO DATASET: {e}")
             return None
 
-    def calculate_elbow(self, X, max_clusters=10):
+    def calculate_elbow(self, X, max_clusters=10, tarefa=None):
         inertia = []
         for k in range(1, max_clusters + 1):
+            if tarefa is not None:
+                tarefa.informar_progresso((k - 1) / max_clusters, f"K = {k}")
             kmeans = KMeans(n_clusters=k, random_state=42, n_init='auto')
-            kmeans.fit(X)
+            ajustar(kmeans, X)
             inertia.append(kmeans.inertia_)
         return inertia
 
-    def calculate_silhouette(self, X, max_clusters=10):
+    def distances(self, X):
+        """Matriz de distâncias de X, calculada uma vez e reaproveitada por todos os k."""
+        return obter_matriz_distancias(X, self.chave_distancias, self.versao)
+
+    def calculate_silhouette(self, X, max_clusters=10, tarefa=None):
         silhouette_scores = []
+        distancias = self.distances(X)
         for k in range(2, max_clusters + 1):
+            if tarefa is not None:
+                tarefa.informar_progresso((k - 2) / (max_clusters - 1), f"K = {k}")
             kmeans = KMeans(n_clusters=k, random_state=42, n_init='auto')
-            labels = kmeans.fit_predict(X)
+            labels = ajustar_prever(kmeans, X)
             if len(np.unique(labels)) > 1:
-                silhouette_scores.append(silhouette_score(X, labels))
+                silhouette_scores.append(distancias.silhueta(labels))
             else:
                 silhouette_scores.append(0)
         return silhouette_scores
@@ -64,15 +96,18 @@ class CarClusterAnalysis:
         try:
             self.n_clusters = n_clusters
             self.kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init='auto')
-            return self.kmeans.fit_predict(X)
+            return ajustar_prever(self.kmeans, X)
         except ValueError as e:
             st.error(f"ERRO NO CLUSTERING: {e}")
             return None
 
     def plot_silhouette_analysis(self, X, labels):
         try:
-            silhouette_avg = silhouette_score(X, labels)
-            sample_silhouette_values = silhouette_samples(X, labels)
+            distancias = self.distances(X)
+            sample_silhouette_values = distancias.silhueta_amostras(labels)
+            # Com muitas linhas a silhueta é calculada numa amostra fixa; os rótulos acompanham
+            labels = distancias.na_amostra(labels)
+            silhouette_avg = sample_silhouette_values.mean()
 
             fig, ax = plt.subplots(figsize=(10, 6))
             y_lower = 10
@@ -192,21 +227,46 @@ class ClusterVisualizer:
         except Exception as e:
             st.error(f"ERRO AO GERAR GRÁFICO DE DISPERSÃO: {e}")
 
+def submeter_varreduras(analyzer, X, features, max_clusters_elbow, max_clusters_silhouette, versao):
+    """
+    Submete as varreduras de k do cotovelo e da silhueta à fila de tarefas; usuários
+    com a mesma configuração compartilham a mesma execução e o mesmo resultado.
+    """
+    fila = obter_fila()
+    tarefa_cotovelo = fila.submeter(
+        fila.cache.chave('cotovelo', features, max_clusters_elbow, versao, PRECISAO),
+        lambda tarefa: analyzer.calculate_elbow(X, max_clusters_elbow, tarefa),
+        descricao="Varredura do cotovelo", persistir=True)
+    tarefa_silhueta = fila.submeter(
+        fila.cache.chave('silhueta', features, max_clusters_silhouette, versao, PRECISAO),
+        lambda tarefa: analyzer.calculate_silhouette(X, max_clusters_silhouette, tarefa),
+        descricao="Varredura da silhueta", persistir=True)
+    return tarefa_cotovelo, tarefa_silhueta
+
+def aquecer():
+    """Prepara a configuração padrão da página antes do primeiro acesso (ver Utility/aquecimento.py)."""
+    nome_arquivo = os.path.basename(CAMINHO_ARQUIVO)
+    versao = versao_dataset(nome_arquivo)
+    analyzer = CarClusterAnalysis(carregar_dataset(nome_arquivo, COLUNAS, versao=versao))
+    X = analyzer.prepare_data(VARIAVEIS_PADRAO, versao)
+    return list(submeter_varreduras(analyzer, X, VARIAVEIS_PADRAO, MAX_CLUSTERS_PADRAO,
+                                    MAX_CLUSTERS_PADRAO, versao))
+
 def main():
     st.set_page_config(page_title="Análise de Clusters de Carros", layout="wide")
     st.title("ANÁLISE INTERATIVA DOS CLUSTERS ")
     
-    file_path = 'Datas/2_Cars_clusterizado.csv'
+    file_path = CAMINHO_ARQUIVO
     
     if not os.path.exists(file_path):
         st.error(f"ARQUIVO NÃO ENCONTRADO: {file_path}")
         return
 
     try:
-        df = pd.read_csv(file_path)
-        
-        if 'preco' in df.columns:
-            df['preco'] = df['preco'] * 6 / 1000
+        nome_arquivo = os.path.basename(file_path)
+        # Uma leitura da versão publicada por execução: uma troca no meio não mistura versões
+        versao = versao_publicada(nome_arquivo)
+        df = carregar_dados(nome_arquivo, COLUNAS, versao)
         
         st.session_state['data'] = df
         st.success("DADOS CARREGADOS COM SUCESSO!")
@@ -227,24 +287,30 @@ def main():
     selected_features = st.sidebar.multiselect(
         "SELECIONE AS VARIÁVEIS PARA CLUSTERING:",
         options=available_features,
-        default=['quilometragem', 'preco', 'ano'],
+        default=VARIAVEIS_PADRAO,
         format_func=lambda x: FEATURE_LABELS[x]
     )
     
     max_clusters_elbow = st.sidebar.slider(
         "SELECIONE NÚMERO MÁXIMO DE CLUSTERS (COTOVELO):",
-        2, 20, 20
+        2, 20, MAX_CLUSTERS_PADRAO
     )
     
     max_clusters_silhouette = st.sidebar.slider(
         "SELECIONE NÚMERO MÁXIMO DE CLUSTERS (SILHUETA):",
-        2, 20, 20
+        2, 20, MAX_CLUSTERS_PADRAO
     )
     
     n_clusters = st.sidebar.slider(
         "SELECIONE NÚMERO DE CLUSTERS (VISUALIZAÇÃO INTERATIVA):",
         2, 20, 20
     )
+
+    analisar_estabilidade = st.sidebar.checkbox("ANALISAR ESTABILIDADE (BOOTSTRAP)")
+    n_reamostras = st.sidebar.slider(
+        "NÚMERO DE REAMOSTRAS (ESTABILIDADE):",
+        10, 100, 20, step=10, disabled=not analisar_estabilidade
+    )
     
     analyzer = CarClusterAnalysis(df)
     visualizer = ClusterVisualizer()
@@ -252,17 +318,22 @@ def main():
     with st.container():
         if len(selected_features) >= 2:
             try:
-                X = analyzer.prepare_data(selected_features)
+                X = analyzer.prepare_data(selected_features, versao)
                 if X is None:
                     return
                 
+                tarefa_cotovelo, tarefa_silhueta = submeter_varreduras(
+                    analyzer, X, selected_features, max_clusters_elbow, max_clusters_silhouette, versao)
+
                 st.subheader("ANÁLISE DO COTOVELO")
-                inertia = analyzer.calculate_elbow(X, max_clusters_elbow)
-                visualizer.plot_elbow(inertia, max_clusters_elbow)
+                inertia = exibir_tarefa(tarefa_cotovelo, "CALCULANDO COTOVELO")
+                if inertia is not None:
+                    visualizer.plot_elbow(inertia, max_clusters_elbow)
                 
                 st.subheader("ANÁLISE DE SILHUETA")
-                silhouette_scores = analyzer.calculate_silhouette(X, max_clusters_silhouette)
-                visualizer.plot_silhouette_scores(silhouette_scores, max_clusters_silhouette)
+                silhouette_scores = exibir_tarefa(tarefa_silhueta, "CALCULANDO SILHUETA")
+                if silhouette_scores is not None:
+                    visualizer.plot_silhouette_scores(silhouette_scores, max_clusters_silhouette)
                 
                 labels = analyzer.perform_clustering(X, n_clusters)
                 if labels is None:
@@ -284,6 +355,22 @@ def main():
                 
                 st.subheader("DETALHES DA SILHUETA POR CLUSTER")
                 analyzer.plot_silhouette_analysis(X, labels)
+
+                pendentes = [tarefa_cotovelo, tarefa_silhueta]
+                if analisar_estabilidade:
+                    # Mesmos k candidatos da silhueta; o resultado fica em cache por configuração
+                    st.subheader("ESTABILIDADE DOS CLUSTERS (BOOTSTRAP)")
+                    tarefa_estabilidade = submeter_estabilidade(
+                        X, range(2, max_clusters_silhouette + 1), n_reamostras)
+                    pendentes.append(tarefa_estabilidade)
+                    estabilidade = exibir_tarefa(tarefa_estabilidade, "CALCULANDO ESTABILIDADE")
+                    if estabilidade is not None:
+                        st.pyplot(figura_estabilidade(estabilidade['resumo']))
+                        if n_clusters in estabilidade['robustez']:
+                            st.markdown(f"**ROBUSTEZ POR CLUSTER COM K = {n_clusters}** (JACCARD MÉDIO ENTRE REAMOSTRAS)")
+                            st.dataframe(estabilidade['robustez'][n_clusters], hide_index=True)
+
+                aguardar_pendentes(*pendentes)
                 
             except Exception as e:
                 st.error(f"ERRO NA ANÁLISE: {e}")
@@ -0,0 +1,47 @@
+import streamlit as st
+import streamlit.components.v1 as components
+import os
+from Utility.perfil_dados import carregar_indice, DIRETORIO_DADOS, DIRETORIO_RELATORIOS
+
+@st.cache_data(show_spinner=False)
+def ler_relatorio(caminho, versao):
+    """Lê o arquivo do relatório; 'versao' invalida o cache quando o dataset é perfilado de novo."""
+    with open(caminho, encoding='utf-8') as arquivo:
+        return arquivo.read()
+
+def main():
+    st.set_page_config(page_title="Perfil dos Dados", layout="wide")
+    st.title("PERFIL DOS DADOS")
+
+    indice = carregar_indice()
+    if not indice:
+        st.warning("NENHUM RELATÓRIO ENCONTRADO. GERE OS RELATÓRIOS COM: python -m Utility.perfil_dados")
+        return
+
+    st.sidebar.header("CONFIGURAÇÕES")
+    dataset = st.sidebar.selectbox("SELECIONE O DATASET", sorted(indice))
+    info = indice[dataset]
+
+    # Aviso se o CSV mudou depois do relatório (sem recalcular o hash na requisição)
+    caminho_csv = os.path.join(DIRETORIO_DADOS, dataset)
+    if os.path.exists(caminho_csv) and (os.path.getsize(caminho_csv) != info['tamanho_csv'] or
+                                        os.path.getmtime(caminho_csv) > info['modificado_csv']):
+        st.warning("O DATASET FOI ALTERADO DEPOIS DESTE RELATÓRIO. GERE OS RELATÓRIOS NOVAMENTE.")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("LINHAS", f"{info['linhas']:,}".replace(",", "."))
+    with col2:
+        st.metric("AMOSTRA", f"{info['amostra']:,}".replace(",", ".") if info['amostra'] else "COMPLETO")
+    with col3:
+        st.metric("GERADO EM", info['gerado_em'])
+
+    html = ler_relatorio(os.path.join(DIRETORIO_RELATORIOS, info['html']), info['hash'])
+    components.html(html, height=1000, scrolling=True)
+
+    st.sidebar.download_button("BAIXAR RELATÓRIO (JSON)",
+                               ler_relatorio(os.path.join(DIRETORIO_RELATORIOS, info['json']), info['hash']),
+                               file_name=info['json'], mime="application/json")
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,54 @@ import os
 import seaborn as sns
 import matplotlib.pyplot as plt
 from sklearn.inspection import permutation_importance
+from sklearn.base import clone
+from Utility.contribuicoes import ContribuicoesFloresta
+from Utility.esquema import carregar_dataset, versao_dataset, versao_publicada
+from Utility.fila_tarefas import ERRO, obter_fila
+from Utility.painel_tarefas import exibir_tarefa, aguardar_pendentes
+from Utility.recursos import ajustar, prever, obter_controlador
+
+CAMINHO_ARQUIVO = os.path.join('Datas', '3_Cars_predictions.csv')
+# Configuração inicial da página, também usada no aquecimento
+CARACTERISTICAS_PADRAO = ['quilometragem', 'Car Age', 'quilometragem']
+OPCOES_MODELOS = {
+    "SVM": SVC(),
+    "Random Forest": RandomForestClassifier(),
+    "KNN": KNeighborsClassifier(),
+    "Gradient Boosting": GradientBoostingClassifier(),
+    "Decision Tree": DecisionTreeClassifier()
+}
+
+@st.cache_data(show_spinner=False)
+def carregar_dados(nome_arquivo, versao):
+    """Lê o dataset já tipado; 'versao' invalida o cache quando o arquivo muda."""
+    return carregar_dataset(nome_arquivo, versao=versao)
+
+@st.cache_resource(show_spinner=False)
+def carregar_explicador(chave_modelo, _modelo):
+    """Contribuições por previsão do modelo treinado, preparadas uma vez por avaliação."""
+    return ContribuicoesFloresta(_modelo)
+
+def treinar_modelo(tarefa, modelo, caracteristicas, alvo):
+    """Treina e avalia o modelo fora da thread da página; retorna o modelo treinado e as métricas."""
+    X_treino, X_teste, y_treino, y_teste = train_test_split(
+        caracteristicas, alvo, test_size=0.3, random_state=42
+    )
+
+    # Treinamento do modelo
+    tarefa.informar_progresso(0.1, "TREINANDO")
+    ajustar(modelo, X_treino, y_treino)
+    tarefa.informar_progresso(0.8, "AVALIANDO")
+    previsoes = prever(modelo, X_teste)
+
+    # Avaliação do modelo
+    return modelo, {
+        'Metricas': classification_report(y_teste, previsoes, output_dict=True),
+        'Acuracia': accuracy_score(y_teste, previsoes),
+        'Matriz_Confusao': confusion_matrix(y_teste, previsoes),
+        'Dados_Teste': (X_teste, y_teste),
+        'Previsoes': previsoes
+    }
 
 class AvaliacaoModelos:
     def __init__(self, caminho_arquivo, coluna_alvo):
@@ -18,15 +66,19 @@ class AvaliacaoModelos:
         self.caminho_arquivo = caminho_arquivo
         self.coluna_alvo = coluna_alvo
         self.dados = None
+        self.versao = None
         self.caracteristicas = None
         self.alvo = None
         self.resultados = []
         self.modelos = {}
+        self.chaves = {}
 
     def carregar_dados(self):
         """Carrega o conjunto de dados."""
         try:
-            self.dados = pd.read_csv(self.caminho_arquivo)
+            nome_arquivo = os.path.basename(self.caminho_arquivo)
+            self.versao = versao_publicada(nome_arquivo)
+            self.dados = carregar_dados(nome_arquivo, self.versao)
             st.success("Dados carregados com sucesso.")
             return True
         except FileNotFoundError:
@@ -62,35 +114,42 @@ class AvaliacaoModelos:
             st.error("Erro: Os dados não foram carregados.")
             return False
 
+    def chave_tarefa(self, nome_modelo, modelo):
+        """Identifica o treinamento pelo modelo e seus hiperparâmetros, pelas características e pela versão dos dados."""
+        return obter_fila().cache.chave('avaliacao', nome_modelo, modelo.get_params(),
+                                        list(self.caracteristicas.columns), self.versao)
+
     def treinar_avaliar(self, modelo, nome_modelo):
-        """Treina e avalia um modelo específico."""
+        """Submete o treinamento e a avaliação de um modelo à fila de tarefas e retorna a tarefa."""
         if self.caracteristicas is not None and self.alvo is not None:
-            X_treino, X_teste, y_treino, y_teste = train_test_split(
-                self.caracteristicas, self.alvo, test_size=0.3, random_state=42
-            )
-
-            # Treinamento do modelo
-            modelo.fit(X_treino, y_treino)
-            previsoes = modelo.predict(X_teste)
-            self.modelos[nome_modelo] = modelo
-
-            # Avaliação do modelo
-            relatorio = classification_report(y_teste, previsoes, output_dict=True)
-            acuracia = accuracy_score(y_teste, previsoes)
-            matriz_confusao = confusion_matrix(y_teste, previsoes)
-
-            self.resultados.append({
-                'Modelo': nome_modelo,
-                'Metricas': relatorio,
-                'Acuracia': acuracia,
-                'Matriz_Confusao': matriz_confusao,
-                'Dados_Teste': (X_teste, y_teste)
-            })
-            st.success(f"Modelo {nome_modelo} avaliado com sucesso.")
-            return True
+            # O botão é um pedido explícito: desfaz um cancelamento anterior desta sessão
+            obter_fila().retomar(self.chave_tarefa(nome_modelo, modelo))
+            return obter_fila().submeter(self.chave_tarefa(nome_modelo, modelo), treinar_modelo, clone(modelo),
+                                         self.caracteristicas, self.alvo,
+                                         descricao=f"Avaliação {nome_modelo}", persistir=True)
         else:
             st.error("Erro: Os dados não foram preparados para treinamento.")
-            return False
+            return None
+
+    def registrar_resultado(self, nome_modelo, modelo, resultado, chave=None):
+        """Guarda o resultado de um treinamento concluído para as visualizações."""
+        self.modelos[nome_modelo] = modelo
+        self.chaves[nome_modelo] = chave
+        self.resultados.append({'Modelo': nome_modelo, **resultado})
+
+    def carregar_avaliados(self, opcoes_modelos):
+        """
+        Registra os modelos já avaliados com as características e a versão atuais.
+        Os resultados (modelo treinado, métricas e previsões de teste) vêm do
+        cache compartilhado, inclusive os de outras sessões e de antes de um
+        reinício do servidor, sem treinar de novo.
+        """
+        cache = obter_fila().cache
+        for nome_modelo, modelo in opcoes_modelos.items():
+            chave = self.chave_tarefa(nome_modelo, modelo)
+            concluido = cache.obter(chave)
+            if concluido is not None:
+                self.registrar_resultado(nome_modelo, *concluido, chave=chave)
 
     def plotar_matriz_confusao(self, nome_modelo):
         """Plota a matriz de confusão para um modelo específico."""
@@ -126,13 +185,21 @@ class AvaliacaoModelos:
                     # Usar feature_importances_ para modelos que suportam
                     importancias = modelo.feature_importances_
                 else:
-                    # Usar permutation importance para modelos como SVM
-                    result = permutation_importance(
-                        modelo, X_teste, y_teste,
-                        n_repeats=10,
-                        random_state=42
-                    )
-                    importancias = result.importances_mean
+                    # Usar permutation importance para modelos como SVM; calculada uma vez por avaliação
+                    cache = obter_fila().cache
+                    chave = self.chaves.get(nome_modelo)
+                    importancias = cache.obter(cache.chave('importancia', chave)) if chave else None
+                    if importancias is None:
+                        with obter_controlador().reservar() as nucleos:
+                            result = permutation_importance(
+                                modelo, X_teste, y_teste,
+                                n_repeats=10,
+                                random_state=42,
+                                n_jobs=nucleos
+                            )
+                        importancias = result.importances_mean
+                        if chave:
+                            cache.guardar(cache.chave('importancia', chave), importancias, persistir=True)
 
                 nomes_caracteristicas = self.caracteristicas.columns
 
@@ -170,13 +237,57 @@ class AvaliacaoModelos:
                 with col3:
                     st.metric("Recall Médio", f"{metricas['macro avg']['recall']:.3f}")
 
+    def exibir_contribuicoes(self, nome_modelo):
+        """Decompõe a previsão de uma linha do conjunto de teste pela contribuição de cada característica."""
+        modelo = self.modelos[nome_modelo]
+        if not isinstance(modelo, (RandomForestClassifier, DecisionTreeClassifier)):
+            st.info("Contribuições por previsão disponíveis apenas para Random Forest e Decision Tree.")
+            return
+        resultado = next(r for r in self.resultados if r['Modelo'] == nome_modelo)
+        X_teste, y_teste = resultado['Dados_Teste']
+
+        linha = st.number_input("Linha do conjunto de teste", min_value=0, max_value=len(X_teste) - 1, value=0)
+        classe_prevista = resultado['Previsoes'][linha]
+        explicador = carregar_explicador(self.chaves.get(nome_modelo) or nome_modelo, modelo)
+        contribuicoes = explicador.explicar(X_teste.iloc[[linha]], classe_prevista).iloc[0].sort_values()
+        probabilidade_base = explicador.valor_base(classe_prevista)
+
+        st.write(f"Classe real: **{y_teste.iloc[linha]}** | Classe prevista: **{classe_prevista}** "
+                 f"(probabilidade {probabilidade_base + contribuicoes.sum():.0%}; média no treino {probabilidade_base:.0%})")
+        plt.figure(figsize=(10, 6))
+        plt.barh(contribuicoes.index, contribuicoes.to_numpy(),
+                 color=['tab:red' if valor < 0 else 'tab:green' for valor in contribuicoes])
+        plt.axvline(0, color='black', linewidth=0.8)
+        plt.title(f'Contribuições para a Classe {classe_prevista} - {nome_modelo}')
+        plt.xlabel('Contribuição para a probabilidade')
+        st.pyplot(plt)
+        plt.close()
+
+    def exibir_comparacao(self):
+        """Tabela com as métricas de todos os modelos já avaliados com as características atuais."""
+        st.dataframe(pd.DataFrame([{
+            'Modelo': resultado['Modelo'],
+            'Acurácia': resultado['Acuracia'],
+            'Precisão Média': resultado['Metricas']['macro avg']['precision'],
+            'Recall Médio': resultado['Metricas']['macro avg']['recall']
+        } for resultado in self.resultados]).round(3), hide_index=True)
+
+def aquecer():
+    """Prepara a configuração padrão da página antes do primeiro acesso (ver Utility/aquecimento.py)."""
+    avaliador = AvaliacaoModelos(CAMINHO_ARQUIVO, coluna_alvo='Cluster')
+    nome_arquivo = os.path.basename(CAMINHO_ARQUIVO)
+    avaliador.versao = versao_dataset(nome_arquivo)
+    avaliador.dados = carregar_dataset(nome_arquivo, versao=avaliador.versao)
+    avaliador.preparar_dados(CARACTERISTICAS_PADRAO)
+    nome_modelo = next(iter(OPCOES_MODELOS))
+    return [avaliador.treinar_avaliar(OPCOES_MODELOS[nome_modelo], nome_modelo)]
+
 def main():
     st.set_page_config(page_title="Avaliação de Modelos de Machine Learning", layout="wide")
     st.title("Sistema de Avaliação dos Modelos de Machine Learning")
 
     # Instância da classe AvaliacaoModelos
-    caminho_arquivo_entrada = os.path.join('Datas', '3_Cars_predictions.csv')
-    avaliador = AvaliacaoModelos(caminho_arquivo_entrada, coluna_alvo='Cluster')
+    avaliador = AvaliacaoModelos(CAMINHO_ARQUIVO, coluna_alvo='Cluster')
 
     # Carregar e preparar dados
     if avaliador.carregar_dados():
@@ -185,7 +296,7 @@ def main():
         caracteristicas_selecionadas = st.sidebar.multiselect(
             "Selecione as Características",
             [col for col in todas_caracteristicas if col not in ['Predicted Price', 'car_documents', 'Cluster']],
-            default=['quilometragem', 'Car Age', 'quilometragem']
+            default=CARACTERISTICAS_PADRAO
         )
 
         if caracteristicas_selecionadas:
@@ -194,27 +305,31 @@ def main():
                 st.sidebar.header("Configurações dos Modelos")
 
                 # Seleção do modelo
-                opcoes_modelos = {
-                    "SVM": SVC(),
-                    "Random Forest": RandomForestClassifier(),
-                    "KNN": KNeighborsClassifier(),
-                    "Gradient Boosting": GradientBoostingClassifier(),
-                    "Decision Tree": DecisionTreeClassifier()
-                }
-
                 modelo_selecionado = st.sidebar.selectbox(
                     "Selecione o Modelo",
-                    list(opcoes_modelos.keys())
+                    list(OPCOES_MODELOS.keys())
                 )
 
-                # Treinamento e avaliação do modelo selecionado
+                # Treinamento e avaliação do modelo selecionado, executados na fila de tarefas
                 if st.sidebar.button("Treinar e Avaliar Modelo"):
-                    with st.spinner(f"Treinando {modelo_selecionado}..."):
-                        modelo = opcoes_modelos[modelo_selecionado]
-                        avaliador.treinar_avaliar(modelo, modelo_selecionado)
+                    avaliador.treinar_avaliar(OPCOES_MODELOS[modelo_selecionado], modelo_selecionado)
+
+                chave = avaliador.chave_tarefa(modelo_selecionado, OPCOES_MODELOS[modelo_selecionado])
+                tarefa = obter_fila().obter(chave)
+                # Cancelada por outras sessões (sem ninguém esperando) não é mostrada: basta treinar de novo
+                if tarefa is not None and (tarefa.ativa or tarefa.estado == ERRO or obter_fila().cancelada(chave)):
+                    exibir_tarefa(tarefa, f"TREINANDO {modelo_selecionado}")
+
+                # Resultados já calculados para estas características saem do cache, sem treinar de novo
+                avaliador.carregar_avaliados(OPCOES_MODELOS)
+                if modelo_selecionado in avaliador.modelos:
+                    st.success(f"Modelo {modelo_selecionado} avaliado com sucesso.")
+                if len(avaliador.resultados) > 1:
+                    st.subheader("Comparação dos Modelos Avaliados")
+                    avaliador.exibir_comparacao()
 
                 # Visualização dos resultados
-                if avaliador.resultados:
+                if modelo_selecionado in avaliador.modelos:
                     st.header(f"Resultados da Avaliação do Modelo {modelo_selecionado}")
 
                     # Métricas detalhadas
@@ -228,5 +343,11 @@ def main():
                     st.subheader("Importância das Características")
                     avaliador.plotar_importancia_caracteristicas(modelo_selecionado)
 
+                    # Contribuições de cada característica para uma previsão
+                    st.subheader("Contribuições por Previsão")
+                    avaliador.exibir_contribuicoes(modelo_selecionado)
+
+                aguardar_pendentes(tarefa)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Os testes importam Utility e as páginas pelo caminho a partir da raiz do repositório
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from Utility.anuncios_similares import (CARACTERISTICAS_CATEGORICAS, CARACTERISTICAS_NUMERICAS, PESO_CATEGORIAS,
+                                        IndiceSimilares)
+
+def anuncios(n=400, semente=0):
+    rng = np.random.default_rng(semente)
+    marcas = rng.choice(['Honda', 'Suzuki', 'Toyota'], n)
+    return pd.DataFrame({
+        'marca': marcas,
+        'modelo': [f'{marca}-{i}' for marca, i in zip(marcas, rng.integers(0, 3, n))],
+        'combustivel': rng.choice(['Gasolina', 'GNV'], n),
+        'tipo': rng.choice(['Nacional', 'Importado'], n),
+        'transmissão': rng.choice(['Manual', 'Automático'], n),
+        'ano': rng.integers(1990, 2024, n),
+        'quilometragem': rng.uniform(0, 300_000, n).round(),
+        'preco': rng.uniform(1e5, 5e6, n).round()
+    })
+
+def test_particoes_dao_os_mesmos_vizinhos_do_one_hot_completo():
+    df = anuncios()
+    indice = IndiceSimilares().construir(df)
+    codificador = OneHotEncoder(handle_unknown='ignore', sparse_output=False).fit(df[CARACTERISTICAS_CATEGORICAS])
+    normalizador = StandardScaler().fit(df[CARACTERISTICAS_NUMERICAS])
+    def codificar(d):
+        return np.hstack([codificador.transform(d[CARACTERISTICAS_CATEGORICAS]) * PESO_CATEGORIAS,
+                          normalizador.transform(d[CARACTERISTICAS_NUMERICAS])])
+
+    # Consultas com marca e modelo existentes, modelo de outra marca e valores nunca vistos
+    consultas = pd.concat([anuncios(20, semente=1), df.head(1).assign(modelo='Toyota-0', marca='Honda'),
+                           df.head(1).assign(marca='Kia', modelo='Kia-0', combustivel='Diesel')])
+    for i in range(len(consultas)):
+        entrada = consultas.iloc[[i]]
+        esperadas = np.sort(np.linalg.norm(codificar(df) - codificar(entrada), axis=1))[:30]
+        np.testing.assert_allclose(indice.consultar(entrada, k=30)['distancia'].to_numpy(), esperadas)
@@ -0,0 +1,31 @@
+import os
+import time
+
+import numpy as np
+
+from Utility.cache_compartilhado import CacheCompartilhado
+
+def test_limite_de_disco_remove_os_usados_ha_mais_tempo(tmp_path):
+    cache = CacheCompartilhado(str(tmp_path), limite_disco=3 * 900_000)
+    agora = time.time()
+    for i in range(3):
+        cache.guardar(f'r{i}', np.zeros(100_000), persistir=True)
+        os.utime(tmp_path / f'r{i}.joblib', (agora - 100 + i, agora - 100 + i))
+    # Usar 'r0' o torna o mais recente; a próxima gravação passa do limite e remove 'r1'
+    cache._memoria.clear()
+    assert cache.obter('r0') is not None
+    cache.guardar('r3', np.zeros(100_000), persistir=True)
+    assert sorted(os.listdir(tmp_path)) == ['r0.joblib', 'r2.joblib', 'r3.joblib']
+    assert not cache.contem('r1')
+
+def test_resultados_antigos_expiram(tmp_path):
+    cache = CacheCompartilhado(str(tmp_path), idade_maxima=60)
+    cache.guardar('velho', 1, persistir=True)
+    antigo = time.time() - 120
+    os.utime(tmp_path / 'velho.joblib', (antigo, antigo))
+    cache.guardar('novo', 2, persistir=True)
+    assert cache.obter('velho') is None and cache.obter('novo') == 2
+    # Valores só em memória não são afetados
+    cache.guardar('memoria', 3)
+    cache.limpar()
+    assert cache.obter('memoria') == 3
@@ -0,0 +1,63 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+from Utility.contribuicoes import ContribuicoesFloresta
+from Utility.modulos import importar_pagina
+
+from conftest import RAIZ
+
+def _dados_carros(n=300, semente=0):
+    rng = np.random.default_rng(semente)
+    dados = pd.DataFrame({
+        'marca': rng.choice(['Toyota', 'Honda', 'Suzuki'], n),
+        'modelo': rng.choice(['Corolla', 'Civic', 'Alto', 'City'], n),
+        'ano': rng.integers(2005, 2023, n),
+        'quilometragem': rng.uniform(0, 200000, n),
+        'combustivel': rng.choice(['Petrol', 'Diesel'], n),
+        'car_documents': rng.choice(['Original', 'Duplicate'], n),
+        'tipo': rng.choice(['Sedan', 'Hatchback'], n),
+        'transmissão': rng.choice(['Manual', 'Automatic'], n),
+    })
+    dados['preco'] = 100000 + (dados['ano'] - 2005) * 20000 - dados['quilometragem'] * 0.5 + rng.normal(0, 20000, n)
+    dados['faixa_preco'] = pd.cut(dados['preco'], bins=[-np.inf, 200000, 300000, 400000, np.inf],
+                                  labels=['Econômico', 'Intermediário', 'Premium', 'Luxo'])
+    return dados
+
+@pytest.mark.parametrize('classe_modelo', [RandomForestClassifier, RandomForestRegressor])
+def test_base_mais_contribuicoes_igual_previsao(classe_modelo):
+    rng = np.random.default_rng(1)
+    X = pd.DataFrame(rng.normal(size=(200, 4)), columns=list('abcd'))
+    y = (X['a'] + X['b'] > 0).astype(int) if classe_modelo is RandomForestClassifier else X['a'] * 3 + X['c']
+    modelo = classe_modelo(n_estimators=20, random_state=0).fit(X, y)
+    explicador = ContribuicoesFloresta(modelo)
+
+    if classe_modelo is RandomForestClassifier:
+        esperado = modelo.predict_proba(X)[:, 1]
+        obtido = explicador.valor_base(1) + explicador.explicar(X, 1).sum(axis=1)
+    else:
+        esperado = modelo.predict(X)
+        obtido = explicador.valor_base() + explicador.explicar(X).sum(axis=1)
+    np.testing.assert_allclose(obtido, esperado, atol=1e-9)
+
+def test_explicacao_da_pagina_usa_a_entrada_do_modelo():
+    """A contribuição mostrada em Classificação soma a predict_proba da faixa prevista."""
+    pagina = importar_pagina(os.path.join(RAIZ, 'pages', 'Classificação.py'))
+    sistema = pagina.SistemaClassificacaoCarros('random_forest')
+    sistema.dados = _dados_carros()
+    X, y = sistema.preprocessar_dados()
+    sistema.treinar_modelo(X, y)
+
+    entrada = sistema.dados.drop(columns=['preco', 'faixa_preco']).iloc[:5]
+    original = entrada.copy()
+    codificada = sistema.codificar_entrada(entrada)
+    pd.testing.assert_frame_equal(entrada, original)
+
+    explicador = ContribuicoesFloresta(sistema.modelo)
+    probabilidades = sistema.modelo.predict_proba(codificada)
+    for classe in sistema.modelo.classes_:
+        obtido = explicador.valor_base(classe) + explicador.explicar(codificada, classe).sum(axis=1)
+        np.testing.assert_allclose(obtido, probabilidades[:, classe], atol=1e-9)
@@ -0,0 +1,46 @@
+import os
+
+import numpy as np
+from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_samples
+
+from Utility.distancias import limpar, obter_matriz_distancias
+
+def _dados(n=600, semente=0):
+    rng = np.random.default_rng(semente)
+    X = np.vstack([rng.normal(centro, 1, size=(n // 3, 3)) for centro in (0, 4, 8)])
+    return X, KMeans(5, random_state=0, n_init='auto').fit_predict(X)
+
+def test_silhueta_mapeada_igual_silhouette_samples(tmp_path):
+    X, rotulos = _dados()
+    rotulos[0] = rotulos.max() + 1  # cluster de um único elemento vale 0
+    matriz = obter_matriz_distancias(X, 'config', 1.0, str(tmp_path))
+    assert isinstance(matriz.distancias, np.memmap) and matriz.distancias.dtype == np.float32
+    np.testing.assert_allclose(matriz.silhueta_amostras(rotulos), silhouette_samples(X, rotulos), atol=1e-5)
+
+def test_silhueta_amostrada_acima_do_maximo_de_linhas(tmp_path):
+    X, rotulos = _dados()
+    matriz = obter_matriz_distancias(X, 'config', 1.0, str(tmp_path), maximo_linhas=200)
+    assert matriz.n == 200
+    esperado = silhouette_samples(X[matriz.amostra], rotulos[matriz.amostra])
+    np.testing.assert_allclose(matriz.silhueta_amostras(rotulos), esperado, atol=1e-5)
+    # A amostra é fixa: a matriz gravada é reaproveitada
+    assert obter_matriz_distancias(X, 'config', 1.0, str(tmp_path), maximo_linhas=200).caminho == matriz.caminho
+
+def test_versoes_anteriores_sao_removidas(tmp_path):
+    X, _ = _dados(90)
+    antiga = obter_matriz_distancias(X, 'config', 1.0, str(tmp_path)).caminho
+    outra = obter_matriz_distancias(X, 'outra', 1.0, str(tmp_path)).caminho
+    nova = obter_matriz_distancias(X, 'config', 2.0, str(tmp_path)).caminho
+    assert not os.path.exists(antiga) and os.path.exists(outra) and os.path.exists(nova)
+    # Uma sessão ainda na versão antiga não apaga a matriz da versão nova
+    obter_matriz_distancias(X, 'config', 1.0, str(tmp_path))
+    assert os.path.exists(nova)
+
+def test_limite_de_disco_remove_as_menos_usadas(tmp_path):
+    X, _ = _dados(90)
+    caminhos = [obter_matriz_distancias(X, f'config{i}', 1.0, str(tmp_path)).caminho for i in range(3)]
+    for idade, caminho in enumerate(caminhos):
+        os.utime(caminho, (1000 * (idade + 1), 1000 * (idade + 1)))
+    limpar(str(tmp_path), caminhos[2], limite_disco=2 * os.path.getsize(caminhos[2]))
+    assert [os.path.exists(caminho) for caminho in caminhos] == [False, True, True]
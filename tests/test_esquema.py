@@ -0,0 +1,50 @@
+import os
+
+import pandas as pd
+import pytest
+
+from Utility.esquema import (anexar_tipado, carregar_dataset, construir_tipados, remover_tipados_antigos,
+                             versao_dataset, versoes_tipadas)
+from conftest import RAIZ
+
+NOME = '1_Cars_processado.csv'
+
+def gravar_csv(diretorio, linhas, mtime):
+    caminho = os.path.join(diretorio, NOME)
+    pd.read_csv(os.path.join(RAIZ, 'Datas', NOME), nrows=linhas).to_csv(caminho, index=False)
+    os.utime(caminho, (mtime, mtime))
+    return versao_dataset(NOME, diretorio)
+
+def test_cada_versao_e_lida_do_seu_diretorio(tmp_path):
+    dados, tipados = str(tmp_path), str(tmp_path / 'tipados')
+    antiga = gravar_csv(dados, 50, 1_000_000)
+    construir_tipados(dados, tipados, arquivos=[NOME])
+    nova = gravar_csv(dados, 30, 2_000_000)
+    construir_tipados(dados, tipados, arquivos=[NOME])
+
+    # A versão anterior continua legível depois que a nova foi gravada
+    assert len(carregar_dataset(NOME, ['preco'], diretorio_dados=dados, diretorio_tipados=tipados, versao=antiga)) == 50
+    assert len(carregar_dataset(NOME, ['preco'], diretorio_dados=dados, diretorio_tipados=tipados, versao=nova)) == 30
+
+    remover_tipados_antigos(NOME, nova, tipados)
+    assert versoes_tipadas(NOME, tipados) == [int(nova * 1000)]
+    with pytest.raises(FileNotFoundError):
+        carregar_dataset(NOME, ['preco'], diretorio_dados=dados, diretorio_tipados=tipados, versao=antiga)
+
+def test_linhas_anexadas_geram_a_mesma_versao_que_a_reconstrucao(tmp_path):
+    dados, tipados = str(tmp_path), str(tmp_path / 'tipados')
+    anterior = gravar_csv(dados, 50, 1_000_000)
+    construir_tipados(dados, tipados, arquivos=[NOME])
+    novas = pd.read_csv(os.path.join(RAIZ, 'Datas', NOME), skiprows=range(1, 51), nrows=20)
+    novas.to_csv(os.path.join(dados, NOME), mode='a', header=False, index=False)
+    os.utime(os.path.join(dados, NOME), (2_000_000, 2_000_000))
+
+    anexar_tipado(novas, NOME, anterior, dados, tipados)
+    construir_tipados(dados, str(tmp_path / 'completo'), arquivos=[NOME])
+    versao = versao_dataset(NOME, dados)
+    incremental = carregar_dataset(NOME, diretorio_dados=dados, diretorio_tipados=tipados, versao=versao)
+    completo = carregar_dataset(NOME, diretorio_dados=dados, diretorio_tipados=str(tmp_path / 'completo'),
+                                versao=versao)
+    pd.testing.assert_frame_equal(incremental, completo)
+    # A versão anterior continua intacta
+    assert len(carregar_dataset(NOME, diretorio_dados=dados, diretorio_tipados=tipados, versao=anterior)) == 50
@@ -0,0 +1,59 @@
+import threading
+from unittest import mock
+
+from Utility import fila_tarefas
+from Utility.cache_compartilhado import CacheCompartilhado
+from Utility.fila_tarefas import CANCELADA, CONCLUIDA, EXECUTANDO, FilaTarefas
+
+def _fila(tmp_path):
+    return FilaTarefas(max_trabalhadores=2, cache=CacheCompartilhado(str(tmp_path)))
+
+def _bloqueante(liberar):
+    def funcao(tarefa):
+        while not liberar.wait(0.01):
+            tarefa.verificar_cancelamento()
+        return 'ok'
+    return funcao
+
+def _na_sessao(sessao):
+    return mock.patch.object(fila_tarefas, 'sessao_atual', return_value=sessao)
+
+def test_cancelamento_fica_registrado_na_sessao(tmp_path):
+    fila, liberar = _fila(tmp_path), threading.Event()
+    with _na_sessao('a'):
+        tarefa = fila.submeter('k', _bloqueante(liberar))
+        fila.cancelar('k')
+        assert tarefa.aguardar(5) and tarefa.estado == CANCELADA
+        # Submeter de novo (a página roda outra vez) não reinicia a execução
+        assert fila.submeter('k', _bloqueante(liberar)).estado == CANCELADA
+        fila.retomar('k')
+        nova = fila.submeter('k', _bloqueante(liberar))
+        assert nova is not tarefa and nova.ativa
+    liberar.set()
+    assert nova.aguardar(5) and nova.estado == CONCLUIDA
+
+def test_execucao_compartilhada_continua_para_outras_sessoes(tmp_path):
+    fila, liberar = _fila(tmp_path), threading.Event()
+    with _na_sessao('a'):
+        tarefa = fila.submeter('k', _bloqueante(liberar))
+    with _na_sessao('b'):
+        assert fila.submeter('k', _bloqueante(liberar)) is tarefa
+    with _na_sessao('a'):
+        fila.cancelar('k')
+        assert fila.obter('k').estado == CANCELADA
+    with _na_sessao('b'):
+        assert fila.obter('k') is tarefa and tarefa.estado in (EXECUTANDO, 'na_fila')
+        liberar.set()
+        assert tarefa.aguardar(5) and tarefa.resultado == 'ok'
+
+def test_ultima_sessao_a_cancelar_interrompe_a_execucao(tmp_path):
+    fila = _fila(tmp_path)
+    for sessao in ('a', 'b'):
+        with _na_sessao(sessao):
+            tarefa = fila.submeter('k', _bloqueante(threading.Event()))
+    with _na_sessao('a'):
+        fila.cancelar('k')
+    assert not tarefa.aguardar(0.2)
+    with _na_sessao('b'):
+        fila.cancelar('k')
+    assert tarefa.aguardar(5) and tarefa.estado == CANCELADA
@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from Utility.indice_duplicatas import COLUNAS_CHAVE, IndiceDuplicatas, impressoes_digitais
+
+def _dump(n, inicio=0):
+    linhas = np.arange(inicio, inicio + n)
+    return pd.DataFrame({
+        'Make': [f'Marca{i % 7}' for i in linhas], 'Model': [f'Modelo{i % 13}' for i in linhas],
+        'Year': 2000 + linhas % 23, "KM's driven": linhas * 1000, 'Price': 500000 + linhas,
+        'Fuel': 'Petrol', 'Transmission': 'Manual', 'Assembly': 'Local',
+        'Registration city': 'Lahore', 'Seller Location': 'Lahore', 'Ad ID': linhas,
+    })
+
+@pytest.mark.parametrize('usar_bloom', [True, False])
+def test_indice_ida_e_volta_no_disco(tmp_path, usar_bloom):
+    indice = IndiceDuplicatas(str(tmp_path), usar_bloom=usar_bloom, capacidade=10000)
+    assert len(indice.filtrar_novos(_dump(1000))) == 1000
+    indice.salvar()
+
+    reaberto = IndiceDuplicatas(str(tmp_path))
+    assert len(reaberto) == 1000 and reaberto.usar_bloom == usar_bloom
+    novos = reaberto.filtrar_novos(_dump(1000, inicio=500))
+    assert novos['Ad ID'].tolist() == list(range(1000, 1500))
+
+def test_linhas_pendentes_so_persistem_ao_salvar(tmp_path):
+    indice = IndiceDuplicatas(str(tmp_path))
+    indice.filtrar_novos(_dump(100))
+    assert len(indice.filtrar_novos(_dump(100))) == 0
+    # Sem salvar (ex.: a ingestão falhou depois da limpeza), o mesmo dump continua novo
+    assert len(IndiceDuplicatas(str(tmp_path)).filtrar_novos(_dump(100))) == 100
+
+def test_impressao_ignora_formato_e_id_do_anuncio():
+    dump = _dump(50)
+    reanunciado = dump.assign(**{'Ad ID': dump['Ad ID'] + 10 ** 6, 'Make': dump['Make'].str.upper() + ' ',
+                                 'Price': dump['Price'].astype(float)})
+    np.testing.assert_array_equal(impressoes_digitais(dump), impressoes_digitais(reanunciado))
+    assert len(np.unique(impressoes_digitais(dump, COLUNAS_CHAVE))) == 50
+
+def test_semear_a_partir_do_dump(tmp_path):
+    caminho = tmp_path / 'historico.csv'
+    _dump(300).to_csv(caminho, index=False)
+    indice = IndiceDuplicatas(str(tmp_path / 'indice'))
+    assert indice.semear_arquivo(str(caminho), tamanho_bloco=100) == 300
+    assert len(IndiceDuplicatas(str(tmp_path / 'indice')).filtrar_novos(_dump(400))) == 100
+
+def test_salvar_grava_so_o_delta_e_funde_segmentos(tmp_path):
+    indice = IndiceDuplicatas(str(tmp_path), capacidade=500, fator_segmentos=2)
+    for lote in range(8):
+        indice.filtrar_novos(_dump(100, inicio=lote * 100))
+        indice.salvar()
+        # Tamanhos em progressão geométrica: O(log n) segmentos
+        tamanhos = [len(segmento) for segmento in indice.segmentos]
+        assert all(anterior > 2 * seguinte for anterior, seguinte in zip(tamanhos, tamanhos[1:]))
+    arquivos = sorted(nome for nome in os.listdir(tmp_path) if nome.startswith('segmento-'))
+    assert arquivos == sorted(indice.nomes_segmentos)
+
+    reaberto = IndiceDuplicatas(str(tmp_path))
+    assert len(reaberto) == 800
+    assert reaberto.filtrar_novos(_dump(900))['Ad ID'].tolist() == list(range(800, 900))
+    reaberto.compactar()
+    assert len(IndiceDuplicatas(str(tmp_path)).segmentos) == 1
+
+def test_filtros_de_bloom_encadeados_mantem_a_taxa(tmp_path):
+    indice = IndiceDuplicatas(str(tmp_path), capacidade=1000, taxa_falsos_positivos=0.01)
+    for lote in range(10):
+        indice.filtrar_novos(_dump(1000, inicio=lote * 1000))
+        indice.salvar()
+    # Capacidades 1000, 2000, 4000, 8000: a taxa somada continua abaixo de 1%
+    assert [filtro['capacidade'] for filtro in indice.filtros] == [1000, 2000, 4000, 8000]
+    desconhecidos = np.random.default_rng(0).integers(0, 2 ** 63, 100_000, dtype=np.uint64)
+    assert IndiceDuplicatas(str(tmp_path))._talvez_contidos(desconhecidos).mean() < 0.01
@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Utility.monitor_drift import CountSketch, MonitorDrift, TDigest
+
+def test_quantis_do_tdigest_dentro_da_tolerancia():
+    valores = np.random.default_rng(0).lognormal(12, 0.6, 200000)
+    digest = TDigest()
+    for bloco in np.array_split(valores, 20):
+        digest.atualizar(bloco)
+    assert len(digest.pesos) < 500
+    for q in (0.01, 0.1, 0.5, 0.9, 0.99):
+        # Erro medido em posição (quantil), como o t-digest garante
+        assert abs(np.mean(valores <= digest.quantil(q)) - q) < 0.005
+
+def test_tdigest_mesclado_equivale_ao_unico():
+    rng = np.random.default_rng(1)
+    a, b = rng.normal(0, 1, 50000), rng.normal(0.5, 2, 50000)
+    mesclado = TDigest().atualizar(a).mesclar(TDigest().atualizar(b))
+    unico = TDigest().atualizar(np.concatenate([a, b]))
+    assert mesclado.total == unico.total == 100000
+    assert mesclado.distancia_ks(unico) < 0.005
+
+def test_tdigest_ida_e_volta_em_dict():
+    digest = TDigest().atualizar(np.arange(1000.0))
+    copia = TDigest.de_dict(digest.para_dict())
+    assert copia.distancia_ks(digest) == 0
+    assert copia.quantil(0.5) == pytest.approx(digest.quantil(0.5))
+
+def test_count_sketch_estima_frequencias_e_mescla():
+    rng = np.random.default_rng(2)
+    categorias = [f'modelo{i}' for i in range(40)]
+    valores = rng.choice(categorias, 20000, p=np.linspace(1, 3, 40) / np.linspace(1, 3, 40).sum())
+    esboco = CountSketch()
+    for bloco in np.array_split(valores, 4):
+        esboco.mesclar(CountSketch().atualizar(bloco))
+    reais = pd.Series(valores).value_counts().reindex(categorias).to_numpy()
+    np.testing.assert_allclose(esboco.estimar(categorias), reais, atol=0.02 * len(valores))
+
+def _lote(n, semente, deslocamento=0.0):
+    rng = np.random.default_rng(semente)
+    marcas = ['Toyota', 'Honda', 'Suzuki', 'Kia']
+    return pd.DataFrame({
+        'preco': rng.lognormal(13 + deslocamento, 0.5, n),
+        'quilometragem': rng.uniform(0, 200000, n),
+        'ano': rng.integers(2005, 2023, n),
+        'marca': rng.choice(marcas, n, p=[0.4, 0.3, 0.2, 0.1] if not deslocamento else [0.1, 0.2, 0.3, 0.4]),
+        'modelo': rng.choice([f'm{i}' for i in range(44)], n),
+    })
+
+def test_lote_pequeno_sem_mudanca_nao_passa_do_limiar():
+    referencia = MonitorDrift().observar(_lote(100000, 3))
+    for semente in range(5):
+        relatorio = referencia.comparar(MonitorDrift().observar(_lote(300, 10 + semente)))
+        assert not any(resultado['acima'] for resultado in relatorio.values()), relatorio
+
+def test_mudanca_real_passa_do_limiar():
+    referencia = MonitorDrift().observar(_lote(100000, 3))
+    relatorio = referencia.comparar(MonitorDrift().observar(_lote(2000, 4, deslocamento=0.5)))
+    assert relatorio['preco']['acima'] and relatorio['marca']['acima']
+    assert not relatorio['modelo']['acima']
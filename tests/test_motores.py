@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from Utility.motores import MAXIMO_CATEGORIAS, codificar_categoricas, criar_modelo
+
+def _dados(n_categorias=300, n=3000):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'modelo': rng.integers(0, n_categorias, n),
+        'marca': rng.integers(0, 10, n),
+        'ano': rng.integers(2000, 2024, n),
+    }), rng.integers(0, 3, n)
+
+def test_codigos_acima_do_limite_viram_numericos():
+    X, y = _dados()
+    modelo = criar_modelo('classificacao', 'hist_gradient_boosting', X, max_iter=5)
+    assert modelo.categorical_features == ['marca']
+    modelo.fit(X, y)
+
+def test_codigos_dentro_do_limite_continuam_categoricos():
+    X, y = _dados(n_categorias=50)
+    modelo = criar_modelo('classificacao', 'hist_gradient_boosting', X, max_iter=5)
+    assert modelo.categorical_features == ['modelo', 'marca']
+    modelo.fit(X, y)
+
+def test_codificar_categoricas_agrupa_as_raras():
+    X, y = _dados()
+    X['modelo'] = 'm' + X['modelo'].astype(str)
+    codificado, categorias = codificar_categoricas(X)
+    assert len(categorias['modelo']) == MAXIMO_CATEGORIAS
+    assert codificado['modelo'].max() < MAXIMO_CATEGORIAS
+    assert codificado['modelo'].isna().any()
+    criar_modelo('regressao', 'hist_gradient_boosting', list(X.columns), max_iter=5).fit(codificado, y)
+
+def test_colunas_de_texto_nao_quebram_a_checagem():
+    X, _ = _dados(n_categorias=50)
+    X['modelo'] = 'm' + X['modelo'].astype(str)
+    assert criar_modelo('classificacao', 'hist_gradient_boosting', X).categorical_features == ['modelo', 'marca']
+    X['modelo'] = [f'm{i}' for i in range(len(X))]
+    assert criar_modelo('classificacao', 'hist_gradient_boosting', X).categorical_features == ['marca']
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from Utility.indice_duplicatas import IndiceDuplicatas
+from Utility.modulos import importar_etapa
+
+tratamento = importar_etapa('0_ Tratamento_Dados.py')
+
+def _dump(n):
+    linhas = np.arange(n)
+    dump = pd.DataFrame({
+        'Make': 'Toyota', 'Model': [f'Corolla {i % 5}' for i in linhas], 'Year': 2005 + linhas % 15,
+        "KM's driven": 1000 + linhas * 997, 'Price': 1_500_000 + linhas, 'Fuel': 'Petrol',
+        'Registered in': 'Lahore', 'Transmission': 'Manual', 'Assembly': 'Local', 'Body Type': 'Sedan',
+    })
+    for coluna in tratamento.COLUNAS_DESNECESSARIAS:
+        dump[coluna] = 'x'
+    dump['Ad ID'] = linhas
+    return dump
+
+def test_fragmentos_iguais_ao_caminho_sequencial():
+    dump = _dump(200)
+    esperado = tratamento._tratar_fragmento(dump.copy(), tratamento.regras_padrao(), None)
+    resultado = tratamento.processar_em_fragmentos(dump, n_fragmentos=3)
+    pd.testing.assert_frame_equal(resultado, esperado)
+
+def test_dump_so_com_linhas_ja_vistas_gera_resultado_vazio(tmp_path):
+    indice = IndiceDuplicatas(str(tmp_path))
+    completo = tratamento.processar_em_fragmentos(_dump(50), indice_duplicatas=indice)
+    indice.salvar()
+
+    vazio = tratamento.processar_em_fragmentos(_dump(50), indice_duplicatas=IndiceDuplicatas(str(tmp_path)))
+    assert vazio.empty
+    assert list(vazio.columns) == list(completo.columns)
+    assert (vazio.dtypes == completo.dtypes).all()